@@ -0,0 +1,129 @@
+"""
+Benchmark of the request latency with the three ways of handling the database connections: a new connection for
+every request, persistent connections (CONN_MAX_AGE) and the in-process pool (utb.backends.sqlite3_pool).
+The requests go through a local WSGI server to get_article, with the token check mocked, and a local SQLite
+database stands in for PostgreSQL. Opening a SQLite connection is much cheaper than the TLS handshake with the
+production database, which can be simulated with --connect-latency.
+Every mode runs in its own process, since the database settings are read once.
+
+Usage: python benchmarks/bench_db_connections.py [--requests 500] [--connect-latency 0] [--json]
+the connect latency is in milliseconds
+"""
+from unittest.mock import patch
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import urllib3
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+MODES = ("close", "persistent", "pool")
+URL = "https://www.website.com/news/article"
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def setup_database():
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from utb import utils
+    from utb.models import Article, User, Website
+
+    call_command("migrate", verbosity=0)
+    User(id="uid", name="name", email="email@email.com").save()
+    website = Website(id=utils.hash_digest("website"), name="website")
+    website.save()
+    Article(id=utils.hash_digest(URL), url=URL, name="name", website=website).save()
+
+
+def run_mode(n_requests, connect_latency):
+    """
+    Serves the project and measures the latency of n_requests sequential requests
+    :return: the dict with the latency percentiles in milliseconds and the number of connections opened
+    """
+    import django
+    django.setup()
+    from django.core.wsgi import get_wsgi_application
+    from django.db.backends.sqlite3 import base
+    from utb import utils
+
+    opened = 0
+    get_new_connection = base.DatabaseWrapper.get_new_connection
+
+    def slow_get_new_connection(self, conn_params):
+        nonlocal opened
+        opened += 1
+        time.sleep(connect_latency / 1000)
+        return get_new_connection(self, conn_params)
+
+    server = make_server("127.0.0.1", 0, get_wsgi_application(), handler_class=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:{}/utb/get_article".format(server.server_port)
+    body = json.dumps({"token": "token", "object": {"url": URL, "website_name": "website"}})
+    http = urllib3.PoolManager()
+
+    latencies = []
+    with patch.object(utils, "check_google_token", lambda request: (True, "uid")), \
+            patch.object(base.DatabaseWrapper, "get_new_connection", slow_get_new_connection):
+        for _ in range(n_requests):
+            start = time.perf_counter()
+            response = http.request("POST", url, body=body, headers={"Content-Type": "application/json"})
+            latencies.append((time.perf_counter() - start) * 1000)
+            assert response.status == 200, response.data
+    server.shutdown()
+
+    latencies.sort()
+    return {"p50_ms": round(latencies[len(latencies) // 2], 3),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95)], 3),
+            "mean_ms": round(sum(latencies) / len(latencies), 3),
+            "connections_opened": opened}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--connect-latency", type=float, default=0, help="milliseconds added to every connection")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    arguments = parser.parse_args()
+
+    if arguments.mode:
+        print(json.dumps(run_mode(arguments.requests, arguments.connect_latency)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        environment = dict(os.environ, UTB_BENCHMARK_DATABASE=os.path.join(directory, "benchmark.sqlite3"))
+        subprocess.run([sys.executable, "-c", "import benchmarks.bench_db_connections as b; b.setup_database()"],
+                       cwd=ROOT, env=environment, check=True)
+        results = []
+        for mode in MODES:
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode,
+                                     "--requests", str(arguments.requests),
+                                     "--connect-latency", str(arguments.connect_latency)],
+                                    env=dict(environment, UTB_BENCHMARK_DB_MODE=mode), check=True,
+                                    stdout=subprocess.PIPE).stdout
+            results.append(dict(mode=mode, **json.loads(output)))
+
+    if arguments.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("{:<12}{:>10}{:>10}{:>10}{:>14}".format("mode", "p50 ms", "p95 ms", "mean ms", "connections"))
+        for result in results:
+            print("{mode:<12}{p50_ms:>10}{p95_ms:>10}{mean_ms:>10}{connections_opened:>14}".format(**result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Load benchmark of the utb endpoints.
+A local SQLite database is seeded with the requested numbers of users, friendships, websites, articles and reports,
+then the project is served by a local multi-threaded WSGI server and every endpoint is driven by --concurrency
+clients for --requests requests.
+As in the tests, check_google_token is mocked (the token is the id of the user) and the article names are not
+downloaded.
+For every endpoint the results contain the p50/p95/p99 latency, the requests per second and the number of
+queries per request, printed as a table or, with --json, as JSON to compare different commits.
+
+Usage: python benchmarks/bench_endpoints.py [--users 1000] [--friendships 10] [--websites 50] [--articles 5000]
+                                            [--reports 20000] [--requests 500] [--concurrency 8]
+                                            [--endpoints add_user,get_article,...] [--seed 0] [--json]
+"""
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from unittest.mock import patch
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import urllib3
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+ENDPOINTS = ("add_user", "get_article", "submit_report", "get_leaderboard", "add_friend")
+WRITE_ENDPOINTS = ("add_user", "submit_report", "add_friend")
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class QueryCounter:
+    """
+    WSGI middleware counting the queries executed by every request, per endpoint.
+    SQLite has no row locks, and two transactions that both want to write fail instead of waiting for each other,
+    so the requests to the writing endpoints are run one at a time, as SQLite would do anyway
+    """
+
+    def __init__(self, application, serialize_writes):
+        self.application = application
+        self.queries = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock() if serialize_writes else None
+
+    def __call__(self, environ, start_response):
+        from django.db import connection
+
+        n_queries = 0
+        endpoint = environ["PATH_INFO"].rstrip("/").split("/")[-1]
+
+        def count(execute, sql, params, many, context):
+            nonlocal n_queries
+            n_queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            if self._write_lock is not None and endpoint in WRITE_ENDPOINTS:
+                with self._write_lock:
+                    response = self.application(environ, start_response)
+            else:
+                response = self.application(environ, start_response)
+        with self._lock:
+            self.queries.setdefault(endpoint, []).append(n_queries)
+        return response
+
+
+def seed(arguments, rng):
+    """
+    Fills the database with users, friendships, websites, articles and reports
+    :return: the tuple (user ids, article urls with their website names)
+    """
+    from utb import replay, utils
+    from utb.models import Article, Friendship, Report, ReportEvent, User, Website
+
+    user_ids = ["u" + str(i) for i in range(arguments.users)]
+    User.objects.bulk_create([User(id=user_id, name="user " + user_id, email=user_id + "@email.com",
+                                   n_reports=0) for user_id in user_ids], batch_size=1000)
+
+    pairs = {(user_id, rng.choice(user_ids)) for user_id in user_ids for _ in range(arguments.friendships)}
+    Friendship.objects.bulk_create([Friendship(user_id=user_id, friend_id=friend_id) for user_id, friend_id in pairs
+                                    if user_id != friend_id], batch_size=1000)
+
+    website_names = ["website" + str(i) + ".com" for i in range(arguments.websites)]
+    Website.objects.bulk_create([Website(id=utils.hash_digest(name), name=name) for name in website_names],
+                                batch_size=1000)
+
+    articles = []
+    for i in range(arguments.articles):
+        website_name = rng.choice(website_names)
+        articles.append(("https://" + website_name + "/news/" + str(i), website_name))
+    Article.objects.bulk_create([Article(id=utils.hash_digest(url), url=url, name="article " + url,
+                                         website_id=utils.hash_digest(website_name))
+                                 for url, website_name in articles], batch_size=1000)
+
+    reports = {(rng.choice(user_ids), utils.hash_digest(rng.choice(articles)[0])): rng.choice("LLF")
+               for _ in range(arguments.reports)}
+    Report.objects.bulk_create([Report(user_id=user_id, article_id=article_id, value=value)
+                                for (user_id, article_id), value in reports.items()], batch_size=1000)
+    ReportEvent.objects.bulk_create([ReportEvent(user_id=user_id, article_id=article_id, value=value)
+                                     for (user_id, article_id), value in reports.items()], batch_size=1000)
+    # the weights, the tallies and the counters are computed by replaying the reports
+    replay.replay(full=True)
+    return user_ids, articles
+
+
+def make_requests(endpoint, n_requests, user_ids, articles, rng):
+    """
+    :return: the list of (token, object) of the requests to the endpoint
+    """
+    requests = []
+    for i in range(n_requests):
+        token = rng.choice(user_ids)
+        if endpoint == "add_user":
+            token = "new" + str(i)
+            data = {"name": "new user", "email": token + "@email.com"}
+        elif endpoint == "get_article":
+            url, website_name = rng.choice(articles)
+            data = {"url": url, "website_name": website_name}
+        elif endpoint == "submit_report":
+            data = {"url": rng.choice(articles)[0], "report": rng.choice("LLF")}
+        elif endpoint == "get_leaderboard":
+            data = {"type": rng.choice(("GLOBAL", "FRIENDS"))}
+        else:
+            friend_id = rng.choice(user_ids)
+            while friend_id == token and len(user_ids) > 1:
+                friend_id = rng.choice(user_ids)
+            data = {"friend_email": friend_id + "@email.com"}
+        requests.append((token, data))
+    return requests
+
+
+def run_endpoint(http, base_url, endpoint, requests, concurrency):
+    """
+    Sends the requests with concurrency clients
+    :return: the tuple (sorted latencies in milliseconds, number of errors, elapsed seconds)
+    """
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def send(request):
+        nonlocal errors
+        token, data = request
+        body = json.dumps({"token": token, "object": data})
+        start = time.perf_counter()
+        response = http.request("POST", base_url + endpoint, body=body, headers={"Content-Type": "application/json"})
+        latency = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(latency)
+            if response.status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, requests))
+    return sorted(latencies), errors, time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def get_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, check=True).stdout.decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--friendships", type=int, default=10, help="friends of every user")
+    parser.add_argument("--websites", type=int, default=50)
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--reports", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=500, help="requests for every endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma separated endpoints to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ.setdefault("UTB_BENCHMARK_DATABASE", os.path.join(directory, "benchmark.sqlite3"))
+        import django
+        django.setup()
+        from django.core.management import call_command
+        from django.core.wsgi import get_wsgi_application
+        from django.db import connection
+        from django.test.utils import override_settings
+        from utb import utils
+
+        # the views log every request
+        logging.disable(logging.WARNING)
+        call_command("migrate", verbosity=0)
+        rng = random.Random(arguments.seed)
+        user_ids, articles = seed(arguments, rng)
+
+        async def parse_article_name(url):
+            return "article " + url
+
+        counter = QueryCounter(get_wsgi_application(),
+                               serialize_writes=connection.vendor == "sqlite")
+        server = make_server("127.0.0.1", 0, counter, server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = "http://127.0.0.1:{}/utb/".format(server.server_port)
+        http = urllib3.PoolManager(maxsize=arguments.concurrency)
+
+        results = {}
+        with patch.object(utils, "check_google_token", lambda request: (True, utils.get_token(request))), \
+                patch.object(utils, "parse_article_name_from_url_async", parse_article_name), \
+                override_settings(UTB_TASKS_EAGER=True):
+            for endpoint in arguments.endpoints.split(","):
+                requests = make_requests(endpoint, arguments.requests, user_ids, articles, rng)
+                latencies, errors, elapsed = run_endpoint(http, base_url, endpoint, requests, arguments.concurrency)
+                queries = counter.queries.get(endpoint, [0])
+                results[endpoint] = {"requests": len(latencies), "errors": errors,
+                                     "p50_ms": round(percentile(latencies, 0.50), 3),
+                                     "p95_ms": round(percentile(latencies, 0.95), 3),
+                                     "p99_ms": round(percentile(latencies, 0.99), 3),
+                                     "rps": round(len(latencies) / elapsed, 1),
+                                     "queries_per_request": round(sum(queries) / len(queries), 2)}
+        server.shutdown()
+        server.server_close()
+
+    config = {key: value for key, value in vars(arguments).items() if key != "json"}
+    if arguments.json:
+        print(json.dumps({"commit": get_commit(), "config": config, "results": results}, indent=2))
+    else:
+        print("{:<18}{:>10}{:>8}{:>10}{:>10}{:>10}{:>10}{:>10}".format(
+            "endpoint", "requests", "errors", "p50 ms", "p95 ms", "p99 ms", "rps", "queries"))
+        for endpoint, result in results.items():
+            print("{:<18}{requests:>10}{errors:>8}{p50_ms:>10}{p95_ms:>10}{p99_ms:>10}{rps:>10}"
+                  "{queries_per_request:>10}".format(endpoint, **result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark of the HTML parser backends of utb.parsers over the saved pages in benchmarks/fixtures, against
+the previous implementation (whole page parsed by BeautifulSoup with html.parser).
+Every page is fed to utb.pages.extract_title in chunks of utb.pages.CHUNK_SIZE, as it is when it is downloaded.
+
+Usage: python benchmarks/bench_html_parsers.py [--backends lxml,regex,html.parser,bs4] [--number 20] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utb import pages, parsers  # noqa: E402
+
+FIXTURES_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def baseline_extract_title(page):
+    """
+    The implementation of parse_article_name_from_url before the streaming extractor
+    """
+    soup = BeautifulSoup(page, "html.parser")
+    return soup.title.string if soup.title is not None else None, len(page)
+
+
+def backend_extract_title(page, backend):
+    chunks = (page[i:i + pages.CHUNK_SIZE] for i in range(0, len(page), pages.CHUNK_SIZE))
+    return pages.extract_title(chunks, backend=backend)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", default=",".join(parsers.BACKENDS),
+                        help="comma separated backends, the ones not installed are skipped")
+    parser.add_argument("--number", type=int, default=20, help="parses of every page for every implementation")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    arguments = parser.parse_args()
+
+    implementations = [("baseline", baseline_extract_title)]
+    for backend in arguments.backends.split(","):
+        if parsers.is_available(backend):
+            implementations.append((backend, lambda page, backend=backend: backend_extract_title(page, backend)))
+        else:
+            print("Skipping " + backend + ": not installed", file=sys.stderr)
+
+    results = []
+    for name in sorted(os.listdir(FIXTURES_DIRECTORY)):
+        with open(os.path.join(FIXTURES_DIRECTORY, name), "rb") as fixture:
+            page = fixture.read()
+        for implementation, function in implementations:
+            title, bytes_read = function(page)
+            best_ms = min(timeit.repeat(lambda: function(page), number=1, repeat=arguments.number)) * 1000
+            results.append({"page": name, "implementation": implementation, "bytes_read": bytes_read,
+                            "best_ms": round(best_ms, 3), "title": title.strip() if title else title})
+
+    if arguments.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("{:<22}{:<14}{:>12}{:>10}  {}".format("page", "impl", "bytes read", "best ms", "title"))
+        for result in results:
+            print("{page:<22}{implementation:<14}{bytes_read:>12}{best_ms:>10}  {title}".format(**result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark of the request body decoding: the previous helpers (the body decoded by check_google_token
+and twice by get_object) against utils.get_body, which decodes it once, with the json module and with orjson.
+
+Usage: python benchmarks/bench_json_body.py [--items 10,1000,10000] [--number 200] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.test.client import RequestFactory  # noqa: E402
+
+from utb import utils  # noqa: E402
+
+
+def make_body(n_items):
+    """
+    :param n_items: the number of items in the object
+    :return: a request body with a token and an object with n_items reports
+    """
+    return json.dumps({"token": "x" * 1200,
+                       "object": {"reports": [{"url": "https://www.website.com/news/article-" + str(i),
+                                               "report": "L"} for i in range(n_items)]}})
+
+
+def baseline(request):
+    """
+    The body decoding done by check_google_token and get_object before utils.get_body
+    """
+    json.loads(request.body)["token"]
+    if "object" in json.loads(request.body):
+        json.loads(request.body)["object"]
+
+
+def single_decode(request):
+    utils.get_token(request)
+    utils.get_object(request)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", default="10,1000,10000", help="comma separated numbers of items in the object")
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    arguments = parser.parse_args()
+
+    rf = RequestFactory()
+    results = []
+    for n_items in [int(items) for items in arguments.items.split(",")]:
+        body = make_body(n_items)
+
+        def run(function):
+            # a new request every time, since the decoded body is stored on the request
+            requests = [rf.post("get_article", data=body, content_type="application/json")
+                        for _ in range(arguments.number)]
+            iterator = iter(requests)
+            return timeit.timeit(lambda: function(next(iterator)), number=arguments.number) / arguments.number
+
+        with patch.object(utils, "orjson", None):
+            results.append({"items": n_items, "bytes": len(body), "implementation": "3x json",
+                            "us_per_request": round(run(baseline) * 1e6, 2)})
+            results.append({"items": n_items, "bytes": len(body), "implementation": "1x json",
+                            "us_per_request": round(run(single_decode) * 1e6, 2)})
+        if utils.orjson is not None:
+            results.append({"items": n_items, "bytes": len(body), "implementation": "1x orjson",
+                            "us_per_request": round(run(single_decode) * 1e6, 2)})
+
+    if arguments.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("{:>8}{:>12}  {:<12}{:>16}".format("items", "bytes", "impl", "us/request"))
+        for result in results:
+            print("{items:>8}{bytes:>12}  {implementation:<12}{us_per_request:>16}".format(**result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark of the article name extraction: the previous implementation (new PoolManager for every page,
+whole body downloaded and parsed by BeautifulSoup) against utb.pages.fetch_page_async (page
+streamed until the title is found).
+The pages are generated in a temporary directory and served by a local HTTP server.
+
+Usage: python benchmarks/bench_title_extraction.py [--sizes 100,1000,5000] [--repeat 5] [--json]
+the sizes are in KB
+"""
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import urllib3
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utb import pages  # noqa: E402
+
+HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<link rel="stylesheet" href="/static/style.css">
+<script>window.analytics = {"enabled": true, "id": "UA-000000"};</script>
+<title>A very important article about the news of the day | The Website</title>
+</head>
+<body>
+"""
+PARAGRAPH = "<div class=\"paragraph\"><p>Lorem ipsum dolor sit amet, <a href=\"/link\">consectetur</a> adipiscing " \
+            "elit, sed do eiusmod tempor incididunt ut labore et dolore magna aliqua.</p></div>\n"
+
+
+def generate_fixtures(directory, sizes):
+    """
+    :param directory: the directory where the pages are written
+    :param sizes: the sizes of the pages, in KB
+    :return: the list of the generated file names
+    """
+    names = []
+    for size in sizes:
+        name = "page_" + str(size) + "kb.html"
+        with open(os.path.join(directory, name), "w") as page:
+            page.write(HEAD)
+            page.write(PARAGRAPH * (size * 1024 // len(PARAGRAPH)))
+            page.write("</body></html>")
+        names.append(name)
+    return names
+
+
+def baseline_fetch_title(url):
+    """
+    The implementation of parse_article_name_from_url before the shared pool and the streaming extractor
+    """
+    http = urllib3.PoolManager()
+    response = http.request("GET", url)
+    soup = BeautifulSoup(response.data, "html.parser")
+    return soup.title.string, len(response.data)
+
+
+def streaming_fetch_title(url):
+    """
+    The current implementation, run in its own event loop
+    """
+    page = asyncio.run(pages.fetch_page_async(url))
+    return page.title, page.bytes_read
+
+
+def measure(function, url, repeat):
+    """
+    :return: the tuple (best time in ms, bytes read)
+    """
+    times = []
+    bytes_read = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _, bytes_read = function(url)
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times), bytes_read
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def copyfile(self, source, outputfile):
+        try:
+            super().copyfile(source, outputfile)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the streaming extractor closes the connection as soon as it has the title
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000,5000", help="comma separated page sizes in KB")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    arguments = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        names = generate_fixtures(directory, [int(size) for size in arguments.sizes.split(",")])
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(QuietHandler, directory=directory))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            for name in names:
+                url = "http://127.0.0.1:" + str(server.server_port) + "/" + name
+                for implementation, function in (("baseline", baseline_fetch_title),
+                                                 ("streaming", streaming_fetch_title)):
+                    best_ms, bytes_read = measure(function, url, arguments.repeat)
+                    results.append({"page": name, "implementation": implementation,
+                                    "bytes_read": bytes_read, "best_ms": round(best_ms, 3)})
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    if arguments.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("{:<22}{:<12}{:>14}{:>12}".format("page", "impl", "bytes read", "best ms"))
+        for result in results:
+            print("{page:<22}{implementation:<12}{bytes_read:>14}{best_ms:>12}".format(**result))
+
+
+if __name__ == "__main__":
+    main()
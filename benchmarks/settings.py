@@ -0,0 +1,24 @@
+"""
+Settings used by the benchmarks: the project settings with a local SQLite database, so that the benchmarks
+don't need the production database or a dev_settings file.
+UTB_BENCHMARK_DB_MODE chooses how the connections are handled: "close" (a new connection for every request,
+the default), "persistent" (CONN_MAX_AGE) or "pool" (utb.backends.sqlite3_pool)
+"""
+import os
+
+from uncookthebook.settings import *  # noqa: F401,F403
+
+SECRET_KEY = os.environ.get("UTB_BENCHMARK_SECRET_KEY", "benchmark")
+
+DB_MODE = os.environ.get("UTB_BENCHMARK_DB_MODE", "close")
+
+DATABASES = {
+    "default": {
+        "ENGINE": "utb.backends.sqlite3_pool" if DB_MODE == "pool" else "django.db.backends.sqlite3",
+        "NAME": os.environ.get("UTB_BENCHMARK_DATABASE", os.path.join(BASE_DIR, "benchmark.sqlite3")),  # noqa: F405
+        "CONN_MAX_AGE": 60 if DB_MODE == "persistent" else 0,
+        "CONN_HEALTH_CHECKS": True,
+        # the concurrent benchmarks wait for the write lock instead of failing
+        "OPTIONS": {"timeout": 30},
+    }
+}
@@ -1,3 +1,28 @@
 DATABASE_USER = 'YOUR_USER_HERE'
 DATABASE_PASSWORD = 'YOUR_PASSWORD_HERE'
 SECRET_KEY = 'YOUR_SECRET_KEY_HERE'
+
+# Existing databases: run "python manage.py migrate utb 0001 --fake-initial" once before "migrate" (see README.md)
+
+# Optional settings, uncomment to override the defaults
+# UTB_TASKS_WORKERS = 4  # threads fetching the articles' names in background
+# UTB_TASKS_RETRIES = 3  # how many times a failed background task is retried
+# UTB_TASKS_RETRY_DELAY = 2.0  # seconds before the first retry, doubled at each retry
+# UTB_TASKS_ASYNC_CONCURRENCY = 100  # web pages downloaded at the same time in background
+# UTB_TASKS_GROUP_CONCURRENCY = 4  # web pages of the same website downloaded at the same time in background
+# UTB_PAGE_TTL = 604800  # seconds before a downloaded page is checked again with a conditional request
+# UTB_PAGE_RETRY_DELAY = 60  # seconds before a page that failed is downloaded again, doubled at each failure
+# UTB_PAGE_MAX_RETRY_DELAY = 86400  # maximum seconds before a page that failed is downloaded again
+# UTB_HTML_PARSER = "auto"  # parser of the pages: "lxml" (if installed), "regex", "html.parser", "bs4" or "auto"
+# UTB_ASYNC_VIEWS = False  # set to True when serving the app through ASGI (uncookthebook.asgi)
+# UTB_CACHE = "default"  # name of the cache, in CACHES, storing the articles and the websites
+# UTB_CACHE_TIMEOUT = 300  # seconds an article or a website is kept in the cache
+# UTB_USER_CACHE_TIMEOUT = 0  # seconds a user is kept in the process cache of the read-only endpoints, 0 to disable
+# UTB_REPORTS_WRITE_BEHIND = False  # True to update the articles' tallies in periodic flushes instead of at every report
+# UTB_REPORTS_FLUSH_INTERVAL = 50  # milliseconds between the flushes of the pending reports
+# UTB_FOLLOW_CANONICAL = False  # True to make the rel=canonical url of a new article's page an alias of the article
+# CACHES = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+#                       "LOCATION": "/var/tmp/uncookthebook_cache"}}  # cache shared by all the server processes
+# DATABASE_CONN_MAX_AGE = 60  # seconds a database connection is kept open, None to keep it forever
+# DATABASE_HEALTH_CHECKS = True  # check that a persistent connection still works before reusing it
+# DATABASE_POOL = {"MAX_IDLE": 10, "MAX_IDLE_TIME": 300}  # keep the connections in an in-process pool instead
@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "utb.metrics.MetricsMiddleware",
+    "utb.users.IdentityMapMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -73,17 +75,40 @@ WSGI_APPLICATION = "uncookthebook.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+# The connections are persistent, so that the TLS handshake with the database is done once every CONN_MAX_AGE
+# seconds instead of once per request, and CONN_HEALTH_CHECKS replaces the connections dropped by the database.
+# If DATABASE_POOL is defined in dev_settings, the connections are kept instead in an in-process pool (see utb.db)
+
+DATABASE_POOL = globals().get("DATABASE_POOL")
+
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "utb.backends.postgresql_pool" if DATABASE_POOL else "django.db.backends.postgresql",
         "NAME": "uncookthebook",
         "USER": DATABASE_USER,
         "PASSWORD": DATABASE_PASSWORD,
         "HOST": "uncookthebook.cbswwe7mev1r.eu-west-1.rds.amazonaws.com",
         "PORT": "5432",
+        # with the pool the connections are given back at the end of every request
+        "CONN_MAX_AGE": 0 if DATABASE_POOL else globals().get("DATABASE_CONN_MAX_AGE", 60),
+        "CONN_HEALTH_CHECKS": globals().get("DATABASE_HEALTH_CHECKS", True),
+        "POOL": DATABASE_POOL or {},
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# The local-memory cache is private to each server process. To share it, define CACHES in dev_settings, e.g. with
+# the "django.core.cache.backends.filebased.FileBasedCache" backend, or with
+# "django.core.cache.backends.db.DatabaseCache" after running "python manage.py createcachetable"
+
+CACHES = globals().get("CACHES", {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "uncookthebook",
+    }
+})
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class UtbConfig(AppConfig):
     name = "utb"
+
+    def ready(self):
+        from django.core.signals import request_started
+        from django.db.backends.signals import connection_created
+        from utb.db import check_connections
+        from utb.metrics import install_query_timer
+
+        request_started.connect(check_connections)
+        connection_created.connect(install_query_timer)
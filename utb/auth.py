@@ -0,0 +1,290 @@
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import httpx
+from google.auth import exceptions, jwt
+from google.auth.transport import requests
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+
+# used when Google does not tell us for how long the certificates can be cached
+DEFAULT_CERTS_MAX_AGE = 300
+
+# minimum number of seconds between two fetches forced by an unknown key id, so that tokens signed
+# with made up key ids can't make us download the certificates on every request
+MIN_FORCED_REFRESH_INTERVAL = 60
+
+TOKEN_CACHE_MAX_SIZE = 10000
+
+ASYNC_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+
+MAX_AGE_REGEX = re.compile(r"max-age=(\d+)")
+
+
+def parse_max_age(headers):
+    """
+    Computes for how many seconds a response can be cached, based on its Cache-Control and Age headers
+    :param headers: the response headers
+    :return: the number of seconds the response is still fresh, or None if the headers do not say it
+    """
+    headers = {key.lower(): value for key, value in (headers or {}).items()}
+    match = MAX_AGE_REGEX.search(headers.get("cache-control", ""))
+    if not match:
+        return None
+    try:
+        age = int(headers.get("age", 0))
+    except ValueError:
+        age = 0
+    return max(int(match.group(1)) - age, 0)
+
+
+class CertificateCache:
+    """
+    Keeps Google's signing certificates in memory until the expiry announced by the certs endpoint.
+    The requests that find the certificates expired wait for a single download
+    """
+
+    def __init__(self, request=None, certs_url=GOOGLE_CERTS_URL, clock=time.time, async_request=None,
+                 min_forced_refresh_interval=MIN_FORCED_REFRESH_INTERVAL):
+        """
+        :param request: the google.auth.transport.Request used to fetch the certificates.
+                        A single session is shared by all the fetches so that the connection is kept alive
+        :param certs_url: the url of the certificates endpoint
+        :param clock: function returning the current timestamp
+        :param async_request: coroutine function used to fetch the certificates from an event loop.
+                              It takes the url and returns a response with status, headers and data
+        :param min_forced_refresh_interval: the seconds after a fetch during which a forced refresh is ignored
+        """
+        self._request = request if request is not None else requests.Request()
+        self._async_request = async_request if async_request is not None else httpx_request
+        self._certs_url = certs_url
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._async_locks = {}  # event loop -> asyncio.Lock held while the loop downloads the certificates
+        self._certs = None
+        self._expires_at = 0
+        self._min_forced_refresh_interval = min_forced_refresh_interval
+        self._fetched_at = None
+
+    def is_fresh(self):
+        """
+        :return: True if the cached certificates can be used without fetching them again
+        """
+        return self._certs is not None and self._clock() < self._expires_at
+
+    def _needs_fetch(self, force_refresh):
+        if not self.is_fresh():
+            return True
+        # the certificates were fetched too recently to be out of date, the unknown key id is made up
+        return force_refresh and (self._fetched_at is None or
+                                  self._clock() - self._fetched_at >= self._min_forced_refresh_interval)
+
+    def get(self, force_refresh=False):
+        """
+        :param force_refresh: if True, the certificates are downloaded even if the cached ones are still valid,
+                              unless they were downloaded less than min_forced_refresh_interval seconds ago
+        :return: the mapping key id -> certificate
+        """
+        # the lock is held during the download, so the threads waiting for it find the certificates fresh
+        with self._lock:
+            if self._needs_fetch(force_refresh):
+                try:
+                    response = self._request(self._certs_url, method="GET")
+                except exceptions.TransportError:
+                    response = None
+                self._store(response)
+            return self._certs
+
+    async def get_async(self, force_refresh=False):
+        """
+        Asynchronous version of get: the certificates are downloaded without blocking the event loop
+        :param force_refresh: if True, the certificates are downloaded even if the cached ones are still valid,
+                              unless they were downloaded less than min_forced_refresh_interval seconds ago
+        :return: the mapping key id -> certificate
+        """
+        with self._lock:
+            if not self._needs_fetch(force_refresh):
+                return self._certs
+        # the coroutines waiting for the download find the certificates fresh once they get the lock
+        async with self._get_async_lock():
+            with self._lock:
+                needs_fetch = self._needs_fetch(force_refresh)
+                if needs_fetch:
+                    # claimed before awaiting, so that the forced refreshes of the other loops are skipped
+                    self._fetched_at = self._clock()
+            if needs_fetch:
+                try:
+                    response = await self._async_request(self._certs_url)
+                except exceptions.TransportError:
+                    response = None
+                with self._lock:
+                    self._store(response)
+        return self._certs
+
+    def _get_async_lock(self):
+        """
+        :return: the asyncio.Lock of the running event loop, the locks of the closed loops are dropped
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            for closed_loop in [other_loop for other_loop in self._async_locks if other_loop.is_closed()]:
+                del self._async_locks[closed_loop]
+            return self._async_locks.setdefault(loop, asyncio.Lock())
+
+    def _store(self, response):
+        self._fetched_at = self._clock()
+        if response is None or response.status != 200:
+            # if Google is unreachable we keep using the certificates we already have
+            if self._certs is None:
+                raise exceptions.TransportError("Could not fetch certificates at " + self._certs_url)
+            return
+        max_age = parse_max_age(response.headers)
+        self._certs = json.loads(response.data.decode("utf-8"))
+        self._expires_at = self._clock() + (max_age if max_age is not None else DEFAULT_CERTS_MAX_AGE)
+
+
+class HttpxResponse:
+    """
+    Adapts an httpx response to the interface of the google.auth transport responses
+    """
+
+    def __init__(self, response):
+        self.status = response.status_code
+        self.headers = response.headers
+        self.data = response.content
+
+
+async def httpx_request(url):
+    """
+    :param url: the url to get
+    :return: the response, as a HttpxResponse
+    """
+    try:
+        async with httpx.AsyncClient(timeout=ASYNC_TIMEOUT) as client:
+            return HttpxResponse(await client.get(url))
+    except httpx.HTTPError as error:
+        raise exceptions.TransportError(error)
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of the tokens that have already been verified.
+    Every entry expires together with its token
+    """
+
+    def __init__(self, max_size=TOKEN_CACHE_MAX_SIZE, clock=time.time):
+        """
+        :param max_size: the maximum number of tokens kept in memory
+        :param clock: function returning the current timestamp
+        """
+        self._max_size = max_size
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(token):
+        # the tokens are credentials, so we don't keep them in memory in clear
+        if isinstance(token, str):
+            token = token.encode("utf-8")
+        return hashlib.sha256(token).digest()
+
+    def get(self, token):
+        """
+        :param token: the encoded token
+        :return: the decoded token if it was verified and has not expired yet, otherwise None
+        """
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            id_info, expires_at = entry
+            if self._clock() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return id_info
+
+    def put(self, token, id_info):
+        """
+        Stores a verified token until its exp claim
+        :param token: the encoded token
+        :param id_info: the decoded token
+        """
+        expires_at = id_info.get("exp")
+        if expires_at is None:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (id_info, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TokenVerifier:
+    """
+    Verifies Google Sign-In tokens, caching both the signing certificates and the tokens already verified
+    """
+
+    def __init__(self, audience, certs=None, tokens=None):
+        """
+        :param audience: the client id the tokens must be issued for
+        :param certs: the CertificateCache to use
+        :param tokens: the VerifiedTokenCache to use
+        """
+        self.audience = audience
+        self.certs = certs if certs is not None else CertificateCache()
+        self.tokens = tokens if tokens is not None else VerifiedTokenCache()
+
+    def verify(self, token):
+        """
+        Verifies the token signature, expiration and audience
+        :param token: the encoded token
+        :return: the decoded token
+        :raise ValueError: if the token is invalid
+        """
+        id_info = self.tokens.get(token)
+        if id_info is not None:
+            return id_info
+
+        certs = self.certs.get()
+        # Google rotates its keys, so an unknown key id means that our certificates are old
+        if jwt.decode_header(token).get("kid") not in certs:
+            certs = self.certs.get(force_refresh=True)
+        id_info = jwt.decode(token, certs=certs, audience=self.audience)
+
+        self.tokens.put(token, id_info)
+        return id_info
+
+    async def verify_async(self, token):
+        """
+        Asynchronous version of verify: the certificates are downloaded without blocking the event loop
+        :param token: the encoded token
+        :return: the decoded token
+        :raise ValueError: if the token is invalid
+        """
+        id_info = self.tokens.get(token)
+        if id_info is not None:
+            return id_info
+
+        certs = await self.certs.get_async()
+        if jwt.decode_header(token).get("kid") not in certs:
+            certs = await self.certs.get_async(force_refresh=True)
+        id_info = jwt.decode(token, certs=certs, audience=self.audience)
+
+        self.tokens.put(token, id_info)
+        return id_info
@@ -0,0 +1,27 @@
+"""
+PostgreSQL backend keeping the connections in an in-process pool, see utb.db.ConnectionPool
+"""
+import psycopg2
+from django.db.backends.postgresql import base
+
+from utb.db import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+
+    def reset_pooled_connection(self, connection):
+        if connection.closed:
+            return False
+        if connection.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            connection.rollback()
+        return True
+
+    def check_pooled_connection(self, connection):
+        if connection.closed:
+            return False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except psycopg2.Error:
+            return False
+        return True
@@ -0,0 +1,24 @@
+"""
+SQLite backend keeping the connections in an in-process pool, see utb.db.ConnectionPool.
+Opening a SQLite connection is cheap, so it is mostly a local stand-in for postgresql_pool
+"""
+import sqlite3
+
+from django.db.backends.sqlite3 import base
+
+from utb.db import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+
+    def reset_pooled_connection(self, connection):
+        if connection.in_transaction:
+            connection.rollback()
+        return True
+
+    def check_pooled_connection(self, connection):
+        try:
+            connection.execute("SELECT 1")
+        except sqlite3.Error:
+            return False
+        return True
@@ -0,0 +1,202 @@
+from collections import Counter, OrderedDict
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+DEFAULT_CACHE_ALIAS = "default"
+DEFAULT_CACHE_TIMEOUT = 300
+DEFAULT_USER_CACHE_TIMEOUT = 0
+USER_CACHE_MAX_ENTRIES = 10000
+
+ARTICLE_KEY = "utb:article:{}"
+WEBSITE_KEY = "utb:website:{}"
+
+
+class PayloadCache:
+    """
+    Read-through cache of the payloads returned by get_article.
+    The article and its website are stored under different keys, since a change of the website counters must not
+    invalidate all of its articles.
+    The cache is the one named settings.UTB_CACHE (by default "default"), and the entries expire after
+    settings.UTB_CACHE_TIMEOUT seconds
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = Counter()
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, "UTB_CACHE", DEFAULT_CACHE_ALIAS)]
+
+    @property
+    def timeout(self):
+        return getattr(settings, "UTB_CACHE_TIMEOUT", DEFAULT_CACHE_TIMEOUT)
+
+    def get_article(self, article_id):
+        """
+        :param article_id: the article id
+        :return: the dict {"article": article.as_dict(), "website_id": website id}, or None if it is not cached
+        """
+        return self._get("article", ARTICLE_KEY.format(article_id))
+
+    def set_article(self, article, website_id):
+        """
+        :param article: the article
+        :param website_id: the id of the article's website
+        """
+        self.cache.set(ARTICLE_KEY.format(article.id), {"article": article.as_dict(), "website_id": website_id},
+                       self.timeout)
+
+    def get_website(self, website_id):
+        """
+        :param website_id: the website id
+        :return: website.as_dict(), or None if it is not cached
+        """
+        return self._get("website", WEBSITE_KEY.format(website_id))
+
+    def set_website(self, website):
+        """
+        :param website: the website
+        """
+        self.cache.set(WEBSITE_KEY.format(website.id), website.as_dict(), self.timeout)
+
+    def invalidate_article(self, article_id):
+        """
+        :param article_id: the id of the article that changed
+        """
+        self._invalidate(ARTICLE_KEY.format(article_id))
+
+    def invalidate_website(self, website_id):
+        """
+        :param website_id: the id of the website that changed
+        """
+        self._invalidate(WEBSITE_KEY.format(website_id))
+
+    def invalidate_many(self, article_ids, website_ids):
+        """
+        :param article_ids: the ids of the articles that changed
+        :param website_ids: the ids of the websites that changed
+        """
+        keys = [ARTICLE_KEY.format(article_id) for article_id in article_ids] + \
+               [WEBSITE_KEY.format(website_id) for website_id in website_ids]
+        self.cache.delete_many(keys)
+        transaction.on_commit(lambda: self.cache.delete_many(keys))
+
+    def stats(self):
+        """
+        :return: the dict with the number of hits and misses of the articles and the websites
+        """
+        with self._lock:
+            return {name: self._counters[name] for name in
+                    ("article_hits", "article_misses", "website_hits", "website_misses")}
+
+    def reset_stats(self):
+        with self._lock:
+            self._counters.clear()
+
+    def _get(self, kind, key):
+        value = self.cache.get(key)
+        with self._lock:
+            self._counters[kind + ("_misses" if value is None else "_hits")] += 1
+        return value
+
+    def _invalidate(self, key):
+        # the entry is deleted now and again once the transaction is committed, so that a request reading the
+        # database before the commit can't keep the old payload in the cache
+        self.cache.delete(key)
+        transaction.on_commit(lambda: self.cache.delete(key))
+
+
+class UserCache:
+    """
+    Process-wide cache of the users read by the read-only endpoints, as dicts of their fields.
+    The entries expire after settings.UTB_USER_CACHE_TIMEOUT seconds (by default 0, that disables the cache), and
+    are dropped as soon as the weight or the number of reports of a user changes in this process.
+    The timeout bounds how long a change made by another server process is not seen
+    """
+
+    def __init__(self, clock=time.monotonic):
+        """
+        :param clock: the function returning the current time in seconds
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._users = OrderedDict()  # user id -> (expiration time, fields)
+
+    @property
+    def timeout(self):
+        return getattr(settings, "UTB_USER_CACHE_TIMEOUT", DEFAULT_USER_CACHE_TIMEOUT)
+
+    def get(self, user_id):
+        """
+        :param user_id: the user id
+        :return: the dict of the fields of the user, or None if it is not cached or expired
+        """
+        if not self.timeout:
+            return None
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= self._clock():
+                del self._users[user_id]
+                return None
+            return dict(entry[1])
+
+    def set(self, user):
+        """
+        :param user: the user, read from the database
+        """
+        if not self.timeout:
+            return
+        fields = {field.attname: getattr(user, field.attname) for field in user._meta.concrete_fields}
+        with self._lock:
+            self._users.pop(user.id, None)
+            self._users[user.id] = (self._clock() + self.timeout, fields)
+            # the oldest entries are dropped first
+            while len(self._users) > USER_CACHE_MAX_ENTRIES:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """
+        :param user_id: the id of the user that changed
+        """
+        self._invalidate(lambda: self._users.pop(user_id, None))
+
+    def invalidate_many(self, user_ids):
+        """
+        :param user_ids: the ids of the users that changed
+        """
+        user_ids = list(user_ids)
+
+        def drop():
+            for user_id in user_ids:
+                self._users.pop(user_id, None)
+
+        self._invalidate(drop)
+
+    def clear(self):
+        """
+        Drops all the users, e.g. after an UPDATE of all the users
+        """
+        self._invalidate(self._users.clear)
+
+    def _invalidate(self, drop):
+        # as in PayloadCache, the entries are dropped now and again once the transaction is committed
+        if not self.timeout:
+            return
+
+        def locked_drop():
+            with self._lock:
+                drop()
+
+        locked_drop()
+        transaction.on_commit(locked_drop)
+
+
+payload_cache = PayloadCache()
+user_cache = UserCache()
@@ -0,0 +1,107 @@
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+import re
+
+from django.db.models import Q
+
+from utb import utils
+from utb.models import ArticleAlias
+
+# parameters added by newsletters, social networks and ad networks, that don't change the page
+TRACKING_PARAMETERS = {"fbclid", "gclid", "dclid", "gclsrc", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+                       "_ga", "_gl", "ref_src", "ocid", "cmpid", "smid", "amp"}
+TRACKING_PREFIXES = ("utm_",)
+
+AMP_PATH_REGEX = re.compile(r"/amp/?$", re.IGNORECASE)
+
+
+def canonicalize(url):
+    """
+    Normalizes the url of an article, so that the variants of the same page share the same Article:
+    the scheme becomes https, the host is lowercased and loses the default port and the "amp." subdomain,
+    the "/amp" path suffix, the tracking parameters and the fragment are removed.
+    The other parameters are kept in their order and encoding.
+    The canonical url is only hashed into the article id: the article keeps the url it was submitted with, since
+    the canonical one may not be served
+    :param url: the url of the article
+    :return: the canonical url, or the input url if it isn't an http(s) url
+    """
+    if not isinstance(url, str):
+        return url
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+        return url
+
+    host = parts.hostname
+    if host.startswith("amp."):
+        host = host[len("amp."):]
+    if ":" in host:
+        host = "[" + host + "]"  # IPv6 address
+    netloc = host if port in (None, 80, 443) else host + ":" + str(port)
+
+    path = AMP_PATH_REGEX.sub("", parts.path) or "/"
+    query = "&".join(parameter for parameter in parts.query.split("&")
+                     if parameter and not is_tracking_parameter(parameter))
+    return urlunsplit(("https", netloc, path, query, ""))
+
+
+def is_tracking_parameter(parameter):
+    """
+    :param parameter: a "name=value" parameter of a query string
+    :return: True if the parameter only tracks the visit, or asks for the AMP version of the page
+    """
+    name, _, value = parameter.partition("=")
+    name = unquote_plus(name).lower()
+    return name in TRACKING_PARAMETERS or name.startswith(TRACKING_PREFIXES) or (
+            name == "outputtype" and value.lower() == "amp")
+
+
+def get_host(url):
+    """
+    :param url: the url of an article
+    :return: the lowercase host of the url, or None if the url has no valid host
+    """
+    try:
+        return urlsplit(url).hostname
+    except ValueError:
+        return None
+
+
+def get_article_id(url):
+    """
+    :param url: the url of an article
+    :return: the id of the article, as the hash of its canonical url
+    """
+    return utils.hash_digest(canonicalize(url))
+
+
+def find_articles(queryset, article_ids):
+    """
+    Reads the articles with the input ids, or with aliases with the input ids, with a single query.
+    A second query maps the aliases back to the input ids, only if some article was found through an alias
+    :param queryset: the articles, e.g. with select_related or select_for_update
+    :param article_ids: the ids of the articles, as returned by get_article_id
+    :return: the dict input id -> Article, without the ids of the missing articles
+    """
+    article_ids = set(article_ids)
+    articles = list(queryset.filter(Q(id__in=article_ids) |
+                                    Q(id__in=ArticleAlias.objects.filter(id__in=article_ids).values("article"))))
+    found = {article.id: article for article in articles if article.id in article_ids}
+    aliased = {article.id: article for article in articles if article.id not in article_ids}
+    if aliased:
+        for alias_id, target_id in ArticleAlias.objects.filter(id__in=article_ids, article__in=aliased.keys()) \
+                .values_list("id", "article"):
+            found.setdefault(alias_id, aliased[target_id])
+    return found
+
+
+def find_article(queryset, article_id):
+    """
+    :param queryset: the articles, e.g. with select_related or select_for_update
+    :param article_id: the id of the article, as returned by get_article_id
+    :return: the article with the id or the alias, or None if it doesn't exist
+    """
+    return find_articles(queryset, [article_id]).get(article_id)
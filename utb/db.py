@@ -0,0 +1,157 @@
+import abc
+from collections import deque
+import functools
+import logging as log
+import threading
+import time
+
+from django.db import connections
+
+LOGGING_TAG = "Db: "
+
+DEFAULT_POOL_MAX_IDLE = 10
+DEFAULT_POOL_MAX_IDLE_TIME = 300
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    In-process pool of database connections, shared by all the threads of the server.
+    It works the same under WSGI, where every request runs on its own thread, and under ASGI, where the database
+    work runs in the threads of sync_to_async.
+    The pool never blocks: when no connection is idle a new one is opened, and a released connection that doesn't
+    fit in the pool is closed
+    """
+
+    def __init__(self, max_idle=DEFAULT_POOL_MAX_IDLE, max_idle_time=DEFAULT_POOL_MAX_IDLE_TIME,
+                 health_checks=False, clock=time.monotonic):
+        """
+        :param max_idle: the maximum number of idle connections kept open
+        :param max_idle_time: seconds after which an idle connection is closed instead of being reused
+        :param health_checks: if True, a connection is checked before being reused
+        :param clock: function returning the current time in seconds
+        """
+        self.max_idle = max_idle
+        self.max_idle_time = max_idle_time
+        self.health_checks = health_checks
+        self.created = 0
+        self.reused = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._idle = deque()
+
+    def get(self, create, check=None):
+        """
+        :param create: function opening a new connection
+        :param check: function returning True if a connection still works, used when health_checks is True
+        :return: an idle connection, or a new one
+        """
+        while True:
+            with self._lock:
+                if not self._idle:
+                    self.created += 1
+                    break
+                # the most recently used connection is the one most likely to be still alive
+                connection, released_at = self._idle.pop()
+            if self._clock() - released_at > self.max_idle_time or (
+                    self.health_checks and check is not None and not check(connection)):
+                close_quietly(connection)
+                continue
+            with self._lock:
+                self.reused += 1
+            return connection
+        return create()
+
+    def put(self, connection):
+        """
+        Gives back a connection, that must not be in a transaction
+        :param connection: the connection
+        """
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((connection, self._clock()))
+                return
+        close_quietly(connection)
+
+    def close_all(self):
+        """
+        Closes all the idle connections
+        """
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            close_quietly(connection)
+
+    def __len__(self):
+        return len(self._idle)
+
+
+def get_pool(alias, settings_dict):
+    """
+    :param alias: the alias of the database
+    :param settings_dict: the settings of the database, whose "POOL" dict can define "MAX_IDLE" and "MAX_IDLE_TIME"
+    :return: the ConnectionPool of the database
+    """
+    with _pools_lock:
+        if alias not in _pools:
+            options = settings_dict.get("POOL") or {}
+            _pools[alias] = ConnectionPool(max_idle=options.get("MAX_IDLE", DEFAULT_POOL_MAX_IDLE),
+                                           max_idle_time=options.get("MAX_IDLE_TIME", DEFAULT_POOL_MAX_IDLE_TIME),
+                                           health_checks=settings_dict.get("CONN_HEALTH_CHECKS", False))
+        return _pools[alias]
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception as error:
+        log.warning(LOGGING_TAG + "Could not close a connection: " + str(error))
+
+
+class PooledDatabaseWrapperMixin(abc.ABC):
+    """
+    Mixin for the DatabaseWrapper of a backend, taking the connections from the ConnectionPool of the database
+    instead of opening a new one, and giving them back instead of closing them.
+    The backend must implement the abstract reset_pooled_connection and check_pooled_connection
+    """
+
+    def get_new_connection(self, conn_params):
+        create = functools.partial(super().get_new_connection, conn_params)
+        return get_pool(self.alias, self.settings_dict).get(create, self.check_pooled_connection)
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # a connection in a broken state is not worth saving
+        if self.in_atomic_block or self.errors_occurred or not self.reset_pooled_connection(self.connection):
+            return super()._close()
+        get_pool(self.alias, self.settings_dict).put(self.connection)
+
+    @abc.abstractmethod
+    def reset_pooled_connection(self, connection):
+        """
+        :param connection: the connection that is being released
+        :return: True if the connection can be reused
+        """
+
+    @abc.abstractmethod
+    def check_pooled_connection(self, connection):
+        """
+        :param connection: an idle connection
+        :return: True if the connection still works
+        """
+
+
+def check_connections(**kwargs):
+    """
+    Health check of the persistent connections, run when a request starts.
+    If the database dropped a connection kept open by CONN_MAX_AGE, it is closed so that the request opens a new one
+    instead of failing on its first query. Only the databases with CONN_HEALTH_CHECKS are checked
+    """
+    for connection in connections.all():
+        if connection.settings_dict.get("CONN_HEALTH_CHECKS") and connection.connection is not None \
+                and not connection.in_atomic_block and not connection.is_usable():
+            log.warning(LOGGING_TAG + "Closing unusable connection to " + connection.alias)
+            connection.close()
@@ -0,0 +1,48 @@
+from django.db import models
+
+DIGEST_SIZE = 32  # bytes of a SHA-256 digest
+
+
+class HashField(models.Field):
+    """
+    SHA-256 digest (see utils.hash_digest) stored as 32 bytes instead of 64 hex characters, which halves the size
+    of the column, of its indexes and of the foreign keys to it.
+    The Python value is still the hex string, so the callers and the as_dict methods don't see the difference.
+    Raw bytes are passed to the database as they are, e.g. to match the rows that the migration
+    to binary keys didn't convert yet
+    """
+    description = "SHA-256 digest"
+
+    def get_internal_type(self):
+        return "BinaryField"
+
+    def db_type(self, connection):
+        # the variable size blob of MySQL and Oracle can't be a key
+        return {"mysql": "binary(32)", "oracle": "RAW(32)"}.get(connection.vendor, super().db_type(connection))
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None or isinstance(value, (bytes, memoryview)):
+            return value
+        try:
+            digest = bytes.fromhex(value)
+        except (TypeError, ValueError) as error:
+            raise error.__class__("Field '%s' expected a hex digest but got %r." % (self.name, value)) from error
+        if len(digest) != DIGEST_SIZE:
+            raise ValueError("Field '%s' expected a hex digest but got %r." % (self.name, value))
+        return digest
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        return connection.Database.Binary(value) if value is not None else None
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if isinstance(value, (bytes, memoryview)):
+            value = bytes(value)
+            # a row not converted yet by the migration keeps the hex digest as ASCII
+            return value.hex() if len(value) == DIGEST_SIZE else value.decode("ascii")
+        return value
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from utb.models import WebsiteCounterDelta
+
+
+class Command(BaseCommand):
+    help = "Folds the pending WebsiteCounterDelta rows into the counters of their websites"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=10000, help="deltas compacted in a transaction")
+        parser.add_argument("--interval", type=float, default=None,
+                            help="if given, the compaction runs again every INTERVAL seconds until interrupted")
+
+    def handle(self, *args, **options):
+        while True:
+            compacted = WebsiteCounterDelta.objects.compact(chunk_size=options["chunk_size"])
+            self.stdout.write("Compacted " + str(compacted) + " website counter deltas")
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
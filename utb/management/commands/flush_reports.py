@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from utb import write_behind
+
+
+class Command(BaseCommand):
+    help = "Applies the reports pending in write-behind mode to the tallies of their articles"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=write_behind.FLUSH_CHUNK_SIZE,
+                            help="the articles of CHUNK_SIZE pending reports are flushed in a transaction")
+        parser.add_argument("--interval", type=float, default=None,
+                            help="if given, the flush runs again every INTERVAL seconds until interrupted")
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = 0
+            while True:
+                chunk = write_behind.flush(chunk_size=options["chunk_size"])
+                if not chunk:
+                    break
+                flushed += chunk
+            self.stdout.write("Flushed " + str(flushed) + " pending reports")
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from utb import replay
+
+
+class Command(BaseCommand):
+    help = "Replays the report events and rewrites the weights of the users, the article tallies and the " \
+           "website counters. The reports made before the event log was added only have their last value in it, " \
+           "so the replay never goes back before the baseline checkpoint that saved their state"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true",
+                            help="replay all the events after the baseline checkpoint, or all of them if there is "
+                                 "none, instead of the new ones")
+        parser.add_argument("--chunk-size", type=int, default=replay.CHUNK_SIZE, help="events read with a query")
+
+    def handle(self, *args, **options):
+        replayed = replay.replay(full=options["full"], chunk_size=options["chunk_size"])
+        self.stdout.write("Replayed " + str(replayed) + " report events")
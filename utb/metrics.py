@@ -0,0 +1,222 @@
+from contextlib import contextmanager
+import asyncio
+import bisect
+import contextvars
+import json
+import logging as log
+import threading
+import time
+
+LOGGING_TAG = "Metrics: "
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# the metrics of the request being processed, shared by the threads of sync_to_async through the context
+current_request = contextvars.ContextVar("utb_request_metrics", default=None)
+
+
+class Histogram:
+    """
+    In-process histogram with labels, rendered in the Prometheus text format
+    """
+
+    def __init__(self, name, description, label_name, buckets=DURATION_BUCKETS):
+        """
+        :param name: the name of the metric
+        :param description: the help text of the metric
+        :param label_name: the name of the label distinguishing the series
+        :param buckets: the upper bounds of the buckets
+        """
+        self.name = name
+        self.description = description
+        self.label_name = label_name
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, label, value):
+        """
+        :param label: the value of the label
+        :param value: the observed value
+        """
+        with self._lock:
+            counts, total = self._series.get(label, ([0] * (len(self.buckets) + 1), 0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._series[label] = (counts, total + value)
+
+    def render(self):
+        """
+        :return: the lines of the histogram in the Prometheus text format
+        """
+        lines = ["# HELP " + self.name + " " + self.description, "# TYPE " + self.name + " histogram"]
+        with self._lock:
+            series = sorted((label, list(counts), total) for label, (counts, total) in self._series.items())
+        for label, counts, total in series:
+            cumulative = 0
+            for bound, count in zip([str(bound) for bound in self.buckets] + ["+Inf"], counts):
+                cumulative += count
+                lines.append('{}_bucket{{{}="{}",le="{}"}} {}'.format(self.name, self.label_name, label, bound,
+                                                                    cumulative))
+            lines.append('{}_sum{{{}="{}"}} {}'.format(self.name, self.label_name, label, total))
+            lines.append('{}_count{{{}="{}"}} {}'.format(self.name, self.label_name, label, cumulative))
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+request_duration = Histogram("utb_request_duration_seconds", "Time spent processing the requests", "endpoint")
+request_queries = Histogram("utb_request_queries", "Number of queries executed by the requests", "endpoint",
+                            buckets=QUERY_BUCKETS)
+span_duration = Histogram("utb_span_duration_seconds", "Time spent in token verification, page fetches and ORM",
+                          "span")
+
+
+class RequestMetrics:
+    """
+    Time spent by a request in each span, and the number of queries it executed
+    """
+
+    def __init__(self):
+        self.spans = {}
+        self.queries = 0
+
+    def add(self, name, duration):
+        self.spans[name] = self.spans.get(name, 0) + duration
+
+    def server_timing(self, total):
+        """
+        :param total: the duration of the request in seconds
+        :return: the value of the Server-Timing header
+        """
+        entries = []
+        for name, duration in sorted(self.spans.items()):
+            entry = "{};dur={:.2f}".format(name, duration * 1000)
+            if name == "db":
+                entry += ';desc="{} queries"'.format(self.queries)
+            entries.append(entry)
+        entries.append("total;dur={:.2f}".format(total * 1000))
+        return ", ".join(entries)
+
+
+def record(name, duration):
+    """
+    Adds the duration to the span of the current request, if any, and to the span histogram
+    :param name: the name of the span
+    :param duration: the duration in seconds
+    """
+    metrics = current_request.get()
+    if metrics is not None:
+        metrics.add(name, duration)
+    span_duration.observe(name, duration)
+
+
+@contextmanager
+def span(name):
+    """
+    Measures the time spent in the block, e.g. with metrics.span("token"): ...
+    :param name: the name of the span
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding every query to the "db" span
+    """
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.queries += 1
+        record("db", time.perf_counter() - start)
+
+
+def install_query_timer(connection, **kwargs):
+    """
+    Receiver of connection_created, so that all the queries of every connection are timed
+    :param connection: the new connection
+    """
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class MetricsMiddleware:
+    """
+    Measures every request: the spans are added to the Server-Timing header and to a structured log line,
+    and the durations are aggregated in the histograms served by the metrics endpoint.
+    Under ASGI the middleware is asynchronous, so that the asynchronous views are not run in a thread
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # marks the instance as a coroutine function, as django.utils.deprecation.MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.process_response(request, response, metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        return self.process_response(request, response, metrics, time.perf_counter() - start)
+
+    @staticmethod
+    def process_response(request, response, metrics, total):
+        """
+        :param request: the HTTP request
+        :param response: the HTTP response
+        :param metrics: the RequestMetrics of the request
+        :param total: the duration of the request, in seconds
+        :return: the response, with the Server-Timing header
+        """
+        resolver_match = getattr(request, "resolver_match", None)
+        endpoint = resolver_match.url_name if resolver_match is not None and resolver_match.url_name else "other"
+        request_duration.observe(endpoint, total)
+        request_queries.observe(endpoint, metrics.queries)
+        response["Server-Timing"] = metrics.server_timing(total)
+        log.info(LOGGING_TAG + json.dumps({"endpoint": endpoint, "status": response.status_code,
+                                           "duration_ms": round(total * 1000, 2), "queries": metrics.queries,
+                                           "spans_ms": {name: round(duration * 1000, 2)
+                                                        for name, duration in metrics.spans.items()}}))
+        return response
+
+
+def render():
+    """
+    :return: all the metrics in the Prometheus text format
+    """
+    from utb.cache import payload_cache
+
+    lines = request_duration.render() + request_queries.render() + span_duration.render()
+    lines += ["# HELP utb_cache_requests_total Lookups of the get_article cache",
+              "# TYPE utb_cache_requests_total counter"]
+    for name, value in sorted(payload_cache.stats().items()):
+        kind, result = name.split("_")
+        lines.append('utb_cache_requests_total{{kind="{}",result="{}"}} {}'.format(kind, result, value))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,66 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+import utb.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.CharField(max_length=21, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=20)),
+                ('email', models.CharField(max_length=30, unique=True)),
+                ('n_reports', models.IntegerField(default=0)),
+                ('weight', models.FloatField(default=1.0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Website',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('legit_articles', models.IntegerField(default=0)),
+                ('fake_articles', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Friendship',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('friend', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friend', to='utb.user')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user', to='utb.user')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Article',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('url', models.CharField(max_length=300, unique=True)),
+                ('name', models.CharField(max_length=300)),
+                ('legit_reports', models.FloatField(default=0.0)),
+                ('fake_reports', models.FloatField(default=0.0)),
+                ('website', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='utb.website')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Report',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('value', models.CharField(choices=[(utb.models.Report.Values['L'], 'Legit'), (utb.models.Report.Values['F'], 'Fake')], max_length=1)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='utb.article')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='utb.user')),
+            ],
+            options={
+                'unique_together': {('user', 'article')},
+            },
+        ),
+    ]
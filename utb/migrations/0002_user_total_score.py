@@ -0,0 +1,40 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:06
+
+from django.db import migrations, models, transaction
+from django.db.models import F
+
+CHUNK_SIZE = 5000
+
+
+def compute_total_score(apps, schema_editor):
+    """
+    Computes the total_score of the existing users, CHUNK_SIZE users at a time.
+    Every chunk is committed on its own, so the table is never locked as a whole and an interrupted migration
+    can simply be run again
+    """
+    User = apps.get_model("utb", "User")
+    last_id = ""
+    while True:
+        ids = list(User.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:CHUNK_SIZE])
+        if not ids:
+            break
+        with transaction.atomic(using=schema_editor.connection.alias):
+            User.objects.filter(id__in=ids).update(total_score=F("n_reports") * F("weight"))
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('utb', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='total_score',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(compute_total_score, migrations.RunPython.noop),
+    ]
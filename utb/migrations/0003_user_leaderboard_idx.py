@@ -0,0 +1,17 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utb', '0002_user_total_score'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-total_score', 'id'], name='user_leaderboard_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utb', '0003_user_leaderboard_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='name_resolved',
+            field=models.BooleanField(default=True),
+        ),
+    ]
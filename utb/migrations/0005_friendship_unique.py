@@ -0,0 +1,36 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:22
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+CHUNK_SIZE = 1000
+
+
+def delete_duplicate_friendships(apps, schema_editor):
+    """
+    Keeps only the oldest of the duplicate friendships, deleting the others CHUNK_SIZE pairs at a time
+    """
+    Friendship = apps.get_model("utb", "Friendship")
+    duplicates = Friendship.objects.values("user", "friend").annotate(n=Count("id"), first_id=Min("id")) \
+        .filter(n__gt=1).order_by("user", "friend")
+    while True:
+        chunk = list(duplicates[:CHUNK_SIZE])
+        if not chunk:
+            break
+        for pair in chunk:
+            Friendship.objects.filter(user=pair["user"], friend=pair["friend"]).exclude(id=pair["first_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utb', '0004_article_name_resolved'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_friendships, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='friendship',
+            constraint=models.UniqueConstraint(fields=('user', 'friend'), name='friendship_unique'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utb', '0005_friendship_unique'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['article', 'value'], name='report_article_value_idx'),
+        ),
+    ]
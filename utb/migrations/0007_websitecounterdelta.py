@@ -0,0 +1,23 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utb', '0006_report_article_value_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebsiteCounterDelta',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('legit_articles', models.IntegerField(default=0)),
+                ('fake_articles', models.IntegerField(default=0)),
+                ('website', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_deltas', to='utb.website')),
+            ],
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:28
+
+import json
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+import utb.models
+
+CHUNK_SIZE = 5000
+
+
+def create_events(apps, schema_editor):
+    """
+    Creates an event for each existing report, in the order the reports were created, CHUNK_SIZE at a time.
+    The previous values of the reports that were changed are not known, so the history starts from their last value
+    """
+    Report = apps.get_model("utb", "Report")
+    ReportEvent = apps.get_model("utb", "ReportEvent")
+    last_id = 0
+    while True:
+        chunk = list(Report.objects.filter(id__gt=last_id).order_by("id")
+                     .values_list("id", "user_id", "article_id", "value")[:CHUNK_SIZE])
+        if not chunk:
+            break
+        ReportEvent.objects.bulk_create([ReportEvent(user_id=user_id, article_id=article_id, value=value)
+                                         for _, user_id, article_id, value in chunk])
+        last_id = chunk[-1][0]
+
+
+def create_baseline(apps, schema_editor):
+    """
+    Saves the current weights, n_reports, tallies and websites as the baseline checkpoint at the last event created
+    by create_events. Those events only have the last value of the reports, so replaying them from the start would
+    not give back the weights the reports produced: the replays start from the baseline instead, see utb.replay.
+    The state has the format of ReplayState.dump as it was when the migration was written
+    """
+    Article = apps.get_model("utb", "Article")
+    ReplayCheckpoint = apps.get_model("utb", "ReplayCheckpoint")
+    ReportEvent = apps.get_model("utb", "ReportEvent")
+    User = apps.get_model("utb", "User")
+    last_event_id = ReportEvent.objects.order_by("-id").values_list("id", flat=True).first()
+    if last_event_id is None:
+        return
+    state = {"weights": dict(User.objects.values_list("id", "weight")),
+             "n_reports": dict(User.objects.values_list("id", "n_reports")),
+             "tallies": {article_id: [legit, fake] for article_id, legit, fake in
+                         Article.objects.values_list("id", "legit_reports", "fake_reports")},
+             "websites": dict(Article.objects.values_list("id", "website_id"))}
+    ReplayCheckpoint.objects.create(last_event_id=last_event_id, baseline=True,
+                                    state=zlib.compress(json.dumps(state).encode("utf-8")))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utb', '0007_websitecounterdelta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplayCheckpoint',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('last_event_id', models.BigIntegerField()),
+                ('state', models.BinaryField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('baseline', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReportEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('value', models.CharField(choices=[(utb.models.Report.Values['L'], 'Legit'), (utb.models.Report.Values['F'], 'Fake')], max_length=1)),
+                ('previous_value', models.CharField(choices=[(utb.models.Report.Values['L'], 'Legit'), (utb.models.Report.Values['F'], 'Fake')], max_length=1, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_events', to='utb.article')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_events', to='utb.user')),
+            ],
+        ),
+        migrations.RunPython(create_events, migrations.RunPython.noop),
+        migrations.RunPython(create_baseline, migrations.RunPython.noop),
+    ]
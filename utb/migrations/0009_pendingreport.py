@@ -0,0 +1,25 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+import utb.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utb', '0008_report_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingReport',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('value', models.CharField(choices=[(utb.models.Report.Values['L'], 'Legit'), (utb.models.Report.Values['F'], 'Fake')], max_length=1)),
+                ('previous_value', models.CharField(choices=[(utb.models.Report.Values['L'], 'Legit'), (utb.models.Report.Values['F'], 'Fake')], max_length=1, null=True)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_reports', to='utb.article')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_reports', to='utb.user')),
+            ],
+        ),
+    ]
@@ -0,0 +1,182 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:40
+
+from hashlib import sha256
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+import re
+
+from django.db import migrations, models, transaction
+from django.db.models import F, Max, Sum
+import django.db.models.deletion
+
+CHUNK_SIZE = 5000
+
+# the helpers below are copies of utb.canonical.canonicalize, utb.utils.hash_digest and Article.status_of as they
+# were when the migration was written, so that later changes to them don't change what it does
+TRACKING_PARAMETERS = {"fbclid", "gclid", "dclid", "gclsrc", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+                       "_ga", "_gl", "ref_src", "ocid", "cmpid", "smid", "amp"}
+TRACKING_PREFIXES = ("utm_",)
+
+AMP_PATH_REGEX = re.compile(r"/amp/?$", re.IGNORECASE)
+
+
+def canonicalize(url):
+    """
+    :param url: the url of the article
+    :return: the canonical url, or the input url if it isn't an http(s) url
+    """
+    if not isinstance(url, str):
+        return url
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url
+    if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+        return url
+
+    host = parts.hostname
+    if host.startswith("amp."):
+        host = host[len("amp."):]
+    if ":" in host:
+        host = "[" + host + "]"  # IPv6 address
+    netloc = host if port in (None, 80, 443) else host + ":" + str(port)
+
+    path = AMP_PATH_REGEX.sub("", parts.path) or "/"
+    query = "&".join(parameter for parameter in parts.query.split("&")
+                     if parameter and not is_tracking_parameter(parameter))
+    return urlunsplit(("https", netloc, path, query, ""))
+
+
+def is_tracking_parameter(parameter):
+    name, _, value = parameter.partition("=")
+    name = unquote_plus(name).lower()
+    return name in TRACKING_PARAMETERS or name.startswith(TRACKING_PREFIXES) or (
+            name == "outputtype" and value.lower() == "amp")
+
+
+def hash_digest(string):
+    return sha256(string.encode("utf-8")).hexdigest() if string is not None else None
+
+
+def status_of(legit_reports, fake_reports):
+    """
+    :return: "L", "F" or "U", the status of an article with the input reports
+    """
+    if legit_reports + fake_reports < 5:
+        return "U"
+    legit_ratio = legit_reports / (legit_reports + fake_reports)
+    if legit_ratio > 0.6:
+        return "L"
+    elif legit_ratio < 0.4:
+        return "F"
+    return "U"
+
+
+def merge_duplicates(apps, schema_editor):
+    """
+    Gives every article the id of its canonical url, merging the articles whose urls have the same canonical url.
+    The articles are scanned CHUNK_SIZE at a time and every article is moved in its own transaction, so an
+    interrupted migration can simply be run again
+    """
+    Article = apps.get_model("utb", "Article")
+    last_id = ""
+    while True:
+        chunk = list(Article.objects.filter(id__gt=last_id).order_by("id").values_list("id", "url")[:CHUNK_SIZE])
+        if not chunk:
+            break
+        for article_id, url in chunk:
+            canonical_id = hash_digest(canonicalize(url))
+            if canonical_id != article_id:
+                with transaction.atomic(using=schema_editor.connection.alias):
+                    move_article(apps, article_id, canonical_id)
+        last_id = chunk[-1][0]
+
+
+def move_article(apps, article_id, canonical_id):
+    """
+    Moves the article to the canonical id, merging it into the article already there if any.
+    The article keeps its url, which is the one its page is fetched from
+    """
+    Article = apps.get_model("utb", "Article")
+    Report = apps.get_model("utb", "Report")
+    ReportEvent = apps.get_model("utb", "ReportEvent")
+    PendingReport = apps.get_model("utb", "PendingReport")
+    User = apps.get_model("utb", "User")
+    WebsiteCounterDelta = apps.get_model("utb", "WebsiteCounterDelta")
+
+    duplicate = Article.objects.select_for_update().get(id=article_id)
+    survivor = Article.objects.select_for_update().filter(id=canonical_id).first()
+    if survivor is None:
+        # the article has the same reports and status under its new id. The url is unique, so the old row gives
+        # it up first
+        Article.objects.filter(id=article_id).update(url=article_id)
+        Article.objects.create(id=canonical_id, url=duplicate.url, name=duplicate.name,
+                               name_resolved=duplicate.name_resolved, website_id=duplicate.website_id,
+                               legit_reports=duplicate.legit_reports, fake_reports=duplicate.fake_reports)
+        for model in (Report, ReportEvent, PendingReport):
+            model.objects.filter(article_id=article_id).update(article_id=canonical_id)
+        duplicate.delete()
+        return
+
+    # a user that reported both articles keeps the report made last, as the replay of the events would do
+    survivor_reports = {report.user_id: report for report in Report.objects.filter(article_id=canonical_id)}
+    for report in Report.objects.filter(article_id=article_id):
+        survivor_report = survivor_reports.get(report.user_id)
+        if survivor_report is None:
+            report.article_id = canonical_id
+            report.save(update_fields=["article"])
+            continue
+        if get_last_event(ReportEvent, report.user_id, article_id) > get_last_event(ReportEvent, report.user_id,
+                                                                                    canonical_id):
+            survivor_report.value = report.value
+            survivor_report.save(update_fields=["value"])
+        report.delete()
+        User.objects.filter(id=report.user_id).update(n_reports=F("n_reports") - 1,
+                                                       total_score=(F("n_reports") - 1) * F("weight"))
+    for model in (ReportEvent, PendingReport):
+        model.objects.filter(article_id=article_id).update(article_id=canonical_id)
+
+    previous_status = status_of(survivor.legit_reports, survivor.fake_reports)
+    weights = dict(Report.objects.filter(article_id=canonical_id).values("value")
+                   .annotate(total_weight=Sum("user__weight")).values_list("value", "total_weight"))
+    survivor.legit_reports, survivor.fake_reports = weights.get("L", 0.00), weights.get("F", 0.00)
+    survivor.save(update_fields=["legit_reports", "fake_reports"])
+    updated_status = status_of(survivor.legit_reports, survivor.fake_reports)
+
+    # the websites stop counting the duplicate and count the new status of the survivor
+    counters = {}
+    for website_id, status, sign in (
+            (duplicate.website_id, status_of(duplicate.legit_reports, duplicate.fake_reports), -1),
+            (survivor.website_id, previous_status, -1), (survivor.website_id, updated_status, 1)):
+        legit, fake = counters.get(website_id, (0, 0))
+        counters[website_id] = (legit + sign * (status == "L"), fake + sign * (status == "F"))
+    WebsiteCounterDelta.objects.bulk_create([WebsiteCounterDelta(website_id=website_id, legit_articles=legit,
+                                                                 fake_articles=fake)
+                                             for website_id, (legit, fake) in counters.items() if legit or fake])
+    duplicate.delete()
+
+
+def get_last_event(ReportEvent, user_id, article_id):
+    """
+    :return: the id of the last event of the user on the article, or 0
+    """
+    return ReportEvent.objects.filter(user_id=user_id, article_id=article_id).aggregate(last=Max("id"))["last"] or 0
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('utb', '0009_pendingreport'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleAlias',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='utb.article')),
+            ],
+        ),
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utb', '0010_article_alias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageMetadata',
+            fields=[
+                ('id', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('url', models.CharField(max_length=300)),
+                ('status', models.CharField(choices=[('O', 'Ok'), ('M', 'Missing Title'), ('E', 'Error')], max_length=1)),
+                ('title', models.CharField(max_length=300, null=True)),
+                ('canonical_url', models.CharField(max_length=300, null=True)),
+                ('etag', models.CharField(max_length=200, null=True)),
+                ('last_modified', models.CharField(max_length=50, null=True)),
+                ('failures', models.IntegerField(default=0)),
+                ('fetched', models.DateTimeField()),
+                ('expires', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+import utb.fields
+
+
+class Migration(migrations.Migration):
+    """
+    Changes the type of the keys to binary. The foreign key constraints are dropped until 0014, so that 0013 can
+    convert the rows of every table independently.
+    The hex digests are kept as their ASCII bytes (64 bytes) by the type change, and are decoded by 0013
+    """
+
+    dependencies = [
+        ('utb', '0011_pagemetadata'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='article',
+            name='website',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='utb.website'),
+        ),
+        migrations.AlterField(
+            model_name='articlealias',
+            name='article',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='utb.article'),
+        ),
+        migrations.AlterField(
+            model_name='pendingreport',
+            name='article',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='pending_reports', to='utb.article'),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='article',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='utb.article'),
+        ),
+        migrations.AlterField(
+            model_name='reportevent',
+            name='article',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='report_events', to='utb.article'),
+        ),
+        migrations.AlterField(
+            model_name='websitecounterdelta',
+            name='website',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='counter_deltas', to='utb.website'),
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='id',
+            field=utb.fields.HashField(primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='articlealias',
+            name='id',
+            field=utb.fields.HashField(primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='website',
+            name='id',
+            field=utb.fields.HashField(primary_key=True, serialize=False),
+        ),
+    ]
@@ -0,0 +1,116 @@
+from django.db import migrations, transaction
+
+from utb.fields import DIGEST_SIZE, HashField
+
+CHUNK_SIZE = 5000
+
+
+def convert_keys(apps, schema_editor):
+    """
+    Decodes the hex digests left as ASCII by the type change of 0012 into 32 bytes, CHUNK_SIZE rows at a time.
+    Every chunk is converted in its own transaction and the converted rows are skipped, so an interrupted
+    migration can simply be run again
+    """
+    convert_tables(apps, schema_editor.connection, is_legacy, decode)
+
+
+def restore_keys(apps, schema_editor):
+    """
+    Encodes the keys back into the hex digests that the reverse of 0012 turns into text again
+    """
+    convert_tables(apps, schema_editor.connection, is_binary, encode)
+
+
+def convert_tables(apps, connection, needs_conversion, convert):
+    """
+    :param apps: the models of the migration
+    :param connection: the database connection
+    :param needs_conversion: function returning True if a value of a digest column must be converted
+    :param convert: function returning the converted value of a digest column
+    """
+    for model in apps.get_app_config("utb").get_models():
+        columns = [field.column for field in model._meta.concrete_fields if is_digest(field)]
+        if columns:
+            convert_table(connection, model._meta.db_table, model._meta.pk.column, columns, needs_conversion,
+                          convert)
+
+
+def is_digest(field):
+    return isinstance(field, HashField) or (field.is_relation and isinstance(field.target_field, HashField))
+
+
+def convert_table(connection, table, pk_column, columns, needs_conversion, convert):
+    """
+    :param connection: the database connection
+    :param table: the name of the table
+    :param pk_column: the primary key of the table, the rows are read in its order
+    :param columns: the columns of the table holding a digest, they may include the primary key
+    :param needs_conversion: function returning True if a value of a digest column must be converted
+    :param convert: function returning the converted value of a digest column
+    """
+    quote = connection.ops.quote_name
+    selected = [pk_column] + [column for column in columns if column != pk_column]
+    select = "SELECT " + ", ".join(quote(column) for column in selected) + " FROM " + quote(table) + " {} ORDER BY " + \
+             quote(pk_column) + " LIMIT " + str(CHUNK_SIZE)
+    update = "UPDATE " + quote(table) + " SET " + ", ".join(quote(column) + " = %s" for column in columns) + \
+             " WHERE " + quote(pk_column) + " = %s"
+    positions = [selected.index(column) for column in columns]
+    last_key = None
+    while True:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            if last_key is None:
+                cursor.execute(select.format(""))
+            else:
+                cursor.execute(select.format("WHERE " + quote(pk_column) + " > %s"), [last_key])
+            rows = [[bytes(value) if isinstance(value, memoryview) else value for value in row]
+                    for row in cursor.fetchall()]
+            if not rows:
+                return
+            cursor.executemany(update, [[convert(row[position]) for position in positions] + [row[0]] for row in rows
+                                        if any(needs_conversion(row[position]) for position in positions)])
+        # the keys converted by this chunk that sort after last_key are read again, and skipped
+        last_key = rows[-1][0]
+
+
+def is_legacy(value):
+    """
+    :return: True if the value is a hex digest not converted yet
+    """
+    return value is not None and len(value) == 2 * DIGEST_SIZE
+
+
+def decode(value):
+    """
+    :param value: a value of the row
+    :return: the 32 bytes of the value if it is a hex digest not converted yet, otherwise the value
+    """
+    if not is_legacy(value):
+        return value
+    return bytes.fromhex(value if isinstance(value, str) else value.decode("ascii"))
+
+
+def is_binary(value):
+    """
+    :return: True if the value is a converted digest
+    """
+    return value is not None and len(value) == DIGEST_SIZE
+
+
+def encode(value):
+    """
+    :param value: a value of the row
+    :return: the hex digest of the value if it is a converted digest, otherwise the value
+    """
+    return value.hex() if is_binary(value) else value
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('utb', '0012_binary_keys'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_keys, restore_keys),
+    ]
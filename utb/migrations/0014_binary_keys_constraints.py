@@ -0,0 +1,47 @@
+# Generated by Django 3.1.6 on 2026-10-18 17:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    """
+    Restores the foreign key constraints dropped by 0012, once all the keys are converted
+    """
+
+    dependencies = [
+        ('utb', '0013_convert_binary_keys'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='article',
+            name='website',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='utb.website'),
+        ),
+        migrations.AlterField(
+            model_name='articlealias',
+            name='article',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aliases', to='utb.article'),
+        ),
+        migrations.AlterField(
+            model_name='pendingreport',
+            name='article',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_reports', to='utb.article'),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='article',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='utb.article'),
+        ),
+        migrations.AlterField(
+            model_name='reportevent',
+            name='article',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_events', to='utb.article'),
+        ),
+        migrations.AlterField(
+            model_name='websitecounterdelta',
+            name='website',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_deltas', to='utb.website'),
+        ),
+    ]
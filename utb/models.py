@@ -1,6 +1,46 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 import enum
 
+from utb.cache import user_cache
+from utb.fields import HashField
+
+
+class UserQuerySet(models.QuerySet):
+    def add_weight(self, delta):
+        """
+        Adds delta to the weight of the users with a single UPDATE, keeping their total_score in sync
+        :param delta: the weight delta
+        :return: the number of updated users
+        """
+        return self.update(weight=F("weight") + delta, total_score=F("n_reports") * (F("weight") + delta))
+
+    def add_reports(self, n_reports):
+        """
+        Adds n_reports to the number of reports of the users with a single UPDATE, keeping their total_score in sync
+        :param n_reports: the number of reports to add
+        :return: the number of updated users
+        """
+        return self.update(n_reports=F("n_reports") + n_reports,
+                           total_score=(F("n_reports") + n_reports) * F("weight"))
+
+    def update(self, **kwargs):
+        """
+        Updates the users, dropping the updated ones from the cache. If the cache is enabled, the ids of the users
+        of a filtered update are read first, while an update of all the users drops all of them.
+        bulk_update, add_weight and add_reports go through this method too
+        """
+        if not user_cache.timeout:
+            return super().update(**kwargs)
+        if not self.query.where:
+            updated = super().update(**kwargs)
+            user_cache.clear()
+            return updated
+        user_ids = list(self.values_list("id", flat=True))
+        updated = super().update(**kwargs)
+        user_cache.invalidate_many(user_ids)
+        return updated
+
 
 class User(models.Model):
     id = models.CharField(max_length=21, primary_key=True)
@@ -8,6 +48,21 @@ class User(models.Model):
     email = models.CharField(max_length=30, unique=True)
     n_reports = models.IntegerField(default=0)
     weight = models.FloatField(default=1.00)
+    # score() stored in the database, so that the leaderboard can be sorted by an index
+    total_score = models.FloatField(default=0.00)
+
+    objects = UserQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=["-total_score", "id"], name="user_leaderboard_idx")]
+
+    def save(self, *args, **kwargs):
+        self.total_score = self.score()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "total_score" not in update_fields:
+            kwargs["update_fields"] = list(update_fields) + ["total_score"]
+        super().save(*args, **kwargs)
+        user_cache.invalidate(self.id)
 
     def as_dict(self):
         return {"name": self.name, "email": self.email, "n_reports": self.n_reports}
@@ -21,10 +76,14 @@ class Friendship(models.Model):
     user = models.ForeignKey(User, related_name="user", on_delete=models.CASCADE)
     friend = models.ForeignKey(User, related_name="friend", on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=["user", "friend"], name="friendship_unique")]
+
 
 class Website(models.Model):
-    id = models.CharField(max_length=64, primary_key=True)  # hash of the name
+    id = HashField(primary_key=True)  # hash of the name
     name = models.CharField(max_length=100, unique=True)
+    # the counters are changed through WebsiteCounterDelta rows, which are periodically folded in here
     legit_articles = models.IntegerField(default=0)
     fake_articles = models.IntegerField(default=0)
 
@@ -32,16 +91,84 @@ class Website(models.Model):
         return {"name": self.name, "legit": self.legit_percentage()}
 
     def legit_percentage(self):
-        if self.legit_articles + self.fake_articles == 0:
+        legit_articles, fake_articles = self.get_counters()
+        if legit_articles + fake_articles == 0:
             return 1.00  # if there are no reports we assume that a website is legit
-        percentage = (self.legit_articles * 2) / (self.legit_articles + self.fake_articles)
+        percentage = (legit_articles * 2) / (legit_articles + fake_articles)
         return 1.00 if percentage > 1 else round(percentage, 2)
 
+    def get_counters(self):
+        """
+        :return: the tuple (legit_articles, fake_articles), including the deltas that are not compacted yet
+        """
+        if getattr(self, "_pending_counters", None) is None:
+            Website.load_pending_counters([self])
+        pending_legit, pending_fake = self._pending_counters
+        return self.legit_articles + pending_legit, self.fake_articles + pending_fake
+
+    @staticmethod
+    def load_pending_counters(websites):
+        """
+        Reads with a single query the deltas that are not compacted yet of all the websites
+        :param websites: the list of websites
+        """
+        pending = {website_id: (legit, fake) for website_id, legit, fake in
+                   WebsiteCounterDelta.objects.filter(website__in={website.id for website in websites})
+                   .values("website").annotate(legit=models.Sum("legit_articles"), fake=models.Sum("fake_articles"))
+                   .values_list("website", "legit", "fake")}
+        for website in websites:
+            website._pending_counters = pending.get(website.id, (0, 0))
+
+
+class WebsiteCounterDeltaQuerySet(models.QuerySet):
+    def compact(self, chunk_size=10000):
+        """
+        Folds the deltas into the counters of their websites, chunk_size deltas at a time.
+        Every chunk is summed, added to the websites and deleted in one transaction, so the readers never count
+        a delta twice. The chunks are locked with SKIP LOCKED, so that two compactions don't fold the same deltas
+        :param chunk_size: the number of deltas compacted in a transaction
+        :return: the number of compacted deltas
+        """
+        compacted = 0
+        while True:
+            with transaction.atomic():
+                chunk = list(self.select_for_update(skip_locked=True).order_by("id")
+                             .values_list("id", "website", "legit_articles", "fake_articles")[:chunk_size])
+                if not chunk:
+                    return compacted
+                totals = {}
+                for _, website_id, legit_articles, fake_articles in chunk:
+                    legit, fake = totals.get(website_id, (0, 0))
+                    totals[website_id] = (legit + legit_articles, fake + fake_articles)
+                # the websites are updated in a fixed order, so that two compactions can't wait for each other
+                for website_id in sorted(totals):
+                    legit, fake = totals[website_id]
+                    Website.objects.filter(id=website_id).update(legit_articles=F("legit_articles") + legit,
+                                                                 fake_articles=F("fake_articles") + fake)
+                WebsiteCounterDelta.objects.filter(id__in=[delta_id for delta_id, _, _, _ in chunk]).delete()
+            compacted += len(chunk)
+
+
+class WebsiteCounterDelta(models.Model):
+    """
+    Append-only change of the counters of a website.
+    Many articles of the same website can change status at the same time, and inserting a row each doesn't make
+    them wait for the lock on the website row as an UPDATE would
+    """
+    id = models.BigAutoField(primary_key=True)
+    website = models.ForeignKey(Website, related_name="counter_deltas", on_delete=models.CASCADE)
+    legit_articles = models.IntegerField(default=0)
+    fake_articles = models.IntegerField(default=0)
+
+    objects = WebsiteCounterDeltaQuerySet.as_manager()
+
 
 class Article(models.Model):
-    id = models.CharField(max_length=64, primary_key=True)  # hash of the url
+    id = HashField(primary_key=True)  # hash of the url
     url = models.CharField(max_length=300, unique=True)
     name = models.CharField(max_length=300)
+    # False while the name is still a placeholder and the real one is being fetched from the web page
+    name_resolved = models.BooleanField(default=True)
     website = models.ForeignKey(Website, on_delete=models.CASCADE)
     legit_reports = models.FloatField(default=0.00)
     fake_reports = models.FloatField(default=0.00)
@@ -56,15 +183,33 @@ class Article(models.Model):
                 "legit_reports": int(self.legit_reports), "fake_reports": int(self.fake_reports)}
 
     def get_status(self):
-        if self.legit_reports + self.fake_reports < 5:
-            return self.Status.U
-        legit_ratio = self.legit_reports / (self.legit_reports + self.fake_reports)
+        return Article.status_of(self.legit_reports, self.fake_reports)
+
+    @staticmethod
+    def status_of(legit_reports, fake_reports):
+        """
+        :param legit_reports: the sum of the weights of the legit reports
+        :param fake_reports: the sum of the weights of the fake reports
+        :return: the Article.Status of an article with the input reports
+        """
+        if legit_reports + fake_reports < 5:
+            return Article.Status.U
+        legit_ratio = legit_reports / (legit_reports + fake_reports)
         if legit_ratio > 0.6:
-            return self.Status.L
+            return Article.Status.L
         elif legit_ratio < 0.4:
-            return self.Status.F
+            return Article.Status.F
         else:
-            return self.Status.U
+            return Article.Status.U
+
+
+class ArticleAlias(models.Model):
+    """
+    Other url of an article that utb.canonical.canonicalize can't map to the article's url, e.g. the one declared
+    by the rel=canonical link of its page
+    """
+    id = HashField(primary_key=True)  # hash of the canonicalized alias url
+    article = models.ForeignKey(Article, related_name="aliases", on_delete=models.CASCADE)
 
 
 class Report(models.Model):
@@ -84,6 +229,71 @@ class Report(models.Model):
 
     class Meta:
         unique_together = (("user", "article"),)
+        # used to sum the weights of the legit and the fake reports of an article
+        indexes = [models.Index(fields=["article", "value"], name="report_article_value_idx")]
 
     def as_dict(self):
         return {"user_id": self.user.id, "article_url": self.article.url, "value": self.value}
+
+
+class ReportEvent(models.Model):
+    """
+    Append-only log of the submitted reports, in the order they were applied.
+    Replaying it (see utb.replay) recomputes the weights of the users, the tallies of the articles and the counters
+    of the websites
+    """
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, related_name="report_events", on_delete=models.CASCADE)
+    article = models.ForeignKey(Article, related_name="report_events", on_delete=models.CASCADE)
+    value = models.CharField(max_length=1, choices=Report.VALUES)
+    previous_value = models.CharField(max_length=1, choices=Report.VALUES, null=True)  # None for a new report
+    created = models.DateTimeField(auto_now_add=True)
+
+
+class PendingReport(models.Model):
+    """
+    Report whose weight has not been added to the tallies of its article yet.
+    In write-behind mode (see utb.write_behind) the reports are stored right away, while the articles are updated
+    by a periodic flush
+    """
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey(User, related_name="pending_reports", on_delete=models.CASCADE)
+    article = models.ForeignKey(Article, related_name="pending_reports", on_delete=models.CASCADE)
+    value = models.CharField(max_length=1, choices=Report.VALUES)
+    previous_value = models.CharField(max_length=1, choices=Report.VALUES, null=True)  # None for a new report
+
+
+class ReplayCheckpoint(models.Model):
+    """
+    State of the replay of the ReportEvent log up to last_event_id, so that the next replay only reads the new events.
+    The baseline checkpoint holds the state of the reports made before the log, which a full replay starts from
+    """
+    id = models.AutoField(primary_key=True)
+    last_event_id = models.BigIntegerField()
+    state = models.BinaryField()  # zlib compressed JSON of the weights, n_reports, tallies and websites
+    created = models.DateTimeField(auto_now_add=True)
+    baseline = models.BooleanField(default=False)
+
+
+class PageMetadata(models.Model):
+    """
+    What was learned the last time a web page was downloaded, see utb.page_store.
+    The failed downloads are stored too, so that the page is not downloaded again until expires
+    """
+
+    class Status(models.TextChoices):
+        OK = "O"
+        MISSING_TITLE = "M"
+        ERROR = "E"
+
+    id = models.CharField(max_length=64, primary_key=True)  # hash of the url
+    url = models.CharField(max_length=300)
+    status = models.CharField(max_length=1, choices=Status.choices)
+    title = models.CharField(max_length=300, null=True)
+    canonical_url = models.CharField(max_length=300, null=True)
+    # validators sent back in the conditional requests
+    etag = models.CharField(max_length=200, null=True)
+    last_modified = models.CharField(max_length=50, null=True)
+    failures = models.IntegerField(default=0)  # consecutive failed downloads
+    fetched = models.DateTimeField()
+    expires = models.DateTimeField()
@@ -0,0 +1,154 @@
+from datetime import timedelta
+import logging as log
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+import httpx
+
+from utb import pages, utils
+from utb.models import PageMetadata
+
+LOGGING_TAG = "PageStore: "
+
+DEFAULT_PAGE_TTL = 7 * 24 * 3600
+DEFAULT_PAGE_RETRY_DELAY = 60
+DEFAULT_PAGE_MAX_RETRY_DELAY = 24 * 3600
+
+MAX_FIELD_LENGTH = 300
+MAX_ETAG_LENGTH = 200
+MAX_LAST_MODIFIED_LENGTH = 50
+
+
+class PageUnavailableError(ValueError):
+    """
+    Raised when the title of a page can't be read, either now or by a recent download that is still in the
+    negative cache
+    """
+
+
+class CachedFailureError(PageUnavailableError):
+    """
+    Raised when the last download of a page failed and its retry delay didn't pass yet
+    """
+
+    def __init__(self, message, expires):
+        """
+        :param message: the error message
+        :param expires: the datetime when the page can be downloaded again
+        """
+        super().__init__(message)
+        self.expires = expires
+
+
+def get_page_ttl():
+    return getattr(settings, "UTB_PAGE_TTL", DEFAULT_PAGE_TTL)
+
+
+def get_retry_delay(failures):
+    """
+    :param failures: the number of consecutive failed downloads of the page
+    :return: the seconds before the page can be downloaded again, doubled at each failure
+    """
+    delay = getattr(settings, "UTB_PAGE_RETRY_DELAY", DEFAULT_PAGE_RETRY_DELAY) * 2 ** min(failures - 1, 32)
+    return min(delay, getattr(settings, "UTB_PAGE_MAX_RETRY_DELAY", DEFAULT_PAGE_MAX_RETRY_DELAY))
+
+
+async def get_page_async(url):
+    """
+    Returns the metadata of the web page, downloading it only if the stored one expired.
+    An expired page is downloaded with a conditional request, so that an unchanged page is not sent again.
+    A failed download is stored too, and the page is not downloaded again until its retry delay passes
+    :param url: the url of the page
+    :return: the PageMetadata of the page, with its title
+    :raise PageUnavailableError: if the title of the page can't be read, CachedFailureError if it wasn't downloaded
+                                 because of a recent failure
+    """
+    metadata = await sync_to_async(load)(url)
+    if metadata is not None and metadata.expires > timezone.now():
+        if metadata.status != PageMetadata.Status.OK:
+            raise CachedFailureError("Page " + url + " unavailable until " + metadata.expires.isoformat(),
+                                     metadata.expires)
+        return metadata
+
+    is_ok = metadata is not None and metadata.status == PageMetadata.Status.OK
+    try:
+        page = await pages.fetch_page_async(url, etag=metadata.etag if is_ok else None,
+                                            last_modified=metadata.last_modified if is_ok else None)
+    except (httpx.HTTPError, httpx.InvalidURL) as error:
+        await sync_to_async(save_failure)(url, metadata, PageMetadata.Status.ERROR)
+        raise PageUnavailableError("Page " + url + " unavailable: " + str(error)) from error
+
+    if page.not_modified and is_ok:
+        await sync_to_async(save_not_modified)(metadata, page)
+        return metadata
+    if page.status_code >= 400 or page.not_modified:
+        await sync_to_async(save_failure)(url, metadata, PageMetadata.Status.ERROR)
+        raise PageUnavailableError("Page " + url + " unavailable: HTTP " + str(page.status_code))
+    if page.title is None:
+        await sync_to_async(save_failure)(url, metadata, PageMetadata.Status.MISSING_TITLE)
+        raise PageUnavailableError("Missing title in " + url)
+    return await sync_to_async(save_page)(url, page)
+
+
+def load(url):
+    """
+    :param url: the url of the page
+    :return: the stored PageMetadata of the page, or None
+    """
+    return PageMetadata.objects.filter(id=utils.hash_digest(url)).first()
+
+
+def save_page(url, page):
+    """
+    :param url: the url of the page
+    :param page: the pages.FetchedPage with the title of the page
+    :return: the stored PageMetadata
+    """
+    now = timezone.now()
+    canonical_url = page.canonical_url if page.canonical_url and len(page.canonical_url) <= MAX_FIELD_LENGTH \
+        else None
+    metadata, _ = PageMetadata.objects.update_or_create(id=utils.hash_digest(url), defaults={
+        "url": url[:MAX_FIELD_LENGTH], "status": PageMetadata.Status.OK, "title": page.title[:MAX_FIELD_LENGTH],
+        "canonical_url": canonical_url, "etag": get_validator(page.etag, MAX_ETAG_LENGTH),
+        "last_modified": get_validator(page.last_modified, MAX_LAST_MODIFIED_LENGTH), "failures": 0,
+        "fetched": now, "expires": now + timedelta(seconds=get_page_ttl())})
+    return metadata
+
+
+def save_not_modified(metadata, page):
+    """
+    Keeps the stored metadata of a page that didn't change for another UTB_PAGE_TTL seconds
+    :param metadata: the stored PageMetadata
+    :param page: the pages.FetchedPage of the 304 response
+    """
+    metadata.etag = get_validator(page.etag, MAX_ETAG_LENGTH) or metadata.etag
+    metadata.last_modified = get_validator(page.last_modified, MAX_LAST_MODIFIED_LENGTH) or metadata.last_modified
+    metadata.fetched = timezone.now()
+    metadata.expires = metadata.fetched + timedelta(seconds=get_page_ttl())
+    metadata.save(update_fields=["etag", "last_modified", "fetched", "expires"])
+
+
+def get_validator(value, max_length):
+    """
+    :param value: the ETag or Last-Modified header of the response, or None
+    :param max_length: the length of the column storing it
+    :return: the value, or None if it doesn't fit the column: a truncated validator would never match
+    """
+    return value if value and len(value) <= max_length else None
+
+
+def save_failure(url, metadata, status):
+    """
+    Stores a failed download, so that the page is not downloaded again until the retry delay passes
+    :param url: the url of the page
+    :param metadata: the stored PageMetadata, or None
+    :param status: the PageMetadata.Status of the failure
+    """
+    failures = metadata.failures + 1 if metadata is not None and metadata.status != PageMetadata.Status.OK else 1
+    now = timezone.now()
+    delay = get_retry_delay(failures)
+    PageMetadata.objects.update_or_create(id=utils.hash_digest(url), defaults={
+        "url": url[:MAX_FIELD_LENGTH], "status": status, "title": None, "canonical_url": None, "etag": None,
+        "last_modified": None, "failures": failures, "fetched": now, "expires": now + timedelta(seconds=delay)})
+    log.warning(LOGGING_TAG + "Page " + url + " failed " + str(failures) + " times, retrying in " + str(delay) + "s")
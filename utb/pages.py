@@ -0,0 +1,170 @@
+from urllib.parse import urljoin
+import asyncio
+import codecs
+import re
+
+import httpx
+
+from utb import parsers
+
+# the web pages are downloaded through a client per event loop, so that the connections are kept alive.
+# A client is bound to the loop that created it
+ASYNC_FETCH_TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+_async_clients = {}  # loop -> (client, asynchronous generator closing it)
+
+CHUNK_SIZE = 16 * 1024
+MAX_PAGE_SIZE = 1024 * 1024  # the title is in the head, so we never need to read more than this
+
+CHARSET_REGEX = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+def get_charset(headers, first_chunk):
+    """
+    :param headers: the headers of the HTTP response
+    :param first_chunk: the first bytes of the body
+    :return: the charset of the page, from the Content-Type header or the meta tags, otherwise utf-8
+    """
+    content_type = headers.get("Content-Type", "")
+    if "charset=" in content_type:
+        charset = content_type.split("charset=")[-1].split(";")[0].strip().strip("\"'")
+    else:
+        match = CHARSET_REGEX.search(first_chunk)
+        charset = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        codecs.lookup(charset)
+    except LookupError:
+        charset = "utf-8"
+    return charset
+
+
+class TitleReader:
+    """
+    Reads a page chunk by chunk until its head ends or MAX_PAGE_SIZE bytes are read
+    """
+
+    def __init__(self, headers=None, backend=None):
+        """
+        :param headers: the headers of the HTTP response
+        :param backend: the name of the parsers backend, by default the one chosen by parsers.get_backend
+        """
+        self.headers = headers or {}
+        self.bytes_read = 0
+        self._parser = parsers.get_backend(backend)()
+        self._decoder = None
+        self._closed = False
+
+    def feed(self, chunk):
+        """
+        :param chunk: the next bytes of the page
+        :return: True if there is no need to read more of the page
+        """
+        if self._decoder is None:
+            self._decoder = codecs.getincrementaldecoder(get_charset(self.headers, chunk))(errors="replace")
+        self.bytes_read += len(chunk)
+        return self._parser.feed(self._decoder.decode(chunk)) or self.bytes_read >= MAX_PAGE_SIZE
+
+    def get_title(self):
+        """
+        :return: the title of the page, see parsers.HeadParser.get_title
+        """
+        self._close()
+        return self._parser.get_title()
+
+    def get_canonical_url(self):
+        self._close()
+        return self._parser.canonical_url
+
+    def _close(self):
+        if not self._closed:
+            self._closed = True
+            self._parser.close()
+
+
+def extract_title(chunks, headers=None, backend=None):
+    """
+    Feeds the chunks of a page to a TitleReader until the head ends or MAX_PAGE_SIZE bytes are read
+    :param chunks: iterable of the bytes of the page
+    :param headers: the headers of the HTTP response
+    :param backend: the name of the parsers backend, by default the one chosen by parsers.get_backend
+    :return: the tuple (title or None, number of bytes read)
+    """
+    reader = TitleReader(headers, backend)
+    for chunk in chunks:
+        if reader.feed(chunk):
+            break
+    return reader.get_title(), reader.bytes_read
+
+
+def get_async_client():
+    """
+    :return: the httpx.AsyncClient shared by the coroutines of the running event loop. The client is closed when the
+             loop shuts down its asynchronous generators, as asyncio.run does before closing it
+    """
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None:
+        client = httpx.AsyncClient(timeout=ASYNC_FETCH_TIMEOUT, follow_redirects=True,
+                                   limits=httpx.Limits(max_keepalive_connections=50))
+        closer = _close_on_shutdown(loop, client)
+        entry = _async_clients[loop] = (client, closer)
+        # the loop only tracks the generators that started, and keeps weak references to them
+        loop.create_task(closer.asend(None))
+    return entry[0]
+
+
+async def _close_on_shutdown(loop, client):
+    """
+    Waits for the shutdown of the asynchronous generators of the loop, then closes the client and its connections
+    """
+    try:
+        yield
+    finally:
+        _async_clients.pop(loop, None)
+        await client.aclose()
+
+
+class FetchedPage:
+    """
+    Result of a download of a web page
+    """
+
+    def __init__(self, url, status_code, headers, reader):
+        """
+        :param url: the url of the page after the redirects
+        :param status_code: the HTTP status of the response
+        :param headers: the headers of the response
+        :param reader: the TitleReader fed with the page
+        """
+        self.url = url
+        self.status_code = status_code
+        self.not_modified = status_code == 304
+        self.etag = headers.get("ETag")
+        self.last_modified = headers.get("Last-Modified")
+        self.title = reader.get_title()
+        canonical_url = reader.get_canonical_url()
+        self.canonical_url = urljoin(url, canonical_url) if canonical_url else None
+        self.bytes_read = reader.bytes_read
+
+
+async def fetch_page_async(url, etag=None, last_modified=None):
+    """
+    Streams the web page into a TitleReader until it is done.
+    If etag or last_modified are given the request is conditional, and the server answers 304 without the page
+    if it didn't change
+    :param url: the url of the page
+    :param etag: the ETag of the last download of the page, or None
+    :param last_modified: the Last-Modified of the last download of the page, or None
+    :return: the FetchedPage
+    """
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    async with get_async_client().stream("GET", url, headers=headers) as response:
+        reader = TitleReader(response.headers)
+        if response.status_code != 304:
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                if reader.feed(chunk):
+                    break
+    return FetchedPage(str(response.url), response.status_code, response.headers, reader)
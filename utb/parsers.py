@@ -0,0 +1,325 @@
+import abc
+from html import unescape
+from html.parser import HTMLParser
+import json
+import re
+
+from django.conf import settings
+
+try:
+    from lxml import etree  # C parser, used if installed
+except ImportError:
+    etree = None
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+DEFAULT_BACKEND = "auto"
+
+JSON_LD_TYPE = "application/ld+json"
+
+HEAD_END_REGEX = re.compile(r"</head\b|<body\b", re.IGNORECASE)
+HEAD_END_OVERLAP = len("</head") - 1
+TITLE_REGEX = re.compile(r"<title\b[^>]*>(.*?)(?:</title\b|$)", re.IGNORECASE | re.DOTALL)
+TAG_REGEX = re.compile(r"<(meta|link)\s[^>]*>", re.IGNORECASE)
+ATTRIBUTE_REGEX = re.compile(r"""([^\s=/>"']+)\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'>]+))""")
+JSON_LD_REGEX = re.compile(r"<script\b([^>]*)>(.*?)</script\b", re.IGNORECASE | re.DOTALL)
+# a title the regex scanner could have missed, e.g. in a malformed head
+FALLBACK_MARKERS_REGEX = re.compile(r"<title|og:title|ld\+json", re.IGNORECASE)
+
+
+class HeadParser(abc.ABC):
+    """
+    Incremental parser of the metadata in the head of a web page: the <title>, the og:title meta tag,
+    the headline of the JSON-LD scripts and the <link rel="canonical">.
+    It is fed the decoded page chunk by chunk, and is done once the head ends
+    """
+    name = None
+
+    def __init__(self):
+        self.title = None
+        self.og_title = None
+        self.headline = None
+        self.canonical_url = None
+        self.done = False
+
+    @abc.abstractmethod
+    def feed(self, text):
+        """
+        :param text: the next characters of the page
+        :return: True if the head has ended
+        """
+
+    def close(self):
+        """
+        Parses what is left, once there is no more input
+        """
+
+    def get_title(self):
+        """
+        :return: the JSON-LD headline, the og:title or the title of the page, the first that is not blank, or None.
+                 The first two are usually cleaner, e.g. without the website name
+        """
+        for title in (self.headline, self.og_title, self.title):
+            title = title.strip() if title is not None else None
+            if title:
+                return title
+        return None
+
+    def _meta_found(self, attrs):
+        if "og:title" in (attrs.get("property"), attrs.get("name")) and attrs.get("content") \
+                and self.og_title is None:
+            self.og_title = attrs["content"]
+
+    def _link_found(self, attrs):
+        if "canonical" in (attrs.get("rel") or "").lower().split() and attrs.get("href") \
+                and self.canonical_url is None:
+            self.canonical_url = attrs["href"].strip()
+
+    def _json_ld_found(self, text):
+        if self.headline is None and text:
+            try:
+                self.headline = find_headline(json.loads(text))
+            except ValueError:
+                pass
+
+
+def find_headline(data):
+    """
+    :param data: a decoded JSON-LD document
+    :return: the first headline in the document, looking into its lists and @graph, or None
+    """
+    if isinstance(data, list):
+        for item in data:
+            headline = find_headline(item)
+            if headline is not None:
+                return headline
+    elif isinstance(data, dict):
+        headline = data.get("headline")
+        if isinstance(headline, str) and headline.strip():
+            return unescape(headline)
+        return find_headline(data.get("@graph"))
+    return None
+
+
+def is_json_ld(type_attribute):
+    return (type_attribute or "").strip().lower() == JSON_LD_TYPE
+
+
+class HtmlHeadParser(HeadParser, HTMLParser):
+    """
+    Pure Python backend, based on html.parser
+    """
+    name = "html.parser"
+
+    def __init__(self):
+        HeadParser.__init__(self)
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self._in_title = False
+        self._in_json_ld = False
+        self._parts = []
+
+    def feed(self, text):
+        HTMLParser.feed(self, text)
+        return self.done
+
+    def close(self):
+        if self._in_title:
+            # the page was truncated inside the title
+            self.title = "".join(self._parts)
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "title" and self.title is None:
+            self._in_title = True
+            self._parts = []
+        elif tag == "script" and is_json_ld(dict(attrs).get("type")):
+            self._in_json_ld = True
+            self._parts = []
+        elif tag == "meta":
+            self._meta_found(dict(attrs))
+        elif tag == "link":
+            self._link_found(dict(attrs))
+        elif tag == "body":
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == "title" and self._in_title:
+            self._in_title = False
+            self.title = "".join(self._parts)
+        elif tag == "script" and self._in_json_ld:
+            self._in_json_ld = False
+            self._json_ld_found("".join(self._parts))
+        elif tag == "head":
+            self.done = True
+
+    def handle_data(self, data):
+        if self._in_title or self._in_json_ld:
+            self._parts.append(data)
+
+
+class BufferedHeadParser(HeadParser):
+    """
+    Backend that buffers the head of the page and parses it all at once when it ends
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._tail = ""
+
+    def feed(self, text):
+        if self.done:
+            return True
+        # the end of the head may be split between two chunks
+        match = HEAD_END_REGEX.search(self._tail + text)
+        self._chunks.append(text)
+        if match is None:
+            self._tail = (self._tail + text)[-HEAD_END_OVERLAP:]
+            return False
+        page = "".join(self._chunks)
+        self.done = True
+        self.parse(page[:len(page) - len(text) - len(self._tail) + match.start()])
+        return True
+
+    def close(self):
+        if not self.done:
+            self.parse("".join(self._chunks))
+
+    @abc.abstractmethod
+    def parse(self, head):
+        """
+        :param head: the head of the page
+        """
+
+
+class RegexHeadParser(BufferedHeadParser):
+    """
+    Backend scanning the head with regular expressions, the fastest without lxml.
+    If it finds no title in a head that seems to have one, the head is parsed again by BeautifulSoup
+    """
+    name = "regex"
+
+    def parse(self, head):
+        match = TITLE_REGEX.search(head)
+        if match is not None:
+            self.title = unescape(match.group(1))
+        for match in TAG_REGEX.finditer(head):
+            attrs = get_attributes(match.group(0))
+            if match.group(1).lower() == "meta":
+                self._meta_found(attrs)
+            else:
+                self._link_found(attrs)
+        for match in JSON_LD_REGEX.finditer(head):
+            if is_json_ld(get_attributes(match.group(1)).get("type")):
+                self._json_ld_found(match.group(2))
+                if self.headline is not None:
+                    break
+
+        if self.get_title() is None and BeautifulSoup is not None and FALLBACK_MARKERS_REGEX.search(head):
+            fallback = SoupHeadParser()
+            fallback.parse(head)
+            self.title, self.og_title, self.headline = fallback.title, fallback.og_title, fallback.headline
+            self.canonical_url = self.canonical_url or fallback.canonical_url
+
+
+def get_attributes(tag):
+    """
+    :param tag: the text of a start tag
+    :return: the dict lowercase name -> unescaped value of the attributes of the tag
+    """
+    return {match.group(1).lower(): unescape(next(value for value in match.group(2, 3, 4) if value is not None))
+            for match in ATTRIBUTE_REGEX.finditer(tag)}
+
+
+class SoupHeadParser(BufferedHeadParser):
+    """
+    Backend parsing the head with BeautifulSoup, the slowest one but the most lenient with malformed pages
+    """
+    name = "bs4"
+
+    def parse(self, head):
+        soup = BeautifulSoup(head, "html.parser")
+        if soup.title is not None:
+            self.title = soup.title.get_text()
+        for meta in soup.find_all("meta"):
+            self._meta_found(meta.attrs)
+        for link in soup.find_all("link"):
+            rel = link.get("rel")
+            self._link_found(dict(link.attrs, rel=" ".join(rel) if isinstance(rel, list) else rel))
+        for script in soup.find_all("script"):
+            if is_json_ld(script.get("type")):
+                self._json_ld_found(script.string)
+
+
+class LxmlHeadParser(HeadParser):
+    """
+    Backend based on the incremental HTML parser of lxml, written in C
+    """
+    name = "lxml"
+
+    def __init__(self):
+        super().__init__()
+        self._parser = etree.HTMLPullParser(events=("start", "end"))
+
+    def feed(self, text):
+        if not self.done:
+            self._parser.feed(text)
+            self._read_events()
+        return self.done
+
+    def close(self):
+        if not self.done:
+            try:
+                self._parser.close()
+            except etree.LxmlError:
+                pass  # e.g. an empty page
+            self._read_events()
+
+    def _read_events(self):
+        for event, element in self._parser.read_events():
+            if self.done:
+                break
+            if event == "start":
+                if element.tag == "meta":
+                    self._meta_found(element.attrib)
+                elif element.tag == "link":
+                    self._link_found(element.attrib)
+                elif element.tag == "body":
+                    self.done = True
+            elif element.tag == "title" and self.title is None:
+                self.title = element.text or ""
+            elif element.tag == "script" and is_json_ld(element.get("type")):
+                self._json_ld_found(element.text)
+            elif element.tag == "head":
+                self.done = True
+
+
+BACKENDS = {backend.name: backend for backend in (LxmlHeadParser, RegexHeadParser, HtmlHeadParser, SoupHeadParser)}
+
+
+def is_available(name):
+    """
+    :param name: the name of a backend
+    :return: True if the libraries needed by the backend are installed
+    """
+    return {"lxml": etree is not None, "bs4": BeautifulSoup is not None}.get(name, name in BACKENDS)
+
+
+def get_backend(name=None):
+    """
+    :param name: the name of the backend, by default settings.UTB_HTML_PARSER.
+                 "auto" chooses lxml if it is installed, otherwise the regex scanner
+    :return: the HeadParser class of the backend
+    :raise ValueError: if the backend is unknown or not installed
+    """
+    if name is None:
+        name = getattr(settings, "UTB_HTML_PARSER", DEFAULT_BACKEND) if settings.configured else DEFAULT_BACKEND
+    if name == "auto":
+        name = "lxml" if is_available("lxml") else "regex"
+    if not is_available(name):
+        raise ValueError("HTML parser " + name + " not available")
+    return BACKENDS[name]
@@ -0,0 +1,212 @@
+import json
+import logging as log
+import zlib
+
+from django.db import transaction
+
+from utb import rules, utils
+from utb.cache import payload_cache
+from utb.models import Article, PendingReport, Report, ReportEvent, ReplayCheckpoint, User, Website, \
+    WebsiteCounterDelta
+
+LOGGING_TAG = "Replay: "
+
+CHUNK_SIZE = 10000
+WRITE_BATCH_SIZE = 1000
+DEFAULT_WEIGHT = 1.00
+
+
+class ReplayState:
+    """
+    The weights, the tallies and the reports rebuilt by replaying the ReportEvent log.
+    The events are applied with the rules of utb.rules, as submit_report and change_article_status do, one at a time
+    and in order, since every status transition changes the weights used by the following reports
+    """
+
+    def __init__(self):
+        self.weights = {}  # user id -> weight
+        self.n_reports = {}  # user id -> number of reported articles
+        self.reports = {}  # article id -> {user id: report value}
+        self.tallies = {}  # article id -> [legit_reports, fake_reports]
+        self.websites = {}  # article id -> website id
+        self.dirty_users = set()
+        self.dirty_articles = set()
+
+    def apply(self, user_id, article_id, value):
+        """
+        Applies a report, as submit_report does
+        :param user_id: the id of the user
+        :param article_id: the id of the article
+        :param value: the value of the report, as the name of a Report.Values
+        """
+        reports = self.reports.setdefault(article_id, {})
+        tally = self.tallies.setdefault(article_id, [0.00, 0.00])
+        weight = self.weights.get(user_id, DEFAULT_WEIGHT)
+        previous_status = Article.status_of(*tally)
+
+        old_value = reports.get(user_id)
+        reports[user_id] = value
+        if old_value is None:
+            self.n_reports[user_id] = self.n_reports.get(user_id, 0) + 1
+        legit_delta, fake_delta = rules.get_tally_delta(weight, value, old_value)
+        tally[0] += legit_delta
+        tally[1] += fake_delta
+        self.dirty_users.add(user_id)
+        self.dirty_articles.add(article_id)
+
+        updated_status = Article.status_of(*tally)
+        if previous_status != updated_status:
+            self.change_status(user_id, article_id, value, previous_status, updated_status)
+
+    def change_status(self, user_id, article_id, value, previous_status, updated_status):
+        """
+        Updates the weights and the tallies as change_article_status does
+        """
+        reports = self.reports[article_id]
+        if rules.is_confirmed(value, updated_status):
+            self.weights[user_id] = self.weights.get(user_id, DEFAULT_WEIGHT) + utils.MULTIPLIER_DELTA
+
+        deltas = {report_value.name: rules.get_weight_delta(previous_status, updated_status, report_value)
+                  for report_value in Report.Values}
+        for reporter_id, reporter_value in reports.items():
+            if reporter_id != user_id and deltas[reporter_value] != 0:
+                self.weights[reporter_id] = self.weights.get(reporter_id, DEFAULT_WEIGHT) + deltas[reporter_value]
+                self.dirty_users.add(reporter_id)
+
+        tally = [0.00, 0.00]
+        for reporter_id, reporter_value in reports.items():
+            tally[0 if reporter_value == Report.Values.L.name else 1] += self.weights.get(reporter_id, DEFAULT_WEIGHT)
+        self.tallies[article_id] = tally
+
+    def website_counters(self, website_ids):
+        """
+        :param website_ids: the ids of the websites
+        :return: the dict website id -> [legit_articles, fake_articles], counting the articles by status
+        """
+        counters = {website_id: [0, 0] for website_id in website_ids}
+        for article_id, tally in self.tallies.items():
+            website_id = self.websites.get(article_id)
+            if website_id in counters:
+                status = Article.status_of(*tally)
+                if status == Article.Status.L:
+                    counters[website_id][0] += 1
+                elif status == Article.Status.F:
+                    counters[website_id][1] += 1
+        return counters
+
+    def dump(self):
+        """
+        The reports are left out, since they grow with every reported article while the rest grows with the users
+        and the articles: they are read again from the log by load_reports
+        :return: the state as compressed JSON, without the reports and the dirty sets
+        """
+        return zlib.compress(json.dumps({"weights": self.weights, "n_reports": self.n_reports,
+                                         "tallies": self.tallies, "websites": self.websites}).encode("utf-8"))
+
+    @staticmethod
+    def load(data):
+        """
+        :param data: the output of dump
+        :return: the ReplayState
+        """
+        state = ReplayState()
+        for name, value in json.loads(zlib.decompress(bytes(data)).decode("utf-8")).items():
+            setattr(state, name, value)
+        return state
+
+    def load_reports(self, article_ids, last_event_id):
+        """
+        Rebuilds the reports of the articles not loaded yet, from the events up to the checkpoint
+        :param article_ids: the ids of the articles
+        :param last_event_id: the last event of the checkpoint the state was loaded from
+        """
+        article_ids = [article_id for article_id in article_ids if article_id not in self.reports]
+        for article_id in article_ids:
+            self.reports[article_id] = {}
+        # the events are read in order, so the last value of every report wins
+        for article_id, user_id, value in ReportEvent.objects.filter(article__in=article_ids, id__lte=last_event_id) \
+                .order_by("id").values_list("article", "user", "value"):
+            self.reports[article_id][user_id] = value
+
+
+def replay(full=False, chunk_size=CHUNK_SIZE):
+    """
+    Replays the ReportEvent log and writes the recomputed weights, n_reports, article tallies and website counters.
+    The replay starts from the last checkpoint, unless full is True, and saves a new checkpoint at the end.
+    A full replay starts from the baseline checkpoint if there is one: the events created for the reports made
+    before the log only have their last value, so the weights before the baseline can't be replayed
+    The events are read in chunks of chunk_size and applied in a single pass.
+    The rows are written in one transaction, so the replay should run while the reports are paused: the events
+    submitted meanwhile are applied by the next replay
+    :param full: if True, the whole log after the baseline is replayed and all the users, articles and websites are
+                 rewritten
+    :param chunk_size: the number of events read with a query
+    :return: the number of replayed events
+    """
+    if full:
+        checkpoint = ReplayCheckpoint.objects.filter(baseline=True).first()
+    else:
+        checkpoint = ReplayCheckpoint.objects.order_by("-last_event_id").first()
+    state = ReplayState.load(checkpoint.state) if checkpoint else ReplayState()
+    last_event_id = checkpoint.last_event_id if checkpoint else 0
+    checkpoint_event_id = last_event_id
+
+    replayed = 0
+    while True:
+        chunk = list(ReportEvent.objects.filter(id__gt=last_event_id).order_by("id")
+                     .values_list("id", "user", "article", "value")[:chunk_size])
+        if not chunk:
+            break
+        new_articles = {article_id for _, _, article_id, _ in chunk if article_id not in state.websites}
+        state.websites.update(Article.objects.filter(id__in=new_articles).values_list("id", "website"))
+        if checkpoint:
+            state.load_reports({article_id for _, _, article_id, _ in chunk}, checkpoint_event_id)
+        for _, user_id, article_id, value in chunk:
+            state.apply(user_id, article_id, value)
+        last_event_id = chunk[-1][0]
+        replayed += len(chunk)
+
+    with transaction.atomic():
+        write(state, full)
+        checkpoint = ReplayCheckpoint.objects.create(last_event_id=last_event_id, state=state.dump())
+        ReplayCheckpoint.objects.exclude(id=checkpoint.id).filter(baseline=False).delete()
+    log.info(LOGGING_TAG + str(replayed) + " events replayed up to " + str(last_event_id))
+    return replayed
+
+
+def write(state, full):
+    """
+    Writes the users, the articles and the websites changed by the replay
+    :param state: the ReplayState
+    :param full: if True, the rows not in the state are reset to their defaults
+    """
+    if full:
+        User.objects.update(weight=DEFAULT_WEIGHT, n_reports=0, total_score=0.00)
+        Article.objects.update(legit_reports=0.00, fake_reports=0.00)
+        Website.objects.update(legit_articles=0, fake_articles=0)
+        WebsiteCounterDelta.objects.all().delete()
+        user_ids, article_ids = set(state.n_reports), set(state.tallies)
+    else:
+        user_ids, article_ids = state.dirty_users, state.dirty_articles
+
+    users = []
+    for user_id in user_ids:
+        weight, n_reports = state.weights.get(user_id, DEFAULT_WEIGHT), state.n_reports.get(user_id, 0)
+        users.append(User(id=user_id, weight=weight, n_reports=n_reports, total_score=n_reports * weight))
+    User.objects.bulk_update(users, ["weight", "n_reports", "total_score"], batch_size=WRITE_BATCH_SIZE)
+
+    Article.objects.bulk_update([Article(id=article_id, legit_reports=state.tallies[article_id][0],
+                                         fake_reports=state.tallies[article_id][1]) for article_id in article_ids],
+                                ["legit_reports", "fake_reports"], batch_size=WRITE_BATCH_SIZE)
+
+    # the counters are rebuilt from the statuses, so the pending deltas of the websites are already included
+    website_ids = {state.websites[article_id] for article_id in article_ids}
+    WebsiteCounterDelta.objects.filter(website__in=website_ids).delete()
+    Website.objects.bulk_update([Website(id=website_id, legit_articles=legit, fake_articles=fake) for
+                                 website_id, (legit, fake) in state.website_counters(website_ids).items()],
+                                ["legit_articles", "fake_articles"], batch_size=WRITE_BATCH_SIZE)
+
+    # the replayed events include the reports still pending in write-behind mode
+    PendingReport.objects.all().delete()
+    payload_cache.invalidate_many(article_ids, website_ids)
+    state.dirty_users, state.dirty_articles = set(), set()
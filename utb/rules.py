@@ -0,0 +1,69 @@
+from utb import utils
+from utb.models import Article, Report
+
+
+def get_tally_delta(weight, report_value, old_report_value):
+    """
+    :param weight: the weight of the user that submitted the report
+    :param report_value: the value of the report, as the name of a Report.Values
+    :param old_report_value: the value of the report before the update, or None if the report was created
+    :return: the amounts (legit, fake) to add to the legit_reports and fake_reports of the article
+    """
+    # in the case the report was not present before, we only have to add the weight of the user to the
+    # corresponding value
+    if old_report_value is None:
+        return (weight, 0.00) if report_value == Report.Values.L.name else (0.00, weight)
+    # in case the report was already present, we take its old value and update the numbers of legit
+    # and fake reports for the article accordingly
+    if old_report_value != report_value:
+        return (weight, -weight) if report_value == Report.Values.L.name else (-weight, weight)
+    return 0.00, 0.00
+
+
+def is_confirmed(report_value, updated_status):
+    """
+    :param report_value: the value of the report that changed the status of the article, as the name of
+                         a Report.Values
+    :param updated_status: the updated status of the article
+    :return: True if the report agrees with the updated status, so the weight of its user increases by
+             utils.MULTIPLIER_DELTA. If the article becomes undefined, the weight stays the same
+    """
+    return (report_value == Report.Values.L.name and updated_status == Article.Status.L) or (
+            report_value == Report.Values.F.name and updated_status == Article.Status.F)
+
+
+def get_weight_delta(previous_status, updated_status, report_value):
+    """
+    :param previous_status: the previous status of the article
+    :param updated_status: the updated status of the article
+    :param report_value: the value of a report on the article
+    :return: the amount to add to the weight of the user that submitted the report
+    """
+    # if the status "increases" by one step we have to increase the weight of the users
+    # that reported the article as legit and decrease the users that reported the article as fake
+    if (previous_status == Article.Status.U and updated_status == Article.Status.L) or (
+            previous_status == Article.Status.F and updated_status == Article.Status.U):
+        delta = utils.MULTIPLIER_DELTA
+    # otherwise, we do the contrary
+    elif (previous_status == Article.Status.L and updated_status == Article.Status.U) or (
+            previous_status == Article.Status.U and updated_status == Article.Status.F):
+        delta = -utils.MULTIPLIER_DELTA
+    # if we have that the article goes from fake to legit, we have to increment the weight twice
+    elif previous_status == Article.Status.F and updated_status == Article.Status.L:
+        delta = 2 * utils.MULTIPLIER_DELTA
+    # same for legit to fake
+    elif previous_status == Article.Status.L and updated_status == Article.Status.F:
+        delta = -2 * utils.MULTIPLIER_DELTA
+    else:
+        delta = 0.00
+    return delta if report_value == Report.Values.L else -delta
+
+
+def get_counter_deltas(previous_status, updated_status):
+    """
+    :param previous_status: the previous status of the article
+    :param updated_status: the updated status of the article
+    :return: the amounts (legit, fake) to add to the legit_articles and fake_articles of the website
+    """
+    return (int(updated_status == Article.Status.L) - int(previous_status == Article.Status.L),
+            int(updated_status == Article.Status.F) - int(previous_status == Article.Status.F))
@@ -0,0 +1,252 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextlib
+import logging as log
+import threading
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django import db
+from django.conf import settings
+
+LOGGING_TAG = "Tasks: "
+
+DEFAULT_WORKERS = 4
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_DELAY = 2.0
+DEFAULT_ASYNC_CONCURRENCY = 100
+DEFAULT_GROUP_CONCURRENCY = 4
+
+
+class RetryLater(Exception):
+    """
+    Raised by a task that can't make progress for delay seconds, e.g. because what it reads is in a negative cache:
+    the task runs again after the delay, and the attempt doesn't count as a failed one.
+    The eager tasks can't wait, so they are dropped without calling their failure handler
+    """
+
+    def __init__(self, delay, message=""):
+        """
+        :param delay: the seconds before the task can run again
+        :param message: the reason of the delay
+        """
+        super().__init__(message)
+        self.delay = max(delay, 0)
+
+
+class TaskQueue:
+    """
+    In-process queue running the tasks on a pool of worker threads, so that slow work (e.g. downloading a web page)
+    doesn't block the request that scheduled it.
+    Coroutine functions run instead on an event loop owned by the queue, so that many slow downloads can be in
+    flight at the same time without a thread each.
+    A failed task is retried with an exponential backoff, a task raising RetryLater is run again after its delay.
+    Only one task per key can be pending at a time.
+    The coroutine tasks can be grouped (e.g. by the website they download from): the tasks of a group run at most
+    group_concurrency at a time, and wait for their turn before taking one of the UTB_TASKS_ASYNC_CONCURRENCY slots,
+    so that a slow group can't take all of them.
+    If settings.UTB_TASKS_EAGER is True the tasks run synchronously when they are submitted
+    """
+
+    def __init__(self, name, workers=None, retries=None, retry_delay=None, group_concurrency=None):
+        """
+        :param name: the name of the queue, used for the threads and the logs
+        :param workers: the number of worker threads, by default settings.UTB_TASKS_WORKERS
+        :param retries: how many times a failed task is retried, by default settings.UTB_TASKS_RETRIES
+        :param retry_delay: seconds before the first retry, doubled at each retry.
+                            By default settings.UTB_TASKS_RETRY_DELAY
+        :param group_concurrency: how many coroutine tasks of the same group can run at the same time,
+                                  by default settings.UTB_TASKS_GROUP_CONCURRENCY
+        """
+        self.name = name
+        self._workers = workers
+        self._retries = retries
+        self._retry_delay = retry_delay
+        self._group_concurrency = group_concurrency
+        self._executor = None
+        self._loop = None
+        self._semaphore = None
+        self._lock = threading.Condition()
+        self._pending = set()
+        self._groups = {}  # group -> [asyncio.Semaphore, number of tasks using it], only used by the event loop
+
+    @property
+    def workers(self):
+        return self._workers if self._workers is not None else getattr(settings, "UTB_TASKS_WORKERS",
+                                                                        DEFAULT_WORKERS)
+
+    @property
+    def retries(self):
+        return self._retries if self._retries is not None else getattr(settings, "UTB_TASKS_RETRIES",
+                                                                        DEFAULT_RETRIES)
+
+    @property
+    def retry_delay(self):
+        return self._retry_delay if self._retry_delay is not None else getattr(settings, "UTB_TASKS_RETRY_DELAY",
+                                                                                DEFAULT_RETRY_DELAY)
+
+    @property
+    def group_concurrency(self):
+        return self._group_concurrency if self._group_concurrency is not None else getattr(
+            settings, "UTB_TASKS_GROUP_CONCURRENCY", DEFAULT_GROUP_CONCURRENCY)
+
+    def submit(self, key, function, *args, on_failure=None, group=None):
+        """
+        Schedules function(*args)
+        :param key: the key identifying the task
+        :param function: the function, or coroutine function, to run
+        :param args: the arguments of the function
+        :param on_failure: function called with the arguments of the task and the last error if all the attempts fail
+        :param group: the group of a coroutine task, or None
+        :return: True if the task was scheduled, False if a task with the same key was already pending
+        """
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+
+        eager = getattr(settings, "UTB_TASKS_EAGER", False)
+        if asyncio.iscoroutinefunction(function):
+            if eager:
+                async_to_sync(self._run_async)(key, function, args, on_failure, eager=True)
+            else:
+                asyncio.run_coroutine_threadsafe(self._run_async(key, function, args, on_failure, group=group),
+                                                 self._get_loop())
+        elif eager:
+            self._run(key, function, args, on_failure, 0, eager=True)
+        else:
+            self._get_executor().submit(self._run, key, function, args, on_failure, 0)
+        return True
+
+    def is_pending(self, key):
+        """
+        :param key: the key identifying the task
+        :return: True if the task is scheduled or running
+        """
+        with self._lock:
+            return key in self._pending
+
+    def wait(self, timeout=None):
+        """
+        Waits until all the pending tasks are completed
+        :param timeout: the maximum number of seconds to wait
+        :return: True if all the tasks are completed, False if the timeout expired
+        """
+        with self._lock:
+            return self._lock.wait_for(lambda: not self._pending, timeout)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            return self._executor
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._semaphore = asyncio.Semaphore(getattr(settings, "UTB_TASKS_ASYNC_CONCURRENCY",
+                                                            DEFAULT_ASYNC_CONCURRENCY))
+                threading.Thread(target=self._loop.run_forever, name=self.name + "-loop", daemon=True).start()
+            return self._loop
+
+    async def _run_async(self, key, function, args, on_failure, eager=False, group=None):
+        attempt = 0
+        while True:
+            try:
+                if eager:
+                    await function(*args)
+                elif group is None:
+                    async with self._semaphore:
+                        await function(*args)
+                else:
+                    async with self._group_semaphore(group), self._semaphore:
+                        await function(*args)
+                break
+            except RetryLater as retry:
+                if eager:
+                    log.info(LOGGING_TAG + self.name + " task " + str(key) + " dropped: " + str(retry))
+                    break
+                log.info(LOGGING_TAG + self.name + " task " + str(key) + " delayed by " + str(retry.delay) + "s: " +
+                         str(retry))
+                await asyncio.sleep(retry.delay)
+            except Exception as error:
+                if attempt < self.retries:
+                    log.warning(LOGGING_TAG + self.name + " task " + str(key) + " failed, retrying: " + str(error))
+                    if not eager:
+                        await asyncio.sleep(self.retry_delay * 2 ** attempt)
+                    attempt += 1
+                    continue
+                log.error(LOGGING_TAG + self.name + " task " + str(key) + " failed: " + str(error))
+                if on_failure is not None:
+                    try:
+                        if asyncio.iscoroutinefunction(on_failure):
+                            await on_failure(*args, error)
+                        else:
+                            await sync_to_async(on_failure)(*args, error)
+                    except Exception as failure_error:
+                        log.error(LOGGING_TAG + self.name + " task " + str(key) + " failure handler failed: " +
+                                  str(failure_error))
+                break
+        if not eager:
+            await sync_to_async(db.close_old_connections)()
+        self._done(key)
+
+    @contextlib.asynccontextmanager
+    async def _group_semaphore(self, group):
+        """
+        Holds one of the slots of the group, the semaphore is dropped once no task of the group needs it
+        """
+        entry = self._groups.get(group)
+        if entry is None:
+            entry = self._groups[group] = [asyncio.Semaphore(self.group_concurrency), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._groups[group]
+
+    def _run(self, key, function, args, on_failure, attempt, eager=False):
+        try:
+            function(*args)
+        except RetryLater as retry:
+            if eager:
+                log.info(LOGGING_TAG + self.name + " task " + str(key) + " dropped: " + str(retry))
+            else:
+                log.info(LOGGING_TAG + self.name + " task " + str(key) + " delayed by " + str(retry.delay) + "s: " +
+                         str(retry))
+                timer = threading.Timer(retry.delay, self._get_executor().submit,
+                                        (self._run, key, function, args, on_failure, attempt))
+                timer.daemon = True
+                timer.start()
+                return
+        except Exception as error:
+            if attempt < self.retries:
+                log.warning(LOGGING_TAG + self.name + " task " + str(key) + " failed, retrying: " + str(error))
+                if eager:
+                    self._run(key, function, args, on_failure, attempt + 1, eager=True)
+                else:
+                    timer = threading.Timer(self.retry_delay * 2 ** attempt, self._get_executor().submit,
+                                            (self._run, key, function, args, on_failure, attempt + 1))
+                    timer.daemon = True
+                    timer.start()
+                return
+            log.error(LOGGING_TAG + self.name + " task " + str(key) + " failed: " + str(error))
+            if on_failure is not None:
+                try:
+                    on_failure(*args, error)
+                except Exception as failure_error:
+                    log.error(LOGGING_TAG + self.name + " task " + str(key) + " failure handler failed: " +
+                              str(failure_error))
+        finally:
+            # the worker threads live outside of the request cycle, so they have to release their connections
+            if not eager:
+                db.close_old_connections()
+        self._done(key)
+
+    def _done(self, key):
+        with self._lock:
+            self._pending.discard(key)
+            self._lock.notify_all()
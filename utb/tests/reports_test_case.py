@@ -0,0 +1,36 @@
+from django.test import TestCase
+
+from utb import utils
+from utb.models import Article, User, Website
+
+
+class ReportsTestCase(TestCase):
+    """
+    8 users and 2 websites with 3 articles each, to compare the weights and tallies left by different ways of
+    applying the same reports
+    """
+
+    def setUp(self):
+        for i in range(8):
+            User(id="uid" + str(i), name="name" + str(i), email="email" + str(i) + "@email.com").save()
+        for i in range(2):
+            website = Website(id=utils.hash_digest("website" + str(i)), name="website" + str(i))
+            website.save()
+            for j in range(3):
+                url = "url" + str(i) + str(j)
+                Article(id=utils.hash_digest(url), url=url, website=website).save()
+
+    def get_state(self):
+        """
+        :return: the weights of the users, the tallies of the articles and the counters of the websites
+        """
+        return (list(User.objects.order_by("id").values_list("id", "weight", "n_reports", "total_score")),
+                list(Article.objects.order_by("id").values_list("id", "legit_reports", "fake_reports")),
+                [website.get_counters() for website in Website.objects.order_by("id")])
+
+    def assertStateEqual(self, state, expected):
+        for rows, expected_rows in zip(state, expected):
+            self.assertEqual(len(rows), len(expected_rows))
+            for row, expected_row in zip(rows, expected_rows):
+                for value, expected_value in zip(row, expected_row):
+                    self.assertAlmostEqual(value, expected_value)
@@ -81,6 +81,21 @@ class AddFriendTest(TestCase):
         friendship = Friendship.objects.get(user=user1, friend=user2)
         self.assertTrue(friendship.user == user1 and friendship.friend == user2)
 
+    def test_friendship_added_twice(self):
+        rf = RequestFactory()
+
+        user2 = User(id="uid2", name="name2", email="email2@email.com")
+        user2.save()
+
+        expected = HttpResponse("Created", status=201)
+        for _ in range(2):
+            request = rf.post("add_friend",
+                              data=json.dumps({"object": {"friend_email": "email2@email.com"}}),
+                              content_type="application/json")
+            response = add_friend.handler(request)
+            self.assertEqual(str(response), str(expected))
+        self.assertEqual(Friendship.objects.filter(user_id="uid", friend=user2).count(), 1)
+
 
 class AddFriendTestInvalidUser(TestCase):
     def test_invalid_user(self):
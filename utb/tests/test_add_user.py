@@ -1,7 +1,7 @@
 from django.http import HttpResponse, HttpRequest
 from django.test.client import RequestFactory
 from django.test import TestCase
-from unittest.mock import Mock
+from unittest.mock import AsyncMock, Mock, patch
 import json
 
 from utb import utils
@@ -99,6 +99,17 @@ class AddUserTest(TestCase):
         self.assertEqual(str(response), str(expected))
         self.assertTrue(User("uid", "name", "valid@email.com") in User.objects.all())
 
+    async def test_valid_user_async(self):
+        rf = RequestFactory()
+        expected = HttpResponse("User added", status=201)
+        request = rf.post("add_user",
+                          data=json.dumps({"object": {"name": "name", "email": "valid@email.com"}}),
+                          content_type="application/json")
+
+        with patch.object(utils, "check_google_token_async", AsyncMock(return_value=(True, "uid"))):
+            response = await utils.async_handler(add_user.process, add_user.LOGGING_TAG)(request)
+        self.assertEqual(str(response), str(expected))
+
 
 class AddUserTestGoogleSignInToken(TestCase):
     def test_invalid_token(self):
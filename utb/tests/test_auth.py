@@ -0,0 +1,192 @@
+import asyncio
+import json
+import threading
+import time
+
+import rsa
+from django.test import SimpleTestCase
+from google.auth import crypt, exceptions, jwt
+
+from utb import auth
+
+CLIENT_ID = "client_id"
+
+
+class FakeCertsEndpoint:
+    """
+    Test double for Google's certificates endpoint
+    """
+
+    class Response:
+        def __init__(self, status, headers, data):
+            self.status = status
+            self.headers = headers
+            self.data = data
+
+    def __init__(self, certs, max_age=3600):
+        self.certs = certs
+        self.max_age = max_age
+        self.status = 200
+        self.calls = 0
+        self.delay = 0
+
+    def __call__(self, url, method="GET", **kwargs):
+        time.sleep(self.delay)
+        return self.respond()
+
+    def respond(self):
+        self.calls += 1
+        headers = {"Cache-Control": "public, max-age={}, must-revalidate, no-transform".format(self.max_age)}
+        return self.Response(self.status, headers, json.dumps(self.certs).encode("utf-8"))
+
+    async def fetch_async(self, url):
+        await asyncio.sleep(self.delay)
+        return self.respond()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+def generate_key(key_id):
+    public_key, private_key = rsa.newkeys(1024)
+    signer = crypt.RSASigner.from_string(private_key.save_pkcs1(), key_id=key_id)
+    return signer, public_key.save_pkcs1().decode("utf-8")
+
+
+class TokenVerifierTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.signer, cls.public_key = generate_key("key1")
+        cls.rotated_signer, cls.rotated_public_key = generate_key("key2")
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.endpoint = FakeCertsEndpoint({"key1": self.public_key})
+        self.verifier = auth.TokenVerifier(CLIENT_ID,
+                                           certs=auth.CertificateCache(self.endpoint, clock=self.clock,
+                                                                       async_request=self.endpoint.fetch_async),
+                                           tokens=auth.VerifiedTokenCache(max_size=2, clock=self.clock))
+
+    def make_token(self, signer=None, sub="uid", lifetime=3600):
+        now = int(time.time())
+        payload = {"iss": "accounts.google.com", "aud": CLIENT_ID, "sub": sub, "iat": now, "exp": now + lifetime}
+        return jwt.encode(signer or self.signer, payload)
+
+    def test_verify_token(self):
+        id_info = self.verifier.verify(self.make_token())
+        self.assertEqual(id_info["sub"], "uid")
+        self.assertEqual(self.endpoint.calls, 1)
+
+    def test_certs_are_cached_until_max_age(self):
+        self.verifier.verify(self.make_token(sub="uid1"))
+        self.verifier.verify(self.make_token(sub="uid2"))
+        self.assertEqual(self.endpoint.calls, 1)
+
+        self.clock.now += 3600
+        self.verifier.verify(self.make_token(sub="uid3"))
+        self.assertEqual(self.endpoint.calls, 2)
+
+    def test_certs_refreshed_on_unknown_key(self):
+        self.verifier.verify(self.make_token())
+        self.endpoint.certs = {"key1": self.public_key, "key2": self.rotated_public_key}
+        self.clock.now += auth.MIN_FORCED_REFRESH_INTERVAL
+        id_info = self.verifier.verify(self.make_token(signer=self.rotated_signer))
+        self.assertEqual(id_info["sub"], "uid")
+        self.assertEqual(self.endpoint.calls, 2)
+
+    def test_forced_refreshes_are_rate_limited(self):
+        forged_signer = generate_key("forged")[0]
+        self.verifier.verify(self.make_token())
+        for i in range(5):
+            with self.assertRaises(ValueError):
+                self.verifier.verify(self.make_token(signer=forged_signer, sub="uid" + str(i)))
+        self.assertEqual(self.endpoint.calls, 1)
+
+        self.clock.now += auth.MIN_FORCED_REFRESH_INTERVAL
+        for i in range(5):
+            with self.assertRaises(ValueError):
+                self.verifier.verify(self.make_token(signer=forged_signer, sub="uid" + str(i)))
+        self.assertEqual(self.endpoint.calls, 2)
+
+    def test_one_fetch_per_expiry(self):
+        self.verifier.certs.get()
+        self.clock.now += 3600
+        self.endpoint.delay = 0.05
+        threads = [threading.Thread(target=self.verifier.certs.get) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.endpoint.calls, 2)
+
+    async def test_one_fetch_per_expiry_async(self):
+        await self.verifier.certs.get_async()
+        self.clock.now += 3600
+        self.endpoint.delay = 0.05
+        await asyncio.gather(*[self.verifier.certs.get_async() for _ in range(5)])
+        self.assertEqual(self.endpoint.calls, 2)
+
+    def test_stale_certs_used_if_endpoint_fails(self):
+        self.verifier.verify(self.make_token(sub="uid1"))
+        self.clock.now += 3600
+        self.endpoint.status = 500
+        self.assertEqual(self.verifier.verify(self.make_token(sub="uid2"))["sub"], "uid2")
+
+        verifier = auth.TokenVerifier(CLIENT_ID, certs=auth.CertificateCache(self.endpoint))
+        with self.assertRaises(exceptions.TransportError):
+            verifier.verify(self.make_token())
+
+    def test_verified_token_is_cached(self):
+        token = self.make_token()
+        self.verifier.verify(token)
+        self.verifier.certs.get = None  # a cache hit must not touch the certificates
+        self.assertEqual(self.verifier.verify(token)["sub"], "uid")
+
+    def test_cached_token_expires(self):
+        token = self.make_token(lifetime=60)
+        self.verifier.verify(token)
+        self.assertIsNotNone(self.verifier.tokens.get(token))
+        self.clock.now += 60
+        self.assertIsNone(self.verifier.tokens.get(token))
+
+    def test_token_cache_is_bounded(self):
+        tokens = [self.make_token(sub="uid" + str(i)) for i in range(3)]
+        for token in tokens:
+            self.verifier.verify(token)
+        self.assertEqual(len(self.verifier.tokens), 2)
+        self.assertIsNone(self.verifier.tokens.get(tokens[0]))
+        self.assertIsNotNone(self.verifier.tokens.get(tokens[2]))
+
+    def test_invalid_tokens(self):
+        with self.assertRaises(ValueError):
+            self.verifier.verify(self.make_token(signer=generate_key("key1")[0]))
+        with self.assertRaises(ValueError):
+            self.verifier.verify(self.make_token(lifetime=-3600))
+        self.assertEqual(len(self.verifier.tokens), 0)
+
+    async def test_verify_token_async(self):
+        token = self.make_token()
+        self.assertEqual((await self.verifier.verify_async(token))["sub"], "uid")
+        self.assertEqual(self.endpoint.calls, 1)
+        self.assertEqual((await self.verifier.verify_async(token))["sub"], "uid")
+
+        self.endpoint.certs = {"key1": self.public_key, "key2": self.rotated_public_key}
+        self.clock.now += auth.MIN_FORCED_REFRESH_INTERVAL
+        id_info = await self.verifier.verify_async(self.make_token(signer=self.rotated_signer))
+        self.assertEqual(id_info["sub"], "uid")
+        self.assertEqual(self.endpoint.calls, 2)
+
+        with self.assertRaises(ValueError):
+            await self.verifier.verify_async(self.make_token(lifetime=-3600))
+
+    def test_parse_max_age(self):
+        self.assertEqual(auth.parse_max_age({"Cache-Control": "public, max-age=100"}), 100)
+        self.assertEqual(auth.parse_max_age({"cache-control": "max-age=100", "Age": "30"}), 70)
+        self.assertIsNone(auth.parse_max_age({"Cache-Control": "no-cache"}))
+        self.assertIsNone(auth.parse_max_age({}))
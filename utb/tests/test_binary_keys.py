@@ -0,0 +1,80 @@
+from django.apps import apps
+from django.db import connection
+from django.test import TestCase
+from unittest.mock import Mock, patch
+import importlib
+
+from utb import utils
+from utb.models import Article, ArticleAlias, Report, User, Website, WebsiteCounterDelta
+
+WEBSITE_ID = utils.hash_digest("website.com")
+ARTICLE_IDS = [utils.hash_digest("https://website.com/" + str(i)) for i in range(5)]
+
+
+class HashFieldTest(TestCase):
+    def setUp(self):
+        self.website = Website.objects.create(id=WEBSITE_ID, name="website.com")
+        self.article = Article.objects.create(id=ARTICLE_IDS[0], url="url", name="name", website=self.website)
+
+    def test_round_trip(self):
+        article = Article.objects.select_related("website").get(id=ARTICLE_IDS[0])
+        self.assertEqual((article.id, article.website_id, article.website.id), (ARTICLE_IDS[0], WEBSITE_ID, WEBSITE_ID))
+        self.assertEqual(list(Article.objects.filter(id__in=ARTICLE_IDS).values_list("id", "website")),
+                         [(ARTICLE_IDS[0], WEBSITE_ID)])
+        self.assertEqual(article.as_dict()["url"], "url")
+
+    def test_stored_as_bytes(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id, website_id FROM utb_article")
+            self.assertEqual([tuple(bytes(value) for value in row) for row in cursor.fetchall()],
+                             [(bytes.fromhex(ARTICLE_IDS[0]), bytes.fromhex(WEBSITE_ID))])
+
+    def test_invalid_digest(self):
+        for value in ("website_id", ARTICLE_IDS[0][:-2]):
+            with self.assertRaises(ValueError):
+                Website.objects.filter(id=value).exists()
+
+
+class ConvertBinaryKeysTest(TestCase):
+    """
+    The rows are created with the ASCII bytes of their digests, as the type change of 0012 leaves them
+    """
+
+    def setUp(self):
+        self.migration = importlib.import_module("utb.migrations.0013_convert_binary_keys")
+        User(id="uid", name="name", email="email@email.com").save()
+        website = Website.objects.create(id=WEBSITE_ID.encode(), name="website.com")
+        for i, article_id in enumerate(ARTICLE_IDS):
+            Article.objects.create(id=article_id.encode(), url="url" + str(i), name="name", website=website)
+            Report.objects.create(user_id="uid", article_id=article_id.encode(), value="L")
+        ArticleAlias.objects.create(id=utils.hash_digest("alias").encode(), article_id=ARTICLE_IDS[0].encode())
+        WebsiteCounterDelta.objects.create(website=website, legit_articles=1)
+
+    def convert(self):
+        with patch.object(self.migration, "CHUNK_SIZE", 2):
+            self.migration.convert_keys(apps, Mock(connection=connection))
+
+    def test_convert(self):
+        self.assertFalse(Article.objects.filter(id=ARTICLE_IDS[0]).exists())
+        self.convert()
+        # an interrupted conversion runs again on the converted rows
+        self.convert()
+        self.assertEqual(sorted(Article.objects.values_list("id", flat=True)), sorted(ARTICLE_IDS))
+        self.assertEqual(set(Article.objects.values_list("website", flat=True)), {WEBSITE_ID})
+        self.assertEqual(sorted(Report.objects.values_list("article", flat=True)), sorted(ARTICLE_IDS))
+        self.assertEqual(ArticleAlias.objects.get(id=utils.hash_digest("alias")).article.url, "url0")
+        self.assertEqual(Website.objects.get(id=WEBSITE_ID).get_counters(), (1, 0))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT length(article_id) FROM utb_report")
+            self.assertEqual({length for length, in cursor.fetchall()}, {32})
+
+    def test_restore(self):
+        self.convert()
+        with patch.object(self.migration, "CHUNK_SIZE", 2):
+            self.migration.restore_keys(apps, Mock(connection=connection))
+        # the keys are hex digests again, as the type change of 0012 leaves them
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id, website_id FROM utb_article")
+            self.assertEqual(sorted(cursor.fetchall()), sorted((article_id, WEBSITE_ID) for article_id in ARTICLE_IDS))
+            cursor.execute("SELECT article_id FROM utb_report")
+            self.assertEqual(sorted(article_id for article_id, in cursor.fetchall()), sorted(ARTICLE_IDS))
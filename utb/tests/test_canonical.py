@@ -0,0 +1,162 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.client import RequestFactory
+from unittest.mock import AsyncMock, Mock
+import json
+
+from utb import canonical, utils
+from utb.cache import payload_cache
+from utb.models import Article, ArticleAlias, Report, User
+from utb.views import get_article, submit_report
+
+URL = "https://www.website.com/news/story?id=1"
+
+
+class CanonicalizeTest(TestCase):
+    def test_variants(self):
+        for variant in ("http://WWW.Website.com/news/story?id=1",
+                        "https://www.website.com:443/news/story?id=1#comments",
+                        "https://www.website.com/news/story?utm_source=feed&id=1&utm_medium=social",
+                        "https://www.website.com/news/story?id=1&fbclid=abc&gclid=def",
+                        "https://www.website.com/news/story/amp/?id=1&amp=1&outputType=amp"):
+            self.assertEqual(canonical.canonicalize(variant), URL)
+        self.assertEqual(canonical.canonicalize("https://amp.website.com/news/story/amp?id=1"),
+                         "https://website.com/news/story?id=1")
+
+    def test_kept_parts(self):
+        self.assertEqual(canonical.canonicalize("https://website.com:8080/A/b?q=a%20b&page=2"),
+                         "https://website.com:8080/A/b?q=a%20b&page=2")
+        self.assertEqual(canonical.canonicalize("https://website.com"), "https://website.com/")
+        self.assertEqual(canonical.canonicalize("https://website.com/amplifier"), "https://website.com/amplifier")
+
+    def test_not_http(self):
+        for url in ("test_url", "ftp://website.com/file", "https://website.com:port/", "http://[website.com", None):
+            self.assertEqual(canonical.canonicalize(url), url)
+
+
+class CanonicalArticleTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cls_atomics = cls._enter_atomics()
+        # mocks the google_token check
+        User(id="uid", name="name", email="email@email.com").save()
+        utils.check_google_token = Mock(return_value=(True, "uid"))
+        utils.parse_article_name_from_url_async = AsyncMock(return_value="article_name")
+
+    def setUp(self):
+        eager_tasks = override_settings(UTB_TASKS_EAGER=True)
+        eager_tasks.enable()
+        self.addCleanup(eager_tasks.disable)
+        payload_cache.cache.clear()
+
+    def get_article(self, url):
+        request = RequestFactory().post("get_article", content_type="application/json", data=json.dumps(
+            {"object": {"url": url, "website_name": "website.com"}}))
+        response = get_article.handler(request)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def submit_report(self, url):
+        request = RequestFactory().post("submit_report", content_type="application/json", data=json.dumps(
+            {"object": {"url": url, "report": "L"}}))
+        return submit_report.handler(request)
+
+    def test_variants_share_the_article(self):
+        url = "http://www.website.com/news/story?id=1&utm_source=feed"
+        self.get_article(url)
+        self.get_article(URL + "#top")
+        # the article keeps the url it was first submitted with, which is the one its page is fetched from
+        self.assertEqual(list(Article.objects.values_list("id", "url")), [(utils.hash_digest(URL), url)])
+        utils.parse_article_name_from_url_async.assert_called_with(url)
+        self.assertEqual(self.submit_report("https://www.website.com/news/story/amp?id=1").status_code, 201)
+        self.assertEqual(self.get_article(URL)["report"]["article_url"], url)
+
+    def test_alias(self):
+        self.get_article(URL)
+        ArticleAlias.objects.create(id=canonical.get_article_id("https://website.com/story-1"),
+                                    article_id=utils.hash_digest(URL))
+        self.assertEqual(self.get_article("https://website.com/story-1?utm_source=feed")["article"]["url"], URL)
+        self.assertEqual(self.submit_report("https://website.com/story-1").status_code, 201)
+        self.assertEqual(Report.objects.get().article_id, utils.hash_digest(URL))
+        self.assertEqual(Article.objects.count(), 1)
+
+    @override_settings(UTB_FOLLOW_CANONICAL=True)
+    def test_follow_canonical(self):
+        utils.parse_article_from_url_async = AsyncMock(return_value=("article_name",
+                                                                     "https://website.com/story-1#top"))
+        self.assertEqual(self.get_article(URL)["article"]["name"], "article_name")
+        self.assertEqual(ArticleAlias.objects.get().id, canonical.get_article_id("https://website.com/story-1"))
+        self.get_article("https://website.com/story-1")
+        self.assertEqual(Article.objects.count(), 1)
+
+
+class MergeDuplicatesTest(TransactionTestCase):
+    """
+    The database is migrated back to the schema before 0010, and the rows are written and read with the models of
+    the migrations, since the later ones change the keys
+    """
+    migrate_from = [("utb", "0009_pendingreport")]
+    migrate_to = [("utb", "0010_article_alias")]
+
+    def setUp(self):
+        self.apps = self.migrate(self.migrate_from)
+        self.website = self.model("Website").objects.create(id=utils.hash_digest("website.com"), name="website.com")
+        for i in range(6):
+            self.model("User").objects.create(id="uid" + str(i), name="name" + str(i),
+                                              email="email" + str(i) + "@email.com", n_reports=1, total_score=1.00)
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def migrate(self, targets):
+        """
+        :param targets: the migrations to migrate the database to
+        :return: the models of the migrations
+        """
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def model(self, name):
+        return self.apps.get_model("utb", name)
+
+    def add_article(self, url, reports):
+        article = self.model("Article").objects.create(id=utils.hash_digest(url), url=url, website=self.website)
+        for user_id, value in reports:
+            self.model("Report").objects.create(user_id=user_id, article=article, value=value)
+            self.model("ReportEvent").objects.create(user_id=user_id, article=article, value=value)
+            article.legit_reports += value == "L"
+            article.fake_reports += value == "F"
+        article.save()
+        return article
+
+    def merge(self):
+        self.apps = self.migrate(self.migrate_to)
+
+    def test_rekey(self):
+        self.add_article("http://website.com/story?utm_source=feed", [("uid0", "L")])
+        self.merge()
+        article = self.model("Article").objects.get()
+        self.assertEqual((article.id, article.url), (utils.hash_digest("https://website.com/story"),
+                                                     "http://website.com/story?utm_source=feed"))
+        self.assertEqual(self.model("Report").objects.get().article_id, article.id)
+        self.assertEqual(self.model("ReportEvent").objects.get().article_id, article.id)
+
+    def test_merge(self):
+        self.add_article("https://website.com/story", [("uid0", "L"), ("uid1", "L"), ("uid2", "F")])
+        # uid2 changed their mind on the duplicate, after the report on the canonical url
+        self.add_article("https://website.com/story#top", [("uid2", "L"), ("uid3", "L"), ("uid4", "L")])
+        self.merge()
+
+        article = self.model("Article").objects.get()
+        self.assertEqual(article.id, utils.hash_digest("https://website.com/story"))
+        self.assertEqual(dict(self.model("Report").objects.filter(article=article).values_list("user_id", "value")),
+                         {"uid0": "L", "uid1": "L", "uid2": "L", "uid3": "L", "uid4": "L"})
+        self.assertEqual((article.legit_reports, article.fake_reports), (5.00, 0.00))
+        self.assertEqual(self.model("User").objects.get(id="uid2").n_reports, 0)
+        self.assertEqual(self.model("ReportEvent").objects.filter(article=article).count(), 6)
+        # the merged article is now legit, and was counted by the website as undefined twice
+        deltas = self.model("WebsiteCounterDelta").objects.values_list("legit_articles", "fake_articles")
+        self.assertEqual(list(deltas), [(1, 0)])
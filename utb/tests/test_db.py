@@ -0,0 +1,99 @@
+from django.test import SimpleTestCase
+from unittest.mock import Mock, patch
+import os
+import tempfile
+
+from utb import db
+from utb.backends.sqlite3_pool.base import DatabaseWrapper
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.pool = db.ConnectionPool(max_idle=2, max_idle_time=60, health_checks=True, clock=self.clock)
+
+    def test_connection_reused(self):
+        connection = self.pool.get(Mock)
+        self.pool.put(connection)
+        self.assertIs(self.pool.get(Mock), connection)
+        self.assertEqual((self.pool.created, self.pool.reused), (1, 1))
+
+    def test_idle_connections_are_bounded(self):
+        connections = [self.pool.get(Mock) for _ in range(3)]
+        for connection in connections:
+            self.pool.put(connection)
+        self.assertEqual(len(self.pool), 2)
+        connections[2].close.assert_called_once()
+
+    def test_expired_connection_closed(self):
+        connection = self.pool.get(Mock)
+        self.pool.put(connection)
+        self.clock.now += 61
+        self.assertIsNot(self.pool.get(Mock), connection)
+        connection.close.assert_called_once()
+
+    def test_broken_connection_closed(self):
+        connection = self.pool.get(Mock)
+        self.pool.put(connection)
+        self.assertIsNot(self.pool.get(Mock, check=lambda c: False), connection)
+        connection.close.assert_called_once()
+
+
+class PooledBackendTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.wrapper = DatabaseWrapper({"NAME": os.path.join(directory.name, "db.sqlite3"), "CONN_MAX_AGE": 0,
+                                        "CONN_HEALTH_CHECKS": True, "POOL": {"MAX_IDLE": 1}, "OPTIONS": {},
+                                        "TIME_ZONE": None, "AUTOCOMMIT": True, "ATOMIC_REQUESTS": False,
+                                        "USER": "", "PASSWORD": "", "HOST": "", "PORT": ""}, alias="pool_test")
+        self.addCleanup(db._pools.pop, "pool_test", None)
+
+    def test_connection_given_back_to_pool(self):
+        self.wrapper.ensure_connection()
+        connection = self.wrapper.connection
+        self.wrapper.close()
+        self.assertIsNone(self.wrapper.connection)
+        self.assertEqual(len(db.get_pool("pool_test", self.wrapper.settings_dict)), 1)
+
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        self.assertIs(self.wrapper.connection, connection)
+        self.wrapper.close()
+
+    def test_open_transaction_rolled_back(self):
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("CREATE TABLE test (id INTEGER)")
+        self.wrapper.set_autocommit(False)
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("INSERT INTO test VALUES (1)")
+        self.wrapper.close()
+
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM test")
+            self.assertEqual(cursor.fetchone()[0], 0)
+        self.wrapper.close()
+
+
+class CheckConnectionsTest(SimpleTestCase):
+    def test_unusable_connection_closed(self):
+        usable, unusable, unchecked = Mock(), Mock(), Mock()
+        for connection in (usable, unusable, unchecked):
+            connection.in_atomic_block = False
+            connection.alias = "default"
+            connection.settings_dict = {"CONN_HEALTH_CHECKS": connection is not unchecked}
+            connection.is_usable.return_value = connection is usable
+        unchecked.is_usable.return_value = False
+        with patch.object(db, "connections", Mock(all=Mock(return_value=[usable, unusable, unchecked]))):
+            db.check_connections()
+        usable.close.assert_not_called()
+        unusable.close.assert_called_once()
+        unchecked.close.assert_not_called()
@@ -1,12 +1,19 @@
+from datetime import timedelta
 from django.http import HttpResponse, JsonResponse, HttpRequest
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.test.client import RequestFactory
-from unittest.mock import Mock
+from django.utils import timezone
+from unittest.mock import AsyncMock, Mock, patch
+import httpx
 import json
 
-from utb.views import get_article
-from utb.models import Website, Article, User, Report
-from utb import utils
+from utb.cache import payload_cache
+from utb.views import get_article, get_cache_stats, submit_report
+from utb.models import Website, Article, PageMetadata, User, Report
+from utb import canonical, pages, utils
+
+# the tests replace the parser of the article names, this one reads the pages through the page store
+parse_article_name_from_url_async = utils.parse_article_name_from_url_async
 
 
 class GetArticleTest(TestCase):
@@ -17,7 +24,16 @@ class GetArticleTest(TestCase):
         # mocks the google_token check
         User(id="uid", name="name", email="email@email.com").save()
         utils.check_google_token = Mock(return_value=(True, "uid"))
-        utils.parse_article_name_from_url = Mock(return_value="article_name")
+        utils.parse_article_name_from_url_async = AsyncMock(return_value="article_name")
+
+    def setUp(self):
+        # the articles' names are resolved synchronously
+        eager_tasks = override_settings(UTB_TASKS_EAGER=True)
+        eager_tasks.enable()
+        self.addCleanup(eager_tasks.disable)
+        # the database is rolled back after every test, so the cached payloads must be dropped too
+        payload_cache.cache.clear()
+        payload_cache.reset_stats()
 
     def test_missing_object(self):
         rf = RequestFactory()
@@ -151,6 +167,138 @@ class GetArticleTest(TestCase):
         self.assertEquals(website.as_dict(), json.loads(response.content)["website"])
         self.assertEquals(report.as_dict(), json.loads(response.content)["report"])
 
+    def test_get_article_name_resolved_in_background(self):
+        rf = RequestFactory()
+
+        request = rf.post("get_article",
+                          data=json.dumps({"object": {"url": "url", "website_name": "website_name"}}),
+                          content_type="application/json")
+        with override_settings(UTB_TASKS_EAGER=False):
+            with patch.object(get_article.article_names_queue, "submit") as submit:
+                response = get_article.handler(request)
+        self.assertEqual(json.loads(response.content)["article"]["name"], "url")
+        self.assertFalse(Article.objects.get(id=utils.hash_digest("url")).name_resolved)
+        submit.assert_called_once()
+
+        # the task is scheduled again by the next request, as if it was lost by a restart
+        response = get_article.handler(request)
+        article = Article.objects.get(id=utils.hash_digest("url"))
+        self.assertEqual(article.name, "article_name")
+        self.assertTrue(article.name_resolved)
+
+        response = get_article.handler(request)
+        self.assertEqual(json.loads(response.content)["article"]["name"], "article_name")
+
+    def test_get_article_name_not_found(self):
+        rf = RequestFactory()
+
+        request = rf.post("get_article",
+                          data=json.dumps({"object": {"url": "url", "website_name": "website_name"}}),
+                          content_type="application/json")
+        with patch.object(utils, "parse_article_name_from_url_async", AsyncMock(side_effect=ValueError())) as parse:
+            response = get_article.handler(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(parse.call_count, 1 + get_article.article_names_queue.retries)
+        article = Article.objects.get(id=utils.hash_digest("url"))
+        self.assertEqual(article.name, "url")
+        self.assertTrue(article.name_resolved)
+
+    def test_get_article_page_unreachable(self):
+        rf = RequestFactory()
+
+        url = "http://unreachable.example.com/article"
+        request = rf.post("get_article",
+                          data=json.dumps({"object": {"url": url, "website_name": "website_name"}}),
+                          content_type="application/json")
+        fetch = AsyncMock(side_effect=httpx.ConnectError("Connection refused"))
+        with patch.object(utils, "parse_article_name_from_url_async", parse_article_name_from_url_async), \
+                patch.object(pages, "fetch_page_async", fetch):
+            response = get_article.handler(request)
+            self.assertEqual(json.loads(response.content)["article"]["name"], url)
+            # the retries found the failure in the negative cache, so they waited for it instead of giving up
+            self.assertEqual(fetch.call_count, 1)
+            article = Article.objects.get(id=canonical.get_article_id(url))
+            self.assertFalse(article.name_resolved)
+            self.assertEqual(PageMetadata.objects.get(id=utils.hash_digest(url)).failures, 1)
+
+            # once the failure expires, the next request downloads the page again
+            PageMetadata.objects.update(expires=timezone.now() - timedelta(seconds=1))
+            get_article.handler(request)
+            self.assertEqual(fetch.call_count, 2)
+            self.assertEqual(PageMetadata.objects.get(id=utils.hash_digest(url)).failures, 2)
+            article.refresh_from_db()
+            self.assertFalse(article.name_resolved)
+
+    def test_get_article_cached(self):
+        rf = RequestFactory()
+
+        request = rf.post("get_article",
+                          data=json.dumps({"object": {"url": "url", "website_name": "website_name"}}),
+                          content_type="application/json")
+        first_response = get_article.handler(request)
+        # only the user and the report are read from the database
+        with self.assertNumQueries(2):
+            response = get_article.handler(request)
+        self.assertEqual(json.loads(response.content), json.loads(first_response.content))
+        self.assertEqual(payload_cache.stats(), {"article_hits": 1, "article_misses": 1,
+                                                 "website_hits": 1, "website_misses": 0})
+
+        response = get_cache_stats.handler(request)
+        self.assertEqual(json.loads(response.content)["article_hits"], 1)
+
+    def test_get_article_cached_with_report(self):
+        rf = RequestFactory()
+
+        request = rf.post("get_article",
+                          data=json.dumps({"object": {"url": "url", "website_name": "website_name"}}),
+                          content_type="application/json")
+        get_article.handler(request)
+
+        user = User.objects.get(id="uid")
+        user.weight = 5.00
+        user.save()
+        report_request = rf.post("submit_report",
+                                 data=json.dumps({"object": {"url": "url", "report": "L"}}),
+                                 content_type="application/json")
+        self.assertEqual(submit_report.handler(report_request).status_code, 201)
+
+        # both the article tallies and the website counters changed, so neither can be read from the cache
+        response = json.loads(get_article.handler(request).content)
+        self.assertEqual(response["article"]["legit_reports"], 5)
+        self.assertEqual(response["website"], Website.objects.get(name="website_name").as_dict())
+        self.assertEqual(response["report"], {"user_id": "uid", "article_url": "url", "value": "L"})
+        self.assertEqual(Website.objects.get(name="website_name").get_counters(), (1, 0))
+
+    def test_unresolved_article_not_cached(self):
+        rf = RequestFactory()
+
+        request = rf.post("get_article",
+                          data=json.dumps({"object": {"url": "url", "website_name": "website_name"}}),
+                          content_type="application/json")
+        with override_settings(UTB_TASKS_EAGER=False):
+            with patch.object(get_article.article_names_queue, "submit"):
+                get_article.handler(request)
+        self.assertIsNone(payload_cache.get_article(utils.hash_digest("url")))
+
+        get_article.handler(request)
+        response = get_article.handler(request)
+        self.assertEqual(json.loads(response.content)["article"]["name"], "article_name")
+
+    async def test_async_handler(self):
+        rf = RequestFactory()
+
+        request = rf.post("get_article",
+                          data=json.dumps({"object": {"url": "url", "website_name": "website_name"}}),
+                          content_type="application/json")
+        with patch.object(utils, "check_google_token_async", AsyncMock(return_value=(True, "uid"))):
+            response = await utils.async_handler(get_article.process, get_article.LOGGING_TAG)(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["article"]["name"], "article_name")
+
+        with patch.object(utils, "check_google_token_async", AsyncMock(return_value=(False, "Error message"))):
+            response = await utils.async_handler(get_article.process, get_article.LOGGING_TAG)(request)
+        self.assertEqual(str(response), str(HttpResponse("Error message", status=403)))
+
 
 class AddFriendTestInvalidUser(TestCase):
     def test_invalid_user(self):
@@ -0,0 +1,134 @@
+from django.db import connection
+from django.http import HttpResponse, HttpRequest
+from django.test import TestCase, override_settings
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import AsyncMock, Mock, patch
+import asyncio
+import json
+
+from utb import canonical, utils
+from utb.tasks import TaskQueue
+from utb.views import get_article, get_articles
+from utb.models import Website, Article, User, Report
+
+
+class GetArticlesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cls_atomics = cls._enter_atomics()
+        # mocks the google_token check
+        User(id="uid", name="name", email="email@email.com").save()
+        utils.check_google_token = Mock(return_value=(True, "uid"))
+        utils.parse_article_name_from_url_async = AsyncMock(return_value="article_name")
+
+    def setUp(self):
+        # the articles' names are resolved synchronously
+        eager_tasks = override_settings(UTB_TASKS_EAGER=True)
+        eager_tasks.enable()
+        self.addCleanup(eager_tasks.disable)
+
+    def post(self, articles):
+        request = RequestFactory().post("get_articles",
+                                        data=json.dumps({"object": {"articles": articles}}),
+                                        content_type="application/json")
+        return get_articles.handler(request)
+
+    def test_invalid_arguments(self):
+        expected = HttpResponse("Invalid arguments", status=400)
+        self.assertEqual(str(self.post(None)), str(expected))
+        self.assertEqual(str(self.post([])), str(expected))
+        self.assertEqual(str(self.post([{"url": "url", "website_name": ""}])), str(expected))
+        self.assertEqual(str(self.post([{"url": "url", "website_name": "website_name"}] *
+                                       (get_articles.MAX_BATCH_SIZE + 1))), str(expected))
+
+    def test_get_articles(self):
+        website = Website(id=utils.hash_digest("website_name"), name="website_name", legit_articles=1)
+        website.save()
+        article = Article(id=utils.hash_digest("url0"), url="url0", name="name0", website=website, legit_reports=2.0)
+        article.save()
+        report = Report(user=User.objects.get(id="uid"), article=article, value=Report.Values.L.name)
+        report.save()
+
+        response = self.post([{"url": "url0", "website_name": "website_name"},
+                              {"url": "url1", "website_name": "website_name"},
+                              {"url": "url2", "website_name": "other_website"},
+                              {"url": "url0", "website_name": "website_name"}])
+        self.assertEqual(response.status_code, 200)
+        articles = json.loads(response.content)["articles"]
+        self.assertEqual([entry["article"]["url"] for entry in articles], ["url0", "url1", "url2", "url0"])
+        self.assertEqual(articles[0], {"article": article.as_dict(), "website": website.as_dict(),
+                                       "report": report.as_dict()})
+        self.assertEqual(articles[1], {"article": {"url": "url1", "name": "article_name", "legit_reports": 0,
+                                                   "fake_reports": 0}, "website": website.as_dict()})
+        self.assertEqual(articles[2]["website"], {"name": "other_website", "legit": 1.00})
+        self.assertEqual(Article.objects.count(), 3)
+        self.assertTrue(Article.objects.get(url="url2").name_resolved)
+
+    def test_article_inserted_concurrently(self):
+        website = Website.objects.create(id=utils.hash_digest("website_name"), name="website_name")
+        Article.objects.create(id=utils.hash_digest("url0"), url="url0", name="name0", name_resolved=True,
+                               website=website, legit_reports=2.0)
+        find_articles = canonical.find_articles
+        calls = []
+
+        def find_articles_after_insert(queryset, article_ids):
+            # the article is inserted by another request after this one looked for it
+            calls.append(article_ids)
+            return find_articles(queryset, article_ids) if len(calls) > 1 else {}
+
+        with patch.object(canonical, "find_articles", find_articles_after_insert), \
+                patch.object(utils, "parse_article_name_from_url_async", AsyncMock()) as parse:
+            response = self.post([{"url": "url0", "website_name": "website_name"}])
+        self.assertEqual(json.loads(response.content)["articles"][0]["article"],
+                         {"url": "url0", "name": "name0", "legit_reports": 2.0, "fake_reports": 0})
+        parse.assert_not_called()
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        def count_queries(urls, website_name):
+            with CaptureQueriesContext(connection) as queries:
+                self.post([{"url": url, "website_name": website_name} for url in urls])
+            return len(queries)
+
+        with override_settings(UTB_TASKS_EAGER=False), patch.object(get_article.article_names_queue, "submit"):
+            n_queries = count_queries(["url0", "url1"], "website_name")
+            self.assertEqual(count_queries(["url" + str(i) for i in range(2, 40)], "other_website"), n_queries)
+            self.assertEqual(count_queries(["url" + str(i) for i in range(40)], "website_name"), 4)
+
+    def test_names_resolved_in_parallel(self):
+        in_flight, max_in_flight = 0, 0
+
+        async def parse(url):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            return "name of " + url
+
+        queue = TaskQueue("test-article-names")
+        with override_settings(UTB_TASKS_EAGER=False), \
+                patch.object(get_articles, "article_names_queue", queue), \
+                patch.object(get_article, "article_names_queue", queue), \
+                patch.object(utils, "parse_article_name_from_url_async", parse), \
+                patch.object(get_article, "save_article_name"):
+            response = self.post([{"url": "url" + str(i), "website_name": "website_name"} for i in range(10)])
+            self.assertTrue(queue.wait(timeout=5))
+        self.assertEqual(json.loads(response.content)["articles"][0]["article"]["name"], "url0")
+        self.assertGreater(max_in_flight, 1)
+
+
+class GetArticlesTestInvalidUser(TestCase):
+    def test_invalid_user(self):
+        expected = HttpResponse("Missing user", status=404)
+        utils.check_google_token = Mock(return_value=(True, "uid"))
+        response = get_articles.handler(HttpRequest())
+        self.assertEqual(str(response), str(expected))
+
+
+class GetArticlesTestGoogleSignInToken(TestCase):
+    def test_invalid_token(self):
+        utils.check_google_token = Mock(return_value=(False, "Error message"))
+        expected = HttpResponse("Error message", status=403)
+        response = get_articles.handler(HttpRequest())
+        self.assertEqual(str(response), str(expected))
@@ -74,6 +74,70 @@ class GetLeaderboardTest(TestCase):
         response = get_leaderboard.handler(request)
         self.assertEqual(str(response), str(expected))
 
+    def post(self, arguments):
+        rf = RequestFactory()
+        request = rf.post("get_leaderboard",
+                          data=json.dumps({"object": arguments}),
+                          content_type="application/json")
+        return get_leaderboard.handler(request)
+
+    def test_leaderboard_pagination(self):
+        for i in range(5):
+            User(id="uid" + str(i), name="user" + str(i), email="user" + str(i) + "@email.com", n_reports=i,
+                 weight=1.0).save()
+        User(id="uid", name="name", email="email@email.com", n_reports=3, weight=1.0).save()
+
+        response = self.post({"type": "GLOBAL", "limit": 2})
+        self.assertEqual(response.status_code, 200)
+        page = json.loads(response.content)
+        self.assertEqual(page["user_position"], 2)
+        self.assertEqual(page["leaderboard"], [{"name": "user4", "score": 4}, {"name": "name", "score": 3}])
+
+        response = self.post({"type": "GLOBAL", "limit": 2, "cursor": page["next_cursor"]})
+        page = json.loads(response.content)
+        self.assertEqual(page["leaderboard"], [{"name": "user3", "score": 3}, {"name": "user2", "score": 2}])
+
+        response = self.post({"type": "GLOBAL", "limit": 2, "cursor": page["next_cursor"]})
+        page = json.loads(response.content)
+        self.assertEqual(page["leaderboard"], [{"name": "user1", "score": 1}, {"name": "user0", "score": 0}])
+
+        response = self.post({"type": "GLOBAL", "limit": 2, "cursor": page["next_cursor"]})
+        page = json.loads(response.content)
+        self.assertEqual(page["leaderboard"], [])
+        self.assertIsNone(page["next_cursor"])
+
+    def test_leaderboard_around_user(self):
+        for i in range(5):
+            User(id="uid" + str(i), name="user" + str(i), email="user" + str(i) + "@email.com", n_reports=i,
+                 weight=1.0).save()
+        User(id="uid", name="name", email="email@email.com", n_reports=2, weight=1.5).save()
+
+        response = self.post({"type": "GLOBAL", "around": 1})
+        self.assertEqual(response.status_code, 200)
+        page = json.loads(response.content)
+        # ties are broken by id
+        self.assertEqual(page["user_position"], 2)
+        self.assertEqual(page["leaderboard"], [{"name": "user4", "score": 4}, {"name": "name", "score": 3},
+                                               {"name": "user3", "score": 3}])
+
+        response = self.post({"type": "GLOBAL", "limit": 5, "cursor": page["next_cursor"]})
+        page = json.loads(response.content)
+        self.assertEqual(page["leaderboard"], [{"name": "user2", "score": 2}, {"name": "user1", "score": 1},
+                                               {"name": "user0", "score": 0}])
+        self.assertIsNone(page["next_cursor"])
+
+    def test_leaderboard_invalid_arguments(self):
+        expected = HttpResponse("Invalid arguments", status=400)
+        for arguments in [{"limit": 0}, {"limit": "1"}, {"limit": 100000}, {"limit": True}, {"around": 0},
+                          {"around": 100000}]:
+            response = self.post(dict(type="GLOBAL", **arguments))
+            self.assertEqual(str(response), str(expected))
+
+        expected = HttpResponse("Invalid cursor", status=400)
+        for cursor in ["invalid", 1, {"score": 1, "id": "uid"}]:
+            response = self.post({"type": "GLOBAL", "cursor": cursor})
+            self.assertEqual(str(response), str(expected))
+
     def test_friends_leaderboard(self):
         rf = RequestFactory()
 
@@ -97,6 +161,37 @@ class GetLeaderboardTest(TestCase):
         response = get_leaderboard.handler(request)
         self.assertEqual(str(response), str(expected))
 
+    def test_friends_leaderboard_single_query(self):
+        requester = User(id="uid", name="name", email="email@email.com", n_reports=3, weight=1.0)
+        requester.save()
+        for i in range(6):
+            friend = User(id="uid" + str(i), name="user" + str(i), email="user" + str(i) + "@email.com",
+                          n_reports=i, weight=1.0)
+            friend.save()
+            Friendship(user=requester, friend=friend).save()
+        User(id="stranger", name="stranger", email="stranger@email.com", n_reports=10).save()
+
+        with self.assertNumQueries(1):
+            user_position, entries, has_next = get_leaderboard.get_friends_leaderboard(requester, 3, None, None)
+        self.assertEqual(user_position, 3)
+        self.assertEqual([name for _, name, _ in entries], ["user5", "user4", "name"])
+        self.assertTrue(has_next)
+
+        response = self.post({"type": "FRIENDS", "limit": 3})
+        page = json.loads(response.content)
+        response = self.post({"type": "FRIENDS", "limit": 3, "cursor": page["next_cursor"]})
+        page = json.loads(response.content)
+        self.assertEqual([entry["name"] for entry in page["leaderboard"]], ["user3", "user2", "user1"])
+        response = self.post({"type": "FRIENDS", "limit": 3, "cursor": page["next_cursor"]})
+        page = json.loads(response.content)
+        self.assertEqual([entry["name"] for entry in page["leaderboard"]], ["user0"])
+        self.assertIsNone(page["next_cursor"])
+
+        response = self.post({"type": "FRIENDS", "around": 1})
+        page = json.loads(response.content)
+        self.assertEqual(page["user_position"], 3)
+        self.assertEqual([entry["name"] for entry in page["leaderboard"]], ["user4", "name", "user3"])
+
 
 class GetLeaderboardTestInvalidUser(TestCase):
     def test_invalid_user(self):
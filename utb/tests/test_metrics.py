@@ -0,0 +1,100 @@
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.client import RequestFactory
+from unittest.mock import Mock
+import asyncio
+import json
+
+from utb import metrics, utils
+from utb.models import User
+
+
+class HistogramTest(TestCase):
+    def test_render(self):
+        histogram = metrics.Histogram("test_seconds", "Test histogram", "endpoint", buckets=(0.1, 1.0))
+        histogram.observe("a", 0.05)
+        histogram.observe("a", 0.5)
+        histogram.observe("a", 2)
+        self.assertEqual(histogram.render(), [
+            "# HELP test_seconds Test histogram",
+            "# TYPE test_seconds histogram",
+            'test_seconds_bucket{endpoint="a",le="0.1"} 1',
+            'test_seconds_bucket{endpoint="a",le="1.0"} 2',
+            'test_seconds_bucket{endpoint="a",le="+Inf"} 3',
+            'test_seconds_sum{endpoint="a"} 2.55',
+            'test_seconds_count{endpoint="a"} 3'])
+
+    def test_span(self):
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current_request.set(request_metrics)
+        try:
+            with metrics.span("fetch"):
+                pass
+            with metrics.span("fetch"):
+                pass
+        finally:
+            metrics.current_request.reset(token)
+        self.assertEqual(list(request_metrics.spans.keys()), ["fetch"])
+        self.assertTrue(request_metrics.server_timing(0.01).startswith("fetch;dur="))
+        self.assertTrue(request_metrics.server_timing(0.01).endswith("total;dur=10.00"))
+
+
+class MetricsMiddlewareTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.cls_atomics = cls._enter_atomics()
+        # mocks the google_token check
+        User(id="uid", name="name", email="email@email.com").save()
+        utils.check_google_token = Mock(return_value=(True, "uid"))
+        # the test connection is opened before the app is ready
+        metrics.install_query_timer(connection)
+
+    def setUp(self):
+        metrics.request_duration.clear()
+        metrics.request_queries.clear()
+
+    def test_server_timing(self):
+        response = self.client.post("/utb/get_leaderboard", json.dumps({"object": {"type": "GLOBAL"}}),
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        server_timing = response["Server-Timing"]
+        self.assertIn("db;dur=", server_timing)
+        self.assertIn("total;dur=", server_timing)
+        queries = int(server_timing.split('desc="')[1].split(" ")[0])
+        self.assertGreater(queries, 0)
+
+    @override_settings(UTB_METRICS_TOKEN="metrics-token")
+    def test_metrics_endpoint(self):
+        self.client.post("/utb/get_leaderboard", json.dumps({"object": {"type": "GLOBAL"}}),
+                         content_type="application/json")
+        response = self.client.get("/utb/metrics", HTTP_AUTHORIZATION="Bearer metrics-token")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        content = response.content.decode("utf-8")
+        self.assertIn('utb_request_duration_seconds_count{endpoint="get_leaderboard"} 1', content)
+        self.assertIn('utb_request_queries_count{endpoint="get_leaderboard"} 1', content)
+        self.assertIn('utb_span_duration_seconds_count{span="db"}', content)
+        self.assertIn('utb_cache_requests_total{kind="article",result="hits"}', content)
+
+    def test_metrics_endpoint_forbidden(self):
+        # the endpoint is disabled without a token
+        self.assertEqual(self.client.get("/utb/metrics", HTTP_AUTHORIZATION="Bearer ").status_code, 403)
+        with override_settings(UTB_METRICS_TOKEN="metrics-token"):
+            for authorization in ("", "Bearer wrong-token", "Basic metrics-token"):
+                response = self.client.get("/utb/metrics", HTTP_AUTHORIZATION=authorization)
+                self.assertEqual(response.status_code, 403)
+                self.assertNotIn(b"utb_request_duration_seconds", response.content)
+
+    async def test_async_middleware(self):
+        async def get_response(request):
+            with metrics.span("fetch"):
+                await asyncio.sleep(0)
+            return HttpResponse("ok")
+
+        middleware = metrics.MetricsMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get("/utb/metrics"))
+        self.assertTrue(response["Server-Timing"].startswith("fetch;dur="))
+        self.assertFalse(asyncio.iscoroutinefunction(metrics.MetricsMiddleware(lambda request: response)))
@@ -0,0 +1,119 @@
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from utb import page_store, utils
+from utb.models import PageMetadata
+
+# the store is only used by the coroutines of the task queue
+get_page = async_to_sync(page_store.get_page_async)
+
+PAGE = b"""<html><head><title>The title | The Website</title>
+<link rel="canonical" href="/article?id=1"></head><body>text</body></html>"""
+
+
+class ConditionalPageHandler(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/article" and self.headers.get("If-None-Match") == "\"v1\"":
+            self.send_response(304)
+            self.send_header("ETag", "\"v1\"")
+            self.end_headers()
+            return
+        body = {"/article": PAGE, "/long-etag": PAGE,
+                "/untitled": b"<html><head></head><body>text</body></html>"}.get(self.path, b"")
+        self.send_response(200 if body else 503)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if self.path == "/article":
+            self.send_header("ETag", "\"v1\"")
+        elif self.path == "/long-etag":
+            self.send_header("ETag", "\"" + "v" * 300 + "\"")
+            self.send_header("Last-Modified", "Wed, 21 Oct 2015 07:28:00 GMT" * 2)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(UTB_PAGE_RETRY_DELAY=60, UTB_PAGE_MAX_RETRY_DELAY=200)
+class PageStoreTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ConditionalPageHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = "http://127.0.0.1:" + str(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        ConditionalPageHandler.requests.clear()
+
+    def expire(self, url):
+        PageMetadata.objects.filter(id=utils.hash_digest(url)).update(expires=timezone.now() - timedelta(seconds=1))
+
+    def test_stored_page(self):
+        url = self.base_url + "/article"
+        # the other tests replace utils.parse_article_name_from_url_async, so the store is called directly
+        self.assertEqual(utils.clean_article_name(url, get_page(url).title), "The title")
+        page = get_page(url)
+        self.assertEqual((page.title, page.canonical_url, page.etag), ("The title | The Website",
+                                                                       self.base_url + "/article?id=1", "\"v1\""))
+        self.assertEqual(ConditionalPageHandler.requests, [("/article", None)])
+
+    def test_conditional_request(self):
+        url = self.base_url + "/article"
+        fetched = get_page(url).expires
+        self.expire(url)
+        page = get_page(url)
+        self.assertEqual(page.title, "The title | The Website")
+        self.assertGreater(page.expires, fetched)
+        self.assertEqual(ConditionalPageHandler.requests, [("/article", None), ("/article", "\"v1\"")])
+
+    def test_long_validators(self):
+        url = self.base_url + "/long-etag"
+        page = get_page(url)
+        # the validators don't fit their columns, so the next download is not conditional
+        self.assertEqual((page.title, page.etag, page.last_modified), ("The title | The Website", None, None))
+        self.expire(url)
+        get_page(url)
+        self.assertEqual(ConditionalPageHandler.requests, [("/long-etag", None), ("/long-etag", None)])
+
+    def test_negative_cache(self):
+        url = self.base_url + "/unavailable"
+        delays = []
+        for _ in range(4):
+            with self.assertRaises(page_store.PageUnavailableError):
+                get_page(url)
+            # the failure is cached, and the page is not requested again until it expires
+            with self.assertRaises(page_store.PageUnavailableError):
+                get_page(url)
+            page = PageMetadata.objects.get(id=utils.hash_digest(url))
+            delays.append(round((page.expires - page.fetched).total_seconds()))
+            self.expire(url)
+        self.assertEqual(delays, [60, 120, 200, 200])
+        self.assertEqual(page.status, PageMetadata.Status.ERROR)
+        self.assertEqual(len(ConditionalPageHandler.requests), 4)
+
+    def test_missing_title(self):
+        url = self.base_url + "/untitled"
+        with self.assertRaises(page_store.PageUnavailableError):
+            get_page(url)
+        self.assertEqual(PageMetadata.objects.get().status, PageMetadata.Status.MISSING_TITLE)
+
+    def test_unreachable(self):
+        with self.assertRaises(page_store.PageUnavailableError):
+            get_page("http://127.0.0.1:1/article")
+        self.assertEqual(PageMetadata.objects.get().failures, 1)
@@ -0,0 +1,133 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+
+from asgiref.sync import async_to_sync
+from django.test import SimpleTestCase
+
+from utb import pages
+
+CANONICAL_PAGE = b"""<html><head><title>The title</title>
+<link rel="canonical" href="/article?id=1"></head><body>text</body></html>"""
+
+PAGE = b"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>
+    Breaking news &amp; more | The Website
+</title>
+</head>
+<body>""" + b"<p>text</p>" * 200000 + b"</body></html>"
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    pages = {"/article": (PAGE, "text/html; charset=utf-8"),
+             "/canonical": (CANONICAL_PAGE, "text/html; charset=utf-8")}
+
+    def do_GET(self):
+        if self.path == "/redirect":
+            self.send_response(301)
+            self.send_header("Location", "/article")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body, content_type = self.pages.get(self.path, (b"", "text/html"))
+        self.send_response(200 if self.path in self.pages else 404)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ExtractTitleTest(SimpleTestCase):
+    def extract(self, page, chunk_size=7, headers=None):
+        chunks = [page[i:i + chunk_size] for i in range(0, len(page), chunk_size)]
+        return pages.extract_title(chunks, headers)
+
+    def test_title(self):
+        title, bytes_read = self.extract(PAGE)
+        self.assertEqual(title, "Breaking news & more | The Website")
+        self.assertLess(bytes_read, 200)
+
+    def test_og_title(self):
+        page = b'<html><head><meta property="og:title" content="The og title"><title>The title'
+        self.assertEqual(self.extract(page)[0], "The og title")
+
+    def test_missing_title(self):
+        title, bytes_read = self.extract(b"<html><head></head><body>" + b"<title>no</title>" * 10)
+        self.assertIsNone(title)
+        self.assertLess(bytes_read, 40)
+        self.assertIsNone(self.extract(b"<html><head><title>  </title></head>")[0])
+        self.assertIsNone(self.extract(b"")[0])
+
+    def test_canonical_url(self):
+        chunks = [CANONICAL_PAGE[i:i + 7] for i in range(0, len(CANONICAL_PAGE), 7)]
+        reader = pages.TitleReader()
+        for chunk in chunks:
+            if reader.feed(chunk):
+                break
+        self.assertEqual((reader.get_title(), reader.get_canonical_url()), ("The title", "/article?id=1"))
+        # the page is read only until the head ends
+        self.assertLess(reader.bytes_read, CANONICAL_PAGE.index(b"<body>") + 7)
+
+    def test_max_page_size(self):
+        page = b"<html><head>" + b"<!-- comment -->" * pages.MAX_PAGE_SIZE
+        title, bytes_read = self.extract(page, chunk_size=pages.CHUNK_SIZE)
+        self.assertIsNone(title)
+        self.assertEqual(bytes_read, pages.MAX_PAGE_SIZE)
+
+    def test_charset(self):
+        page = "<html><head><title>Perché</title>".encode("latin-1")
+        self.assertEqual(self.extract(page, headers={"Content-Type": "text/html; charset=ISO-8859-1"})[0], "Perché")
+        self.assertEqual(self.extract(b'<meta charset="latin-1">' + page, chunk_size=1024)[0], "Perché")
+        self.assertEqual(pages.get_charset({"Content-Type": "text/html; charset=unknown"}, b""), "utf-8")
+
+
+class FetchPageTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = "http://127.0.0.1:" + str(cls.server.server_port)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    async def test_fetch_page(self):
+        page = await pages.fetch_page_async(self.base_url + "/article")
+        self.assertEqual((page.status_code, page.title), (200, "Breaking news & more | The Website"))
+        self.assertLessEqual(page.bytes_read, pages.CHUNK_SIZE)
+
+    async def test_fetch_page_redirect(self):
+        page = await pages.fetch_page_async(self.base_url + "/redirect")
+        self.assertEqual((page.url, page.title), (self.base_url + "/article", "Breaking news & more | The Website"))
+
+    async def test_fetch_page_not_found(self):
+        page = await pages.fetch_page_async(self.base_url + "/missing")
+        self.assertEqual((page.status_code, page.title, page.bytes_read), (404, None, 0))
+
+    async def test_fetch_page_canonical(self):
+        page = await pages.fetch_page_async(self.base_url + "/canonical")
+        self.assertEqual((page.title, page.canonical_url), ("The title", self.base_url + "/article?id=1"))
+        self.assertIsNone((await pages.fetch_page_async(self.base_url + "/article")).canonical_url)
+
+    def test_client_closed_with_its_loop(self):
+        async def fetch():
+            await pages.fetch_page_async(self.base_url + "/article")
+            return pages.get_async_client()
+
+        # every call runs in a new event loop
+        clients = [async_to_sync(fetch)() for _ in range(2)]
+        self.assertIsNot(clients[0], clients[1])
+        self.assertTrue(all(client.is_closed for client in clients))
+        self.assertFalse(any(loop.is_closed() for loop in pages._async_clients))
@@ -0,0 +1,79 @@
+import re
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from utb import parsers
+
+HEAD = """<!DOCTYPE html><html><head>
+<meta charset="utf-8">
+<title>Breaking news &amp; more | The Website</title>
+<meta property="og:title" content="Breaking news &amp; more">
+<link rel="stylesheet" href="/style.css"><link rel="canonical" href="/news/breaking">
+<script>var page = {"headline": "not JSON-LD"};</script>
+<script type="application/ld+json">{"@context": "https://schema.org", "@graph": [{"@type": "WebSite"},
+    {"@type": "NewsArticle", "headline": "Breaking news, and more"}]}</script>
+</head>
+<body><title>Not the title</title><script type="application/ld+json">{"headline": "Not the headline"}</script>
+"""
+
+
+class ParsersTest(SimpleTestCase):
+    def parse(self, page, backend, chunk_size=7):
+        parser = parsers.BACKENDS[backend]()
+        for i in range(0, len(page), chunk_size):
+            if parser.feed(page[i:i + chunk_size]):
+                break
+        parser.close()
+        return parser
+
+    def backends(self):
+        for backend in parsers.BACKENDS:
+            if parsers.is_available(backend):
+                with self.subTest(backend=backend):
+                    yield backend
+
+    def test_head(self):
+        for backend in self.backends():
+            for chunk_size in (1, 7, len(HEAD)):
+                parser = self.parse(HEAD, backend, chunk_size)
+                self.assertTrue(parser.done)
+                self.assertEqual((parser.title, parser.og_title, parser.headline, parser.canonical_url),
+                                 ("Breaking news & more | The Website", "Breaking news & more",
+                                  "Breaking news, and more", "/news/breaking"))
+                self.assertEqual(parser.get_title(), "Breaking news, and more")
+
+    def test_title_only(self):
+        for backend in self.backends():
+            parser = self.parse("<html><head><title>\n  The title\n</title></head><body>", backend)
+            self.assertEqual(parser.get_title(), "The title")
+            self.assertIsNone(parser.canonical_url)
+            # the page was truncated inside the title
+            self.assertEqual(self.parse("<html><head><title>The tit", backend).get_title(), "The tit")
+
+    def test_no_title(self):
+        for backend in self.backends():
+            for page in ("", "<html><head></head><body><title>no</title>",
+                         "<html><head><title> </title><meta property='og:title' content=''></head>",
+                         "<head><script type='application/ld+json'>{\"headline\": </script><title></title>"):
+                self.assertIsNone(self.parse(page, backend).get_title())
+
+    def test_regex_fallback(self):
+        with mock.patch.object(parsers, "TITLE_REGEX", re.compile("(?!)")):
+            self.assertEqual(self.parse("<head><title>The title</title></head>", "regex").title, "The title")
+
+    def test_get_backend(self):
+        self.assertIs(parsers.get_backend("regex"), parsers.RegexHeadParser)
+        with override_settings(UTB_HTML_PARSER="html.parser"):
+            self.assertIs(parsers.get_backend(), parsers.HtmlHeadParser)
+        with mock.patch.object(parsers, "etree", None):
+            self.assertIs(parsers.get_backend("auto"), parsers.RegexHeadParser)
+            with self.assertRaises(ValueError):
+                parsers.get_backend("lxml")
+        with self.assertRaises(ValueError):
+            parsers.get_backend("unknown")
+
+    def test_abstract_parsers(self):
+        for parser in (parsers.HeadParser, parsers.BufferedHeadParser):
+            with self.assertRaises(TypeError):
+                parser()
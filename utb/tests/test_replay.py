@@ -0,0 +1,82 @@
+from django.apps import apps
+from django.core.management import call_command
+from django.db.models import F
+from django.test.client import RequestFactory
+from io import StringIO
+from unittest.mock import Mock
+import importlib
+import json
+import random
+
+from utb import replay, utils
+from utb.views import submit_report
+from utb.models import Article, ReportEvent, ReplayCheckpoint, User, Website, WebsiteCounterDelta
+from utb.tests.reports_test_case import ReportsTestCase
+
+
+class ReplayTest(ReportsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.random = random.Random(0)
+
+    def submit_reports(self, n_reports):
+        urls = list(Article.objects.values_list("url", flat=True))
+        for _ in range(n_reports):
+            utils.check_google_token = Mock(return_value=(True, "uid" + str(self.random.randrange(8))))
+            request = RequestFactory().post("submit_report", content_type="application/json", data=json.dumps(
+                {"object": {"url": self.random.choice(urls), "report": self.random.choice("LLF")}}))
+            self.assertEqual(submit_report.handler(request).status_code, 201)
+
+    def corrupt(self):
+        User.objects.update(weight=3.0, n_reports=7, total_score=21.0)
+        Article.objects.update(legit_reports=1.0, fake_reports=1.0)
+        Website.objects.update(legit_articles=5, fake_articles=5)
+
+    def test_full_replay(self):
+        self.submit_reports(60)
+        expected = self.get_state()
+        # the reports changed the status of some articles, so the replay has to follow the weights
+        self.assertTrue(any(weight != 1.0 for _, weight, _, _ in expected[0]))
+        self.assertTrue(WebsiteCounterDelta.objects.exists())
+
+        self.corrupt()
+        self.assertEqual(replay.replay(full=True), ReportEvent.objects.count())
+        self.assertStateEqual(self.get_state(), expected)
+        self.assertFalse(WebsiteCounterDelta.objects.exists())
+
+    def test_full_replay_from_baseline(self):
+        self.submit_reports(30)
+        # the weights of the reports made before the log can't be replayed, the baseline keeps them
+        User.objects.filter(id="uid0").update(weight=2.5, total_score=F("n_reports") * 2.5)
+        migration = importlib.import_module("utb.migrations.0008_report_events")
+        migration.create_baseline(apps, Mock())
+        self.submit_reports(30)
+        expected = self.get_state()
+
+        self.corrupt()
+        self.assertEqual(replay.replay(full=True), 30)
+        self.assertStateEqual(self.get_state(), expected)
+        self.assertEqual(ReplayCheckpoint.objects.count(), 2)
+        self.assertEqual(replay.replay(full=True), 30)
+        self.assertStateEqual(self.get_state(), expected)
+
+    def test_incremental_replay(self):
+        self.submit_reports(30)
+        replay.replay()
+        self.submit_reports(30)
+        expected = self.get_state()
+
+        self.assertEqual(replay.replay(), 30)
+        self.assertStateEqual(self.get_state(), expected)
+        self.assertEqual(ReplayCheckpoint.objects.count(), 1)
+        self.assertEqual(ReplayCheckpoint.objects.get().last_event_id, ReportEvent.objects.order_by("id").last().id)
+        self.assertEqual(replay.replay(), 0)
+
+    def test_replay_command(self):
+        self.submit_reports(10)
+        expected = self.get_state()
+        self.corrupt()
+        output = StringIO()
+        call_command("replay_reports", "--full", "--chunk-size", "3", stdout=output)
+        self.assertIn("Replayed 10 ", output.getvalue())
+        self.assertStateEqual(self.get_state(), expected)
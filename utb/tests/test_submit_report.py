@@ -1,6 +1,8 @@
 from django.http import HttpResponse, HttpRequest
 from django.test.client import RequestFactory
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from unittest.mock import Mock
 import json
 
@@ -97,6 +99,7 @@ class SubmitReportTest(TestCase):
                           content_type="application/json")
         response = submit_report.handler(request)
         self.assertEqual(str(response), str(expected))
+        self.assertEqual(User.objects.get(id="uid").total_score, 1.0)
 
     def test_submit_same_report_twice(self):
         rf = RequestFactory()
@@ -136,6 +139,8 @@ class SubmitReportTest(TestCase):
         self.assertEqual(str(response), str(expected))
         self.assertEqual(Report.objects.get(user=user, article=article).value, Report.Values.L.name)
         self.assertEquals(Article.objects.get(id=article_id).get_status(), Article.Status.L)
+        self.assertEqual(Report.objects.filter(user=user, article=article).count(), 1)
+        self.assertEqual(User.objects.get(id="uid").n_reports, 1)
 
     def test_submit_report_change_status_legit_to_undefined(self):
         rf = RequestFactory()
@@ -321,6 +326,47 @@ class SubmitReportTest(TestCase):
         self.assertEquals(Article.objects.get(id=article_id).get_status(), Article.Status.F)
         self.assertEquals(Website.objects.get(id=website_id).legit_percentage(), 0.00)
 
+    def change_status_with_reporters(self, n_reporters):
+        """
+        Flips from undefined to legit an article with n_reporters legit and n_reporters fake reports
+        :return: the number of queries executed by change_article_status
+        """
+        website = Website(id=utils.hash_digest("website_name"), name="website_name")
+        website.save()
+        article = Article(id=utils.hash_digest("article_url"), url="article_url", website=website)
+        article.save()
+        for i in range(n_reporters):
+            for value in Report.Values:
+                user = User(id=value.name + str(i), name="name", email=value.name + str(i) + "@email.com")
+                user.save()
+                Report(user=user, article=article, value=value.name).save()
+        report_user = User.objects.get(id="uid")
+        last_report = Report(user=report_user, article=article, value=Report.Values.L.name)
+        last_report.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            submit_report.change_article_status(last_report, article, Article.Status.U, Article.Status.L)
+        return len(queries)
+
+    def test_change_article_status_query_count(self):
+        n_queries = self.change_status_with_reporters(2)
+        Report.objects.all().delete()
+        Article.objects.all().delete()
+        Website.objects.all().delete()
+        User.objects.exclude(id="uid").delete()
+        User.objects.filter(id="uid").update(weight=1.0)
+        self.assertEqual(self.change_status_with_reporters(30), n_queries)
+
+        delta = utils.MULTIPLIER_DELTA
+        self.assertAlmostEqual(User.objects.get(id="uid").weight, 1.0 + delta)
+        self.assertAlmostEqual(User.objects.get(id="L0").weight, 1.0 + delta)
+        self.assertAlmostEqual(User.objects.get(id="F0").weight, 1.0 - delta)
+        self.assertAlmostEqual(User.objects.get(id="F0").total_score, 0.0)
+        article = Article.objects.get(id=utils.hash_digest("article_url"))
+        self.assertAlmostEqual(article.legit_reports, 31 * (1.0 + delta))
+        self.assertAlmostEqual(article.fake_reports, 30 * (1.0 - delta))
+        self.assertEqual(Website.objects.get(id=utils.hash_digest("website_name")).get_counters(), (1, 0))
+
 
 class SubmitReportTestInvalidUser(TestCase):
     def test_invalid_user(self):
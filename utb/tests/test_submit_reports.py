@@ -0,0 +1,147 @@
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpRequest
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import Mock
+import json
+
+from utb import utils
+from utb.views import submit_report, submit_reports
+from utb.models import User, Article, Website, Report, ReportEvent
+
+
+class SubmitReportsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.cls_atomics = cls._enter_atomics()
+        # mocks the google_token check
+        User(id="uid", name="name", email="email@email.com").save()
+        utils.check_google_token = Mock(return_value=(True, "uid"))
+
+    def post(self, reports):
+        request = RequestFactory().post("submit_reports",
+                                        data=json.dumps({"object": {"reports": reports}}),
+                                        content_type="application/json")
+        return submit_reports.handler(request)
+
+    def add_articles(self, n_articles):
+        website = Website(id=utils.hash_digest("website_name"), name="website_name")
+        website.save()
+        for i in range(n_articles):
+            url = "article_url" + str(i)
+            Article(id=utils.hash_digest(url), url=url, website=website).save()
+
+    def test_invalid_arguments(self):
+        expected = HttpResponse("Invalid arguments", status=400)
+        self.assertEqual(str(self.post(None)), str(expected))
+        self.assertEqual(str(self.post([])), str(expected))
+        self.assertEqual(str(self.post([{"url": "url", "report": "L"}] * (submit_reports.MAX_BATCH_SIZE + 1))),
+                         str(expected))
+
+    def test_submit_reports(self):
+        self.add_articles(2)
+        Report(user=User.objects.get(id="uid"), article=Article.objects.get(url="article_url1"),
+               value=Report.Values.L.name).save()
+        Article.objects.filter(url="article_url1").update(legit_reports=1.0)
+
+        response = self.post([{"url": "article_url0", "report": "L"},
+                              {"url": "article_url1", "report": "F"},
+                              {"url": "missing_url", "report": "L"},
+                              {"url": "article_url0", "report": "G"},
+                              {"url": None, "report": "L"}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["results"], [
+            {"url": "article_url0", "status": 201, "message": "Created"},
+            {"url": "article_url1", "status": 201, "message": "Created"},
+            {"url": "missing_url", "status": 404, "message": "Article not found"},
+            {"url": "article_url0", "status": 400, "message": "Invalid report value"},
+            {"url": None, "status": 400, "message": "Invalid arguments"}])
+
+        article0, article1 = Article.objects.get(url="article_url0"), Article.objects.get(url="article_url1")
+        self.assertEqual((article0.legit_reports, article0.fake_reports), (1.0, 0.0))
+        self.assertEqual((article1.legit_reports, article1.fake_reports), (0.0, 1.0))
+        self.assertEqual(Report.objects.get(user_id="uid", article=article1).value, Report.Values.F.name)
+        self.assertEqual(User.objects.get(id="uid").n_reports, 1)
+
+    def test_reports_on_same_article(self):
+        self.add_articles(1)
+        response = self.post([{"url": "article_url0", "report": "L"}, {"url": "article_url0", "report": "F"}])
+        self.assertEqual([result["status"] for result in json.loads(response.content)["results"]], [201, 201])
+        article = Article.objects.get(url="article_url0")
+        self.assertEqual((article.legit_reports, article.fake_reports), (0.0, 1.0))
+        self.assertEqual(Report.objects.get(user_id="uid").value, Report.Values.F.name)
+
+    def get_state(self):
+        return (list(User.objects.order_by("id").values_list("id", "weight", "n_reports", "total_score")),
+                list(Article.objects.order_by("id").values_list("id", "legit_reports", "fake_reports")),
+                [website.get_counters() for website in Website.objects.all()],
+                list(Report.objects.order_by("user", "article").values_list("user", "article", "value")))
+
+    def get_state_of_single_reports(self, reports):
+        with transaction.atomic():
+            for report in reports:
+                request = RequestFactory().post("submit_report", data=json.dumps({"object": report}),
+                                                content_type="application/json")
+                submit_report.handler(request)
+            state = self.get_state()
+            transaction.set_rollback(True)
+        return state
+
+    def add_legit_reports(self, url, n_reports):
+        for i in range(n_reports):
+            user = User(id="L" + str(i), name="name", email="L" + str(i) + "@email.com")
+            user.save()
+            Report(user=user, article=Article.objects.get(url=url), value=Report.Values.L.name).save()
+        Article.objects.filter(url=url).update(legit_reports=float(n_reports))
+
+    def test_same_result_of_single_reports(self):
+        # the batch flips the status of the first article, which changes the weight used by the second one
+        self.add_articles(2)
+        self.add_legit_reports("article_url0", 4)
+        reports = [{"url": "article_url0", "report": "L"}, {"url": "article_url1", "report": "L"}]
+
+        expected = self.get_state_of_single_reports(reports)
+        self.post(reports)
+        self.assertEqual(self.get_state(), expected)
+        self.assertAlmostEqual(User.objects.get(id="uid").weight, 1.0 + utils.MULTIPLIER_DELTA)
+        self.assertEqual(Website.objects.get().get_counters(), (1, 0))
+
+    def test_reports_on_same_article_applied_in_order(self):
+        # every report of the batch changes the status of the article, and the weights of the other users
+        self.add_articles(1)
+        self.add_legit_reports("article_url0", 1)
+        reports = [{"url": "article_url0", "report": value} for value in ("L", "F", "L", "F")]
+
+        expected = self.get_state_of_single_reports(reports)
+        response = self.post(reports)
+        self.assertEqual([result["status"] for result in json.loads(response.content)["results"]], [201] * 4)
+        self.assertEqual(self.get_state(), expected)
+        self.assertEqual(ReportEvent.objects.filter(user_id="uid").count(), 4)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        self.add_articles(20)
+
+        def count_queries(urls):
+            with CaptureQueriesContext(connection) as queries:
+                self.post([{"url": url, "report": "F"} for url in urls])
+            return len(queries)
+
+        n_queries = count_queries(["article_url0", "article_url1"])
+        self.assertEqual(count_queries(["article_url" + str(i) for i in range(2, 20)]), n_queries)
+
+
+class SubmitReportsTestInvalidUser(TestCase):
+    def test_invalid_user(self):
+        expected = HttpResponse("Missing user", status=404)
+        utils.check_google_token = Mock(return_value=(True, "uid"))
+        response = submit_reports.handler(HttpRequest())
+        self.assertEqual(str(response), str(expected))
+
+
+class SubmitReportsTestGoogleSignInToken(TestCase):
+    def test_invalid_token(self):
+        utils.check_google_token = Mock(return_value=(False, "Error message"))
+        expected = HttpResponse("Error message", status=403)
+        response = submit_reports.handler(HttpRequest())
+        self.assertEqual(str(response), str(expected))
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from unittest.mock import AsyncMock, Mock
+
+from django.test import SimpleTestCase, override_settings
+
+from utb.tasks import RetryLater, TaskQueue
+
+
+@override_settings(UTB_TASKS_EAGER=False)
+class TaskQueueTest(SimpleTestCase):
+    def test_submit(self):
+        queue = TaskQueue("test", workers=2)
+        function = Mock()
+        self.assertTrue(queue.submit("key", function, 1, 2))
+        self.assertTrue(queue.wait(timeout=5))
+        function.assert_called_once_with(1, 2)
+        self.assertFalse(queue.is_pending("key"))
+
+    def test_same_key_pending_once(self):
+        queue = TaskQueue("test", workers=2)
+        started, release = threading.Event(), threading.Event()
+
+        def blocking_task():
+            started.set()
+            release.wait(5)
+
+        self.assertTrue(queue.submit("key", blocking_task))
+        started.wait(5)
+        self.assertTrue(queue.is_pending("key"))
+        self.assertFalse(queue.submit("key", blocking_task))
+        release.set()
+        self.assertTrue(queue.wait(timeout=5))
+        self.assertTrue(queue.submit("key", Mock()))
+        self.assertTrue(queue.wait(timeout=5))
+
+    def test_retry(self):
+        queue = TaskQueue("test", workers=2, retries=2, retry_delay=0.01)
+        function = Mock(side_effect=[ValueError(), ValueError(), None])
+        on_failure = Mock()
+        queue.submit("key", function, "argument", on_failure=on_failure)
+        self.assertTrue(queue.wait(timeout=5))
+        self.assertEqual(function.call_count, 3)
+        on_failure.assert_not_called()
+
+    def test_failure(self):
+        queue = TaskQueue("test", workers=2, retries=1, retry_delay=0.01)
+        error = ValueError()
+        function = Mock(side_effect=error)
+        on_failure = Mock()
+        queue.submit("key", function, "argument", on_failure=on_failure)
+        self.assertTrue(queue.wait(timeout=5))
+        self.assertEqual(function.call_count, 2)
+        on_failure.assert_called_once_with("argument", error)
+
+    def test_coroutine_tasks(self):
+        queue = TaskQueue("test", retries=1, retry_delay=0.01)
+        function = AsyncMock(side_effect=[ValueError(), None])
+        queue.submit("key", function, "argument")
+        failing_function = AsyncMock(side_effect=ValueError())
+        on_failure = Mock()
+        queue.submit("failing_key", failing_function, on_failure=on_failure)
+        self.assertTrue(queue.wait(timeout=5))
+        self.assertEqual(function.call_count, 2)
+        function.assert_called_with("argument")
+        self.assertEqual(failing_function.call_count, 2)
+        on_failure.assert_called_once()
+
+    def test_retry_later(self):
+        queue = TaskQueue("test", workers=2, retries=0)
+        function = Mock(side_effect=[RetryLater(0.01), RetryLater(0.01), None])
+        coroutine_function = AsyncMock(side_effect=[RetryLater(0.01), ValueError()])
+        on_failure = Mock()
+        queue.submit("key", function, on_failure=on_failure)
+        queue.submit("coroutine_key", coroutine_function, on_failure=on_failure)
+        self.assertTrue(queue.wait(timeout=5))
+        # the delayed runs are not failed attempts
+        self.assertEqual(function.call_count, 3)
+        self.assertEqual(coroutine_function.call_count, 2)
+        on_failure.assert_called_once()
+
+    @override_settings(UTB_TASKS_EAGER=True)
+    def test_eager_retry_later(self):
+        queue = TaskQueue("test", retries=1)
+        on_failure = Mock()
+        for function in (Mock(side_effect=RetryLater(60)), AsyncMock(side_effect=RetryLater(60))):
+            queue.submit("key", function, on_failure=on_failure)
+            function.assert_called_once()
+            self.assertFalse(queue.is_pending("key"))
+        on_failure.assert_not_called()
+
+    @override_settings(UTB_TASKS_EAGER=True)
+    def test_eager(self):
+        queue = TaskQueue("test", retries=1)
+        function = Mock(side_effect=[ValueError(), None])
+        queue.submit("key", function)
+        self.assertEqual(function.call_count, 2)
+        self.assertFalse(queue.is_pending("key"))
+
+        function = AsyncMock(side_effect=[ValueError(), None])
+        queue.submit("key", function)
+        self.assertEqual(function.call_count, 2)
+        self.assertFalse(queue.is_pending("key"))
+
+    def test_group_concurrency(self):
+        queue = TaskQueue("test", group_concurrency=2)
+        running, max_running = {"slow": 0, "fast": 0}, {"slow": 0, "fast": 0}
+
+        async def task(group):
+            running[group] += 1
+            max_running[group] = max(max_running[group], running[group])
+            await asyncio.sleep(0.05 if group == "slow" else 0)
+            running[group] -= 1
+
+        with override_settings(UTB_TASKS_ASYNC_CONCURRENCY=3):
+            for i in range(6):
+                queue.submit("slow" + str(i), task, "slow", group="slow")
+            for i in range(3):
+                queue.submit("fast" + str(i), task, "fast", group="fast")
+            self.assertTrue(queue.wait(timeout=5))
+        # the waiting slow tasks didn't take the slot left to the fast ones
+        self.assertEqual(max_running["slow"], 2)
+        self.assertEqual(max_running["fast"], 1)
+        self.assertEqual(queue._groups, {})
@@ -0,0 +1,103 @@
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.client import RequestFactory
+import asyncio
+
+from utb import users
+from utb.cache import UserCache, user_cache
+from utb.models import User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@override_settings(UTB_USER_CACHE_TIMEOUT=60)
+class UsersTest(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        User(id="uid", name="name", email="email@email.com").save()
+        token = users.identity_map.set({})
+        self.addCleanup(users.identity_map.reset, token)
+
+    def new_request(self):
+        token = users.identity_map.set({})
+        self.addCleanup(users.identity_map.reset, token)
+
+    def test_identity_map(self):
+        with self.assertNumQueries(1):
+            user = users.get_user("uid")
+            self.assertIs(users.get_user("uid"), user)
+        self.assertIsNone(users.get_user("missing"))
+
+    def test_cached_user(self):
+        users.get_user("uid", cached=True)
+        self.new_request()
+        with self.assertNumQueries(0):
+            user = users.get_user("uid", cached=True)
+        self.assertEqual((user.id, user.email, user.weight), ("uid", "email@email.com", 1.00))
+
+    def test_user_not_cached_by_default(self):
+        users.get_user("uid", cached=True)
+        self.new_request()
+        with self.assertNumQueries(1):
+            users.get_user("uid")
+
+    def test_cached_user_invalidated(self):
+        users.get_user("uid", cached=True)
+        User.objects.filter(id="uid").add_reports(1)
+        User.objects.filter(id="uid").add_weight(0.5)
+        self.new_request()
+        with self.assertNumQueries(1):
+            user = users.get_user("uid", cached=True)
+        self.assertEqual((user.n_reports, user.weight, user.total_score), (1, 1.5, 1.5))
+
+        user.name = "new name"
+        user.save()
+        self.assertIsNone(user_cache.get("uid"))
+
+    def test_update_invalidates_updated_users(self):
+        User(id="uid2", name="name2", email="email2@email.com").save()
+        users.get_user("uid", cached=True)
+        users.get_user("uid2", cached=True)
+        User.objects.filter(id="uid2").add_reports(1)
+        self.assertIsNotNone(user_cache.get("uid"))
+        self.assertIsNone(user_cache.get("uid2"))
+
+        self.new_request()
+        users.get_user("uid2", cached=True)
+        self.assertIsNotNone(user_cache.get("uid2"))
+        User.objects.update(weight=2.0)
+        self.assertIsNone(user_cache.get("uid"))
+        self.assertIsNone(user_cache.get("uid2"))
+
+    def test_cached_user_expires(self):
+        clock = FakeClock()
+        cache = UserCache(clock=clock)
+        cache.set(User.objects.get(id="uid"))
+        clock.now += 59
+        self.assertEqual(cache.get("uid")["email"], "email@email.com")
+        clock.now += 1
+        self.assertIsNone(cache.get("uid"))
+
+    @override_settings(UTB_USER_CACHE_TIMEOUT=0)
+    def test_cache_disabled(self):
+        users.get_user("uid", cached=True)
+        self.assertIsNone(user_cache.get("uid"))
+
+    async def test_async_middleware(self):
+        async def get_response(request):
+            maps.append(users.identity_map.get())
+            return HttpResponse()
+
+        maps = []
+        middleware = users.IdentityMapMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        await middleware(RequestFactory().get("/"))
+        await middleware(RequestFactory().get("/"))
+        self.assertEqual(maps, [{}, {}])
+        self.assertIsNot(maps[0], maps[1])
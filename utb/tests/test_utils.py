@@ -0,0 +1,37 @@
+import json
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+from django.test.client import RequestFactory
+
+from utb import utils
+
+
+class RequestBodyTest(SimpleTestCase):
+    def post(self, data):
+        return RequestFactory().post("get_article", data=data, content_type="application/json")
+
+    def test_body_decoded_once(self):
+        request = self.post(json.dumps({"token": "token", "object": {"url": "url"}}))
+        with patch.object(utils, "loads", wraps=utils.loads) as loads:
+            self.assertEqual(utils.get_token(request), "token")
+            self.assertEqual(utils.get_object(request), (True, {"url": "url"}))
+            self.assertEqual(utils.get_object(request), (True, {"url": "url"}))
+        self.assertEqual(loads.call_count, 1)
+        self.assertEqual(request.json_body, {"token": "token", "object": {"url": "url"}})
+
+    def test_invalid_envelope(self):
+        missing_object = (False, {"error": "Missing object"})
+        for data in ["", "not json", "[]", json.dumps({"object": None}), json.dumps({"object": "url"})]:
+            request = self.post(data)
+            self.assertEqual(utils.get_object(request), missing_object)
+            self.assertIsNone(utils.get_token(request))
+        self.assertIsNone(utils.get_token(self.post(json.dumps({"token": 1}))))
+
+    def test_json_backends(self):
+        document = '{"token": "token", "object": {"name": "\\u00e8", "n": [1, 2.5, null]}}'
+        with patch.object(utils, "orjson", None):
+            self.assertEqual(utils.loads(document), json.loads(document))
+        self.assertEqual(utils.loads(document.encode("utf-8")), json.loads(document))
+        with self.assertRaises(ValueError):
+            utils.loads("{")
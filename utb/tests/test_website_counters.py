@@ -0,0 +1,51 @@
+from django.core.management import call_command
+from django.test import TestCase
+from io import StringIO
+
+from utb import utils
+from utb.models import Website, WebsiteCounterDelta
+
+WEBSITE_ID = utils.hash_digest("website_name")
+OTHER_WEBSITE_ID = utils.hash_digest("other_website_name")
+
+
+class WebsiteCountersTest(TestCase):
+    def setUp(self):
+        self.website = Website(id=WEBSITE_ID, name="website_name", legit_articles=1, fake_articles=1)
+        self.website.save()
+        self.other_website = Website(id=OTHER_WEBSITE_ID, name="other_website_name")
+        self.other_website.save()
+
+    def test_pending_deltas_are_counted(self):
+        WebsiteCounterDelta.objects.create(website=self.website, legit_articles=1)
+        WebsiteCounterDelta.objects.create(website=self.website, legit_articles=1, fake_articles=-1)
+        website = Website.objects.get(id=WEBSITE_ID)
+        self.assertEqual(website.get_counters(), (3, 0))
+        self.assertEqual(website.legit_percentage(), 1.00)
+        self.assertEqual(Website.objects.get(id=OTHER_WEBSITE_ID).get_counters(), (0, 0))
+
+    def test_pending_counters_loaded_with_one_query(self):
+        WebsiteCounterDelta.objects.create(website=self.other_website, fake_articles=1)
+        websites = list(Website.objects.order_by("name"))
+        with self.assertNumQueries(1):
+            Website.load_pending_counters(websites)
+            self.assertEqual([website.get_counters() for website in websites], [(0, 1), (1, 1)])
+
+    def test_compact(self):
+        for _ in range(5):
+            WebsiteCounterDelta.objects.create(website=self.website, legit_articles=1)
+        WebsiteCounterDelta.objects.create(website=self.other_website, fake_articles=1)
+        expected = [website.get_counters() for website in Website.objects.order_by("id")]
+
+        self.assertEqual(WebsiteCounterDelta.objects.compact(chunk_size=2), 6)
+        self.assertFalse(WebsiteCounterDelta.objects.exists())
+        websites = Website.objects.order_by("id")
+        self.assertEqual([(website.legit_articles, website.fake_articles) for website in websites], expected)
+        self.assertEqual([website.get_counters() for website in websites], expected)
+
+    def test_compact_command(self):
+        WebsiteCounterDelta.objects.create(website=self.website, fake_articles=1)
+        output = StringIO()
+        call_command("compact_website_counters", stdout=output)
+        self.assertIn("Compacted 1 ", output.getvalue())
+        self.assertEqual(Website.objects.get(id=WEBSITE_ID).fake_articles, 2)
@@ -0,0 +1,104 @@
+from django.core.management import call_command
+from django.test import override_settings
+from django.test.client import RequestFactory
+from io import StringIO
+from unittest.mock import Mock, patch
+import json
+import random
+
+from utb import utils, write_behind
+from utb.views import submit_report, submit_reports
+from utb.models import Article, PendingReport, Report, ReportEvent, User, WebsiteCounterDelta
+from utb.tests.reports_test_case import ReportsTestCase
+
+
+class WriteBehindTest(ReportsTestCase):
+    def get_reports(self, n_reports):
+        rng = random.Random(0)
+        urls = list(Article.objects.order_by("id").values_list("url", flat=True))
+        return [("uid" + str(rng.randrange(8)), rng.choice(urls), rng.choice("LLF")) for _ in range(n_reports)]
+
+    def submit(self, user_id, url, report):
+        utils.check_google_token = Mock(return_value=(True, user_id))
+        request = RequestFactory().post("submit_report", content_type="application/json",
+                                        data=json.dumps({"object": {"url": url, "report": report}}))
+        self.assertEqual(submit_report.handler(request).status_code, 201)
+
+    def reset(self):
+        Report.objects.all().delete()
+        ReportEvent.objects.all().delete()
+        WebsiteCounterDelta.objects.all().delete()
+        User.objects.update(weight=1.00, n_reports=0, total_score=0.00)
+        Article.objects.update(legit_reports=0.00, fake_reports=0.00)
+
+    def test_same_state_as_sequential(self):
+        reports = self.get_reports(80)
+        for user_id, url, report in reports:
+            self.submit(user_id, url, report)
+        expected = self.get_state()
+        # the reports changed the status of some articles, so the flushes have to follow the weights
+        self.assertTrue(any(weight != 1.0 for _, weight, _, _ in expected[0]))
+
+        for flush_every in (1, 7, 80):
+            self.reset()
+            with override_settings(UTB_REPORTS_WRITE_BEHIND=True):
+                for i, (user_id, url, report) in enumerate(reports):
+                    self.submit(user_id, url, report)
+                    if (i + 1) % flush_every == 0:
+                        write_behind.flush()
+                write_behind.flush()
+            self.assertFalse(PendingReport.objects.exists())
+            self.assertStateEqual(self.get_state(), expected)
+
+    def test_articles_updated_by_flush(self):
+        with override_settings(UTB_REPORTS_WRITE_BEHIND=True):
+            for i in range(6):
+                self.submit("uid" + str(i), "url00", "L")
+        article = Article.objects.get(url="url00")
+        self.assertEqual((article.legit_reports, article.fake_reports), (0.00, 0.00))
+        self.assertEqual(User.objects.get(id="uid0").n_reports, 1)
+        self.assertEqual(PendingReport.objects.count(), 6)
+
+        self.assertEqual(write_behind.flush(), 6)
+        article.refresh_from_db()
+        self.assertEqual(article.get_status(), Article.Status.L)
+        # the status changed once in the flush, so the website has a single delta
+        self.assertEqual(WebsiteCounterDelta.objects.count(), 1)
+        self.assertEqual(article.website.get_counters(), (1, 0))
+        self.assertEqual(write_behind.flush(), 0)
+
+    def test_batch_reports(self):
+        utils.check_google_token = Mock(return_value=(True, "uid0"))
+        request = RequestFactory().post("submit_reports", content_type="application/json", data=json.dumps(
+            {"object": {"reports": [{"url": "url00", "report": "L"}, {"url": "url01", "report": "F"}]}}))
+        with override_settings(UTB_REPORTS_WRITE_BEHIND=True):
+            self.assertEqual(submit_reports.handler(request).status_code, 200)
+        self.assertEqual(Report.objects.count(), 2)
+        self.assertEqual(Article.objects.get(url="url00").legit_reports, 0.00)
+
+        output = StringIO()
+        call_command("flush_reports", stdout=output)
+        self.assertIn("Flushed 2 ", output.getvalue())
+        self.assertEqual(Article.objects.get(url="url00").legit_reports, 1.00)
+        self.assertEqual(Article.objects.get(url="url01").fake_reports, 1.00)
+
+    @override_settings(UTB_TASKS_EAGER=True, UTB_REPORTS_FLUSH_INTERVAL=0)
+    def test_report_committed_while_flush_task_ends(self):
+        pending = PendingReport(user_id="uid0", article=Article.objects.get(url="url00"), value="L")
+
+        def flush():
+            if len(flushes) == 0:
+                # a report is committed after the flush read the pending reports, while the task is still scheduled
+                pending.save()
+                write_behind.schedule_flush()
+                flushes.append(0)
+            else:
+                flushes.append(PendingReport.objects.all().delete()[0])
+            return flushes[-1]
+
+        flushes = []
+        with patch.object(write_behind, "flush", flush):
+            write_behind.schedule_flush()
+            self.assertEqual(flushes, [0, 1, 0])
+            write_behind.schedule_flush()
+            self.assertEqual(flushes, [0, 1, 0, 0])
@@ -1,11 +1,34 @@
+from django.conf import settings
 from django.urls import path
 
-from utb.views import add_user, get_article, submit_report, get_leaderboard, add_friend
+from utb import utils
+from utb.views import add_user, get_article, get_articles, submit_report, submit_reports, get_leaderboard, \
+    add_friend, get_cache_stats, get_metrics
+
+ASYNC_VIEWS = getattr(settings, "UTB_ASYNC_VIEWS", False)
+
+
+def get_handler(view):
+    """
+    :param view: the module of the view
+    :return: the handler of the view, under ASGI the asynchronous one that verifies the token without blocking
+             the event loop
+    """
+    if not ASYNC_VIEWS:
+        return view.handler
+    if hasattr(view, "async_handler"):
+        return view.async_handler
+    return utils.async_handler(view.process, view.LOGGING_TAG)
+
 
 urlpatterns = [
-    path("add_user", add_user.handler, name="add_user"),
-    path("get_article", get_article.handler, name="get_article"),
-    path("submit_report", submit_report.handler, name="submit_report"),
-    path("get_leaderboard", get_leaderboard.handler, name="get_leaderboard"),
-    path("add_friend", add_friend.handler, name="add_friend")
+    path("add_user", get_handler(add_user), name="add_user"),
+    path("get_article", get_handler(get_article), name="get_article"),
+    path("get_articles", get_handler(get_articles), name="get_articles"),
+    path("submit_report", get_handler(submit_report), name="submit_report"),
+    path("submit_reports", get_handler(submit_reports), name="submit_reports"),
+    path("get_leaderboard", get_handler(get_leaderboard), name="get_leaderboard"),
+    path("add_friend", get_handler(add_friend), name="add_friend"),
+    path("get_cache_stats", get_handler(get_cache_stats), name="get_cache_stats"),
+    path("metrics", get_handler(get_metrics), name="metrics")
 ]
@@ -0,0 +1,67 @@
+import asyncio
+import contextvars
+
+from django.db import DEFAULT_DB_ALIAS
+
+from utb.cache import user_cache
+from utb.models import User
+
+# the users already loaded by the request being processed, shared by the threads of sync_to_async through the context
+identity_map = contextvars.ContextVar("utb_identity_map", default=None)
+
+
+def get_user(user_id, cached=False):
+    """
+    Loads a user at most once per request: the users are kept in the identity map of the request, so every code path
+    handling the request shares the same instance
+    :param user_id: the user id
+    :param cached: if True the user can be read from the process-wide user_cache, as the read-only endpoints do,
+                   otherwise it is read from the database the first time in the request
+    :return: the user, or None if it doesn't exist
+    """
+    users = identity_map.get()
+    if users is not None and user_id in users:
+        return users[user_id]
+
+    fields = user_cache.get(user_id) if cached else None
+    if fields is not None:
+        user = User.from_db(DEFAULT_DB_ALIAS, list(fields.keys()), list(fields.values()))
+    else:
+        user = User.objects.filter(id=user_id).first()
+        if user is not None:
+            user_cache.set(user)
+
+    if users is not None and user is not None:
+        users[user_id] = user
+    return user
+
+
+class IdentityMapMiddleware:
+    """
+    Gives every request its own identity map of the users.
+    Under ASGI the middleware is asynchronous, so that the asynchronous views are not run in a thread
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # marks the instance as a coroutine function, as django.utils.deprecation.MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = identity_map.set({})
+        try:
+            return self.get_response(request)
+        finally:
+            identity_map.reset(token)
+
+    async def __acall__(self, request):
+        token = identity_map.set({})
+        try:
+            return await self.get_response(request)
+        finally:
+            identity_map.reset(token)
@@ -1,20 +1,29 @@
-from google.oauth2 import id_token
-from google.auth.transport import requests
 import re
 import json
-import urllib3
-from bs4 import BeautifulSoup
+import logging as log
 from hashlib import sha256
 
-# regex to check the email correctness
-from utb.models import User
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+
+try:
+    import orjson  # faster JSON decoder, used if installed
+except ImportError:
+    orjson = None
+
+from utb import auth, metrics, page_store, users
 
 MULTIPLIER_DELTA = 0.01
 
+# regex to check the email correctness
 MAIL_REGEX = '^\w+([\.-]?\w+)*@\w+([\.-]?\w+)*(\.\w{2,3})+$'
 
 CLIENT_ID = "234949874727-7pbe1gebujhcicmo1c0i35o948fe7oqa.apps.googleusercontent.com"
 
+TITLE_SEPARATOR_REGEX = re.compile(" [-|] ")
+
+token_verifier = auth.TokenVerifier(CLIENT_ID)
+
 
 def check_email(email):
     """
@@ -29,44 +38,147 @@ def check_google_token(request):
     """
     Checks if the authentication token of the user is valid
     See https://developers.google.com/identity/sign-in/android/backend-auth
+    Google's certificates and the already verified tokens are cached by the token_verifier
     :param request: the http request
     :return: (True, user id) if the token is valid, otherwise (False, error message)
     """
     try:
-        token = json.loads(request.body)["token"]
-        id_info = id_token.verify_oauth2_token(token, requests.Request(), CLIENT_ID)
+        token = get_token(request)
+        if not token:
+            return False, "Missing token"
+        with metrics.span("token"):
+            return check_issuer(token_verifier.verify(token))
+    except (AttributeError, ValueError) as error:
+        return False, str(error)
 
-        if id_info["iss"] not in ["accounts.google.com", "https://accounts.google.com"]:
-            return False, "Wrong issuer"
 
-        return True, id_info["sub"]
+async def check_google_token_async(request):
+    """
+    Asynchronous version of check_google_token: Google's certificates are downloaded without blocking the event loop
+    :param request: the http request
+    :return: (True, user id) if the token is valid, otherwise (False, error message)
+    """
+    try:
+        token = get_token(request)
+        if not token:
+            return False, "Missing token"
+        with metrics.span("token"):
+            return check_issuer(await token_verifier.verify_async(token))
     except (AttributeError, ValueError) as error:
         return False, str(error)
 
 
+def async_handler(process, logging_tag):
+    """
+    Builds the asynchronous version of a view's handler: the token is verified without blocking the event loop,
+    while the database work of process runs in a single sync_to_async section
+    :param process: the function of the view taking the request and the id of the authenticated user
+    :param logging_tag: the LOGGING_TAG of the view
+    :return: the asynchronous view, returning the same responses of the view's handler
+    """
+    async def handler(request):
+        is_token_valid, message = await check_google_token_async(request)
+        if not is_token_valid:
+            log.error(logging_tag + message)
+            return HttpResponse(message, status=403)
+        return await sync_to_async(process)(request, message)
+
+    return handler
+
+
+def check_issuer(id_info):
+    """
+    :param id_info: the decoded token
+    :return: (True, user id) if the token was issued by Google, otherwise (False, error message)
+    """
+    if id_info["iss"] not in ["accounts.google.com", "https://accounts.google.com"]:
+        return False, "Wrong issuer"
+    return True, id_info["sub"]
+
+
+def loads(data):
+    """
+    :param data: the JSON document, as str or bytes
+    :return: the decoded document
+    :raise ValueError: if the document is not valid JSON
+    """
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def get_body(request):
+    """
+    Decodes the JSON body of the request. The body is decoded only the first time, then the result is stored
+    in request.json_body and shared by all the helpers that read the body
+    :param request: the request
+    :return: the body as dict, or None if the body is missing or is not a JSON object
+    """
+    if not hasattr(request, "json_body"):
+        try:
+            body = loads(request.body) if request.body else None
+        except ValueError:
+            body = None
+        request.json_body = body if isinstance(body, dict) else None
+    return request.json_body
+
+
+def get_token(request):
+    """
+    :param request: the request
+    :return: the authentication token in the request body, or None if it is missing
+    """
+    body = get_body(request)
+    token = body.get("token") if body is not None else None
+    return token if isinstance(token, str) else None
+
+
 def get_object(request):
     """
     Checks if the request body contains the object
     :param request: the request
     :return: (True, Object as dict) if the body contains the object, otherwise (False, Error as dict)
     """
-    if not request.body or "object" not in json.loads(request.body):
+    body = get_body(request)
+    if not body or not isinstance(body.get("object"), dict):
         return False, {"error": "Missing object"}
-    return True, json.loads(request.body)["object"]
+    return True, body["object"]
 
 
-def parse_article_name_from_url(url):
+async def parse_article_name_from_url_async(url):
     """
-    Parses the article name from the web page and returns it
+    Parses the article name from the web page and returns it.
+    The page is only read until its title is found, and is not downloaded again while its metadata is stored,
+    see page_store.get_page_async
     :param url: the article's url
     :return: the article's name
+    :raise ValueError: if the page has no title, or can't be downloaded
+    """
+    with metrics.span("fetch"):
+        page = await page_store.get_page_async(url)
+    return clean_article_name(url, page.title)
+
+
+async def parse_article_from_url_async(url):
+    """
+    Parses the article name and the canonical url declared by the web page
+    :param url: the article's url
+    :return: the tuple (article's name, canonical url of the page or None)
+    :raise ValueError: if the page has no title, or can't be downloaded
+    """
+    with metrics.span("fetch"):
+        page = await page_store.get_page_async(url)
+    return clean_article_name(url, page.title), page.canonical_url
+
+
+def clean_article_name(url, title):
+    """
+    :param url: the article's url
+    :param title: the title of the web page
+    :return: the article's name, without the website name that usually follows it in the title
+    :raise ValueError: if the page has no title
     """
-    http = urllib3.PoolManager()
-    response = http.request('GET', url)
-    soup = BeautifulSoup(response.data, 'html.parser')
-    article_name = soup.title.string
-    article_name = re.compile(" [-|] ").split(article_name)[0]
-    return article_name
+    if title is None:
+        raise ValueError("Missing title in " + url)
+    return TITLE_SEPARATOR_REGEX.split(title)[0]
 
 
 def hash_digest(string):
@@ -77,10 +189,10 @@ def hash_digest(string):
     return sha256(string.encode("utf-8")).hexdigest() if string is not None else None
 
 
-def get_user_by_id(uid):
+def get_user_by_id(uid, cached=False):
     """
     :param uid: the user id to be checked
+    :param cached: if True the user can be read from the process-wide cache, see users.get_user
     :return: the user if he exists, otherwise None
     """
-    qs = User.objects.filter(id=uid)
-    return qs[0] if len(qs) != 0 else None
+    return users.get_user(uid, cached=cached)
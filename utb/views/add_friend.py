@@ -20,8 +20,16 @@ def handler(request):
     if not is_token_valid:
         log.error(LOGGING_TAG + "Invalid Token")
         return HttpResponse(message, status=403)
-    user_id = message
+    return process(request, message)
 
+
+def process(request, user_id):
+    """
+    Creates the friend relationship once the user has been authenticated
+    :param request: the HTTP request
+    :param user_id: the id of the authenticated user
+    :return: the response of the handler
+    """
     user = utils.get_user_by_id(user_id)
     if not user:
         log.error(LOGGING_TAG + "Missing user")
@@ -44,7 +52,7 @@ def handler(request):
         log.error(LOGGING_TAG + "User and Friend must not be the same user")
         return HttpResponse("User and friend must not be the same user", status=406)
 
-    friendship = Friendship(user=user, friend=friend)
-    friendship.save()
+    # adding the same friend twice is not an error, the friendship is simply already there
+    Friendship.objects.get_or_create(user=user, friend=friend)
 
     return HttpResponse("Created", status=201)
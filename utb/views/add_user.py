@@ -22,8 +22,16 @@ def handler(request):
     if not is_token_valid:
         log.error(LOGGING_TAG + message)
         return HttpResponse(message, status=403)
-    user_id = message
+    return process(request, message)
 
+
+def process(request, user_id):
+    """
+    Adds the user once the token has been verified
+    :param request: the HTTP request
+    :param user_id: the id of the authenticated user
+    :return: the response of the handler
+    """
     user = utils.get_user_by_id(user_id)
     if user:
         log.info(LOGGING_TAG + "User already present")
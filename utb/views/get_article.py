@@ -1,12 +1,21 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.http import JsonResponse, HttpResponse
+from django.utils import timezone
 import logging as log
 
-from utb import utils
-from utb.models import Website, Article, Report
+from utb import canonical, page_store, utils
+from utb.cache import payload_cache
+from utb.models import Website, Article, ArticleAlias, Report
+from utb.tasks import RetryLater, TaskQueue
 
 LOGGING_TAG = "GetArticle: "
 log.basicConfig(level=log.INFO)
 
+# resolves the names of the new articles in background
+article_names_queue = TaskQueue("article-names")
+
 
 def handler(request):
     """
@@ -21,9 +30,17 @@ def handler(request):
     if not is_token_valid:
         log.error(LOGGING_TAG + message)
         return HttpResponse(message, status=403)
-    user_id = message
+    return process(request, message)
+
 
-    user = utils.get_user_by_id(user_id)
+def process(request, user_id):
+    """
+    Returns the article once the user has been authenticated
+    :param request: the HTTP request
+    :param user_id: the id of the authenticated user
+    :return: the response of the handler
+    """
+    user = utils.get_user_by_id(user_id, cached=True)
     if not user:
         log.error(LOGGING_TAG + "Missing user")
         return HttpResponse("Missing user", status=404)
@@ -38,21 +55,16 @@ def handler(request):
         log.error(LOGGING_TAG + "Invalid arguments")
         return HttpResponse("Invalid arguments", status=400)
 
-    article_id = utils.hash_digest(url)
-    qs = Article.objects.filter(id=article_id)
-    if len(qs) == 0:
-        article, website = add_article(article_id, url, website_name)
-    else:
-        article = qs[0]
-        # here I use get because I'm sure that the website exists
-        website = Website.objects.get(id=article.website.id)
-
-    qs = Report.objects.filter(user=user, article=article)
-    if len(qs) != 0:
-        report = qs[0]
-        data = {"article": article.as_dict(), "website": website.as_dict(), "report": report.as_dict()}
+    # the canonical url only identifies the article, the page is fetched from the url the client submitted,
+    # since e.g. a website may not serve its pages over https
+    article_id, article_data, website_data = get_payload(canonical.get_article_id(url), url, website_name)
+
+    report = Report.objects.select_related("article").filter(user=user, article_id=article_id).first()
+    if report is not None:
+        report.user = user
+        data = {"article": article_data, "website": website_data, "report": report.as_dict()}
     else:
-        data = {"article": article.as_dict(), "website": website.as_dict()}
+        data = {"article": article_data, "website": website_data}
 
     return JsonResponse(
         data,
@@ -60,30 +72,138 @@ def handler(request):
     )
 
 
+def get_payload(article_id, url, website_name):
+    """
+    Reads the article and its website from the cache, falling back to the database.
+    The article is cached only once its name is resolved, since until then it is still going to change
+    :param article_id: the id of the article, or of one of its aliases
+    :param url: the article url, as submitted by the client
+    :param website_name: the article's website name
+    :return: the tuple (id of the article, article.as_dict(), website.as_dict())
+    """
+    cached_article = payload_cache.get_article(article_id)
+    if cached_article is not None:
+        website_data = payload_cache.get_website(cached_article["website_id"])
+        if website_data is None:
+            # here I use get because I'm sure that the website exists
+            website = Website.objects.get(id=cached_article["website_id"])
+            payload_cache.set_website(website)
+            website_data = website.as_dict()
+        return article_id, cached_article["article"], website_data
+
+    article = canonical.find_article(Article.objects.select_related("website"), article_id)
+    if article is None:
+        article, website = add_article(article_id, url, website_name)
+    else:
+        website = article.website
+        # if the server restarted while the name was being fetched, the task is scheduled again
+        if not article.name_resolved:
+            schedule_name_resolution(article)
+
+    if article.name_resolved:
+        payload_cache.set_article(article, website.id)
+    payload_cache.set_website(website)
+    return article.id, article.as_dict(), website.as_dict()
+
+
 def add_article(article_id, url, website_name):
     """
-    Adds an article to the database
+    Adds an article to the database.
+    The article is created with its url as a placeholder name, and the real name is fetched in background
     :param article_id: the article id
     :param url: the article url
     :param website_name: the article's website name
     :return: the tuple (Article, Website)
     """
-    url = url
-    article_name = utils.parse_article_name_from_url(url)
-
     website_id = utils.hash_digest(website_name)
     qs = Website.objects.filter(id=website_id)
     website = add_website(website_id, website_name) if len(qs) == 0 else qs[0]
 
     article = Article(id=article_id,
                       url=url,
-                      name=article_name,
+                      name=url,
+                      name_resolved=False,
                       website=website)
     article.save()
-    log.info(LOGGING_TAG + "Article " + article_name + " created")
+    log.info(LOGGING_TAG + "Article " + url + " created")
+    schedule_name_resolution(article)
+    # the task may already be completed, e.g. when the tasks run synchronously
+    if not article_names_queue.is_pending(article.id):
+        article.refresh_from_db(fields=["name", "name_resolved"])
     return article, website
 
 
+def schedule_name_resolution(article):
+    """
+    Schedules the task fetching the name of the article from its web page.
+    The tasks are grouped by host, so that a slow website can't delay the articles of the others
+    :param article: the article
+    """
+    article_names_queue.submit(article.id, resolve_article_name, article.id, article.url,
+                               on_failure=give_up_article_name, group=canonical.get_host(article.url))
+
+
+async def resolve_article_name(article_id, url):
+    """
+    Fetches the name of the article from its web page and stores it.
+    The page is downloaded asynchronously, so that many slow websites can be read at the same time.
+    While a failed download of the page is in the negative cache the task waits for it to expire, instead of
+    spending one of its attempts
+    :param article_id: the article id
+    :param url: the article url
+    """
+    try:
+        if getattr(settings, "UTB_FOLLOW_CANONICAL", False):
+            article_name, canonical_url = await utils.parse_article_from_url_async(url)
+            if canonical_url is not None:
+                await sync_to_async(add_canonical_alias)(article_id, canonical_url)
+        else:
+            article_name = await utils.parse_article_name_from_url_async(url)
+    except page_store.CachedFailureError as error:
+        raise RetryLater((error.expires - timezone.now()).total_seconds(), str(error)) from error
+    await sync_to_async(save_article_name)(article_id, article_name)
+    log.info(LOGGING_TAG + "Article " + url + " named " + article_name)
+
+
+def save_article_name(article_id, article_name):
+    """
+    :param article_id: the article id
+    :param article_name: the name of the article
+    """
+    Article.objects.filter(id=article_id).update(name=article_name, name_resolved=True)
+    payload_cache.invalidate_article(article_id)
+
+
+def add_canonical_alias(article_id, canonical_url):
+    """
+    Makes the canonical url declared by the page of the article an alias of the article, so that the requests for
+    the canonical url find it.
+    If the canonical url is already another article, the two are left as they are
+    :param article_id: the article id
+    :param canonical_url: the url of the rel=canonical link of the page
+    """
+    alias_id = canonical.get_article_id(canonical_url)
+    if alias_id == article_id or Article.objects.filter(id=alias_id).exists():
+        return
+    try:
+        with transaction.atomic():
+            ArticleAlias.objects.get_or_create(id=alias_id, defaults={"article_id": article_id})
+    except IntegrityError:
+        # the article was deleted in the meantime
+        log.warning(LOGGING_TAG + "Alias " + canonical_url + " not added")
+
+
+def give_up_article_name(article_id, url, error):
+    """
+    Keeps the placeholder name of an article whose web page could not be parsed
+    :param article_id: the article id
+    :param url: the article url
+    :param error: the last error raised while parsing the web page
+    """
+    Article.objects.filter(id=article_id).update(name_resolved=True)
+    payload_cache.invalidate_article(article_id)
+
+
 def add_website(website_id, website_name):
     """
     Adds a website to the database and returns it
@@ -0,0 +1,130 @@
+from django.http import HttpResponse, JsonResponse
+import logging as log
+
+from utb import canonical, utils
+from utb.models import Website, Article, Report
+from utb.views.get_article import article_names_queue, schedule_name_resolution
+
+LOGGING_TAG = "GetArticles: "
+log.basicConfig(level=log.INFO)
+
+MAX_BATCH_SIZE = 100
+
+
+def handler(request):
+    """
+    Returns the articles with the input urls, e.g. all the links visible in a feed.
+    The object contains "articles", the list of {"url", "website_name"} of the articles
+    :param request: the HTTP request
+    :return:    HttpResponse 403 if the verification token is invalid
+                HttpResponse 404 if the object is invalid
+                HttpResponse 400 if the arguments of the object are invalid
+                JsonResponse 200 containing the list of (article, website, report if present), in the same
+                order of the input list
+    """
+    is_token_valid, message = utils.check_google_token(request)
+    if not is_token_valid:
+        log.error(LOGGING_TAG + message)
+        return HttpResponse(message, status=403)
+    return process(request, message)
+
+
+def process(request, user_id):
+    """
+    Returns the articles once the user has been authenticated
+    :param request: the HTTP request
+    :param user_id: the id of the authenticated user
+    :return: the response of the handler
+    """
+    user = utils.get_user_by_id(user_id, cached=True)
+    if not user:
+        log.error(LOGGING_TAG + "Missing user")
+        return HttpResponse("Missing user", status=404)
+
+    is_object_present, object_json = utils.get_object(request)
+    if not is_object_present:
+        log.error(LOGGING_TAG + object_json["error"])
+        return HttpResponse(object_json["error"], status=404)
+
+    items = object_json.get("articles")
+    if not isinstance(items, list) or not 0 < len(items) <= MAX_BATCH_SIZE or not all(
+            isinstance(item, dict) and is_valid_name(item.get("url")) and is_valid_name(item.get("website_name"))
+            for item in items):
+        log.error(LOGGING_TAG + "Invalid arguments")
+        return HttpResponse("Invalid arguments", status=400)
+
+    # the same url, or variants of it, can appear more than once, so the items are indexed by the article id
+    items = {canonical.get_article_id(item["url"]): (item["url"], item["website_name"]) for item in items}
+    article_ids = list(items.keys())
+
+    # the articles found through an alias have a different id
+    articles = canonical.find_articles(Article.objects.select_related("website"), article_ids)
+    missing_items = {article_id: items[article_id] for article_id in article_ids if article_id not in articles}
+    if missing_items:
+        articles.update(add_articles(missing_items))
+    # if the server restarted while the names were being fetched, the tasks are scheduled again
+    for article in articles.values():
+        if not article.name_resolved and article.id not in missing_items:
+            schedule_name_resolution(article)
+
+    reports = {report.article_id: report for report in
+               Report.objects.select_related("article")
+               .filter(user=user, article_id__in={article.id for article in articles.values()})}
+    for report in reports.values():
+        report.user = user
+
+    # the pending counters of all the websites are read with one query
+    Website.load_pending_counters([article.website for article in articles.values()])
+
+    data = []
+    for item in object_json["articles"]:
+        article = articles[canonical.get_article_id(item["url"])]
+        entry = {"article": article.as_dict(), "website": article.website.as_dict()}
+        if article.id in reports:
+            entry["report"] = reports[article.id].as_dict()
+        data.append(entry)
+    return JsonResponse({"articles": data}, status=200)
+
+
+def add_articles(items):
+    """
+    Adds the articles, and their missing websites, to the database with one INSERT for the websites and one for
+    the articles, then reads the articles back with their websites.
+    The articles are created with their urls as placeholder names, and the real names are fetched in background.
+    The fetches are coroutines sharing the task queue's event loop, so the web pages are downloaded in parallel
+    :param items: the dict article id -> (url, website name)
+    :return: the dict article id -> Article
+    """
+    website_ids = {utils.hash_digest(website_name): website_name for _, website_name in items.values()}
+    websites = {website.id: website for website in Website.objects.filter(id__in=website_ids.keys())}
+    new_websites = [Website(id=website_id, name=website_name) for website_id, website_name in website_ids.items()
+                    if website_id not in websites]
+    # a concurrent request may have created the same rows in the meantime, in that case they are left as they are
+    Website.objects.bulk_create(new_websites, ignore_conflicts=True)
+    websites.update({website.id: website for website in new_websites})
+
+    Article.objects.bulk_create([Article(id=article_id, url=url, name=url, name_resolved=False,
+                                         website=websites[utils.hash_digest(website_name)])
+                                 for article_id, (url, website_name) in items.items()], ignore_conflicts=True)
+    log.info(LOGGING_TAG + str(len(items)) + " articles and " + str(len(new_websites)) + " websites created")
+    # the articles inserted first by a concurrent request are not the ones built here, so all are read back
+    articles = canonical.find_articles(Article.objects.select_related("website"), items.keys())
+
+    unresolved = {article.id: article for article in articles.values() if not article.name_resolved}
+    for article in unresolved.values():
+        schedule_name_resolution(article)
+    # the tasks may already be completed, e.g. when the tasks run synchronously
+    resolved_ids = [article_id for article_id in unresolved if not article_names_queue.is_pending(article_id)]
+    if resolved_ids:
+        for article_id, name, name_resolved in Article.objects.filter(id__in=resolved_ids) \
+                .values_list("id", "name", "name_resolved"):
+            unresolved[article_id].name, unresolved[article_id].name_resolved = name, name_resolved
+    return articles
+
+
+def is_valid_name(value):
+    """
+    :param value: the input value
+    :return: True if the value is a non-empty string, otherwise False
+    """
+    return isinstance(value, str) and value != ""
@@ -0,0 +1,35 @@
+from django.http import HttpResponse, JsonResponse
+import logging as log
+
+from utb import utils
+from utb.cache import payload_cache
+
+LOGGING_TAG = "GetCacheStats: "
+
+
+def handler(request):
+    """
+    Returns the hit and miss counters of the get_article cache of this server process
+    :param request: the HTTP request
+    :return:    HttpResponse 403 if the verification token is invalid
+                HttpResponse 404 if the user does not exist
+                JsonResponse 200 containing the counters
+    """
+    is_token_valid, message = utils.check_google_token(request)
+    if not is_token_valid:
+        log.error(LOGGING_TAG + message)
+        return HttpResponse(message, status=403)
+    return process(request, message)
+
+
+def process(request, user_id):
+    """
+    Returns the counters once the user has been authenticated
+    :param request: the HTTP request
+    :param user_id: the id of the authenticated user
+    :return: the response of the handler
+    """
+    if not utils.get_user_by_id(user_id, cached=True):
+        log.error(LOGGING_TAG + "Missing user")
+        return HttpResponse("Missing user", status=404)
+    return JsonResponse(payload_cache.stats(), status=200)
@@ -1,3 +1,8 @@
+import bisect
+
+from django.core import signing
+from django.db.models import ExpressionWrapper, F, FloatField, Q, Window
+from django.db.models.functions import RowNumber
 from django.http import HttpResponse, JsonResponse
 import logging as log
 
@@ -6,22 +11,41 @@ from utb.models import User, Friendship
 
 LOGGING_TAG = "GetLeaderboard: "
 
+LEADERBOARD_SIZE = 100
+MAX_LEADERBOARD_SIZE = 1000
+MAX_AROUND_SIZE = 500
+
+CURSOR_SALT = "utb.leaderboard"
+
 
 def handler(request):
     """
-    Returns the global or friends only leaderboard
+    Returns the global or friends only leaderboard.
+    Only a slice of the leaderboard is returned, chosen through the optional arguments of the object:
+        "limit": the number of users to return
+        "cursor": the "next_cursor" of the previous page, to get the users that follow it
+        "around": K, to get the K users before and after the requester instead of a page
     :param request: the HTTP request
     :return:    HttpResponse 403 if the verification token is invalid
                 HttpResponse 404 if the object is invalid
+                HttpResponse 400 if the arguments of the object are invalid
                 JsonResponse 200 containing the leaderboard if the request went through
     """
     is_token_valid, message = utils.check_google_token(request)
     if not is_token_valid:
         log.error(LOGGING_TAG + message)
         return HttpResponse(message, status=403)
-    user_id = message
+    return process(request, message)
 
-    requester = utils.get_user_by_id(user_id)
+
+def process(request, user_id):
+    """
+    Returns the leaderboard once the user has been authenticated
+    :param request: the HTTP request
+    :param user_id: the id of the authenticated user
+    :return: the response of the handler
+    """
+    requester = utils.get_user_by_id(user_id, cached=True)
     if not requester:
         log.error(LOGGING_TAG + "Missing user")
         return HttpResponse("Missing user", status=404)
@@ -32,27 +56,144 @@ def handler(request):
         return HttpResponse(object_json["error"], status=404)
 
     leaderboard_type = object_json["type"]
+    if leaderboard_type not in ("GLOBAL", "FRIENDS"):
+        log.error(LOGGING_TAG + "Wrong leaderboard type")
+        return HttpResponse("Wrong leaderboard type", status=400)
+
+    limit, cursor, around = object_json.get("limit", LEADERBOARD_SIZE), object_json.get("cursor"), \
+        object_json.get("around")
+    if not is_valid_size(limit, MAX_LEADERBOARD_SIZE) or (around is not None and not is_valid_size(
+            around, MAX_AROUND_SIZE)):
+        log.error(LOGGING_TAG + "Invalid arguments")
+        return HttpResponse("Invalid arguments", status=400)
+    if cursor is not None:
+        try:
+            cursor = signing.loads(cursor, salt=CURSOR_SALT)
+        except (signing.BadSignature, TypeError, ValueError):
+            log.error(LOGGING_TAG + "Invalid cursor")
+            return HttpResponse("Invalid cursor", status=400)
 
     if leaderboard_type == "GLOBAL":
-        user_position = None
-        leaderboard = []
-        for i, user in enumerate(sorted(list(User.objects.all()), key=lambda u: u.score(), reverse=True), 1):
-            if user.id == user_id:
-                user_position = i
-            leaderboard.append({"name": user.name, "score": int(user.score())})
-        data = {"user_position": user_position, "leaderboard": leaderboard}
-        return JsonResponse(data, status=200)
-    elif leaderboard_type == "FRIENDS":
-        user_position = None
-        leaderboard = []
-        for i, user in enumerate(sorted(
-                list(map(lambda friendship: friendship.friend, Friendship.objects.filter(user=requester))) + [
-                    requester], key=lambda u: u.score(), reverse=True), 1):
-            if user.id == user_id:
-                user_position = i
-            leaderboard.append({"name": user.name, "score": int(user.score())})
-        data = {"user_position": user_position, "leaderboard": leaderboard}
-        return JsonResponse(data, status=200)
+        user_position, entries, has_next = get_global_leaderboard(requester, limit, cursor, around)
     else:
-        log.error(LOGGING_TAG + "Wrong leaderboard type")
-        return HttpResponse("Wrong leaderboard type", status=400)
+        user_position, entries, has_next = get_friends_leaderboard(requester, limit, cursor, around)
+
+    data = {"user_position": user_position,
+            "leaderboard": [{"name": name, "score": int(score)} for _, name, score in entries],
+            "next_cursor": encode_cursor(entries[-1]) if has_next and entries else None}
+    return JsonResponse(data, status=200)
+
+
+def get_global_leaderboard(requester, limit, cursor, around):
+    """
+    Reads a slice of the global leaderboard from the (total_score, id) index
+    :param requester: the requester
+    :param limit: the number of users in a page
+    :param cursor: the (score, id) of the last user of the previous page, or None
+    :param around: the number of users to return before and after the requester, or None to return a page
+    :return: the tuple (position of the requester, list of (id, name, score), True if there are more users)
+    """
+    users = User.objects.all()
+    if around is not None:
+        entries = get_users_before(users, (requester.total_score, requester.id), around) + [
+            (requester.id, requester.name, requester.total_score)]
+        entries_after = get_users_after(users, (requester.total_score, requester.id), around)
+        has_next = len(entries_after) == around
+        entries += entries_after
+    else:
+        entries = get_users_after(users, cursor, limit)
+        has_next = len(entries) == limit
+    return get_position(users, requester), entries, has_next
+
+
+def get_friends_leaderboard(requester, limit, cursor, around):
+    """
+    Ranks the requester and their friends with a single query, then returns a slice of the leaderboard
+    :param requester: the requester
+    :param limit: the number of users in a page
+    :param cursor: the (score, id) of the last user of the previous page, or None
+    :param around: the number of users to return before and after the requester, or None to return a page
+    :return: the tuple (position of the requester, list of (id, name, score), True if there are more users)
+    """
+    ranking = list(User.objects.filter(Q(id__in=Friendship.objects.filter(user=requester).values("friend")) |
+                                       Q(id=requester.id))
+                   .annotate(ranking_score=ExpressionWrapper(F("n_reports") * F("weight"), output_field=FloatField()))
+                   .annotate(position=Window(RowNumber(), order_by=[F("ranking_score").desc(), F("id").asc()]))
+                   .order_by("position")
+                   .values_list("id", "name", "ranking_score", "position"))
+    user_position = next(position for user_id, _, _, position in ranking if user_id == requester.id)
+
+    if around is not None:
+        start, end = max(user_position - 1 - around, 0), user_position + around
+    else:
+        start = 0
+        if cursor is not None:
+            # the users are sorted by the key (-score, id), so the page starts after the first key above the cursor
+            start = bisect.bisect_right([(-score, user_id) for user_id, _, score, _ in ranking],
+                                        (-cursor[0], cursor[1]))
+        end = start + limit
+    entries = [(user_id, name, score) for user_id, name, score, _ in ranking[start:end]]
+    return user_position, entries, end < len(ranking)
+
+
+def get_position(users, requester):
+    """
+    :param users: the users in the leaderboard
+    :param requester: the requester
+    :return: the position of the requester in the leaderboard, starting from 1
+    """
+    return users.filter(ranked_before(requester.total_score, requester.id)).count() + 1
+
+
+def get_users_after(users, key, limit):
+    """
+    Keyset pagination: the users are ordered by decreasing score and then by id, so that the page
+    following a given user is read directly from the (total_score, id) index
+    :param users: the users in the leaderboard
+    :param key: the (score, id) of the last user of the previous page, or None for the first page
+    :param limit: the number of users to return
+    :return: the list of (id, name, score) that follow the key
+    """
+    if key is not None:
+        score, user_id = key
+        users = users.filter(Q(total_score__lt=score) | Q(total_score=score, id__gt=user_id))
+    return list(users.order_by("-total_score", "id").values_list("id", "name", "total_score")[:limit])
+
+
+def get_users_before(users, key, limit):
+    """
+    :param users: the users in the leaderboard
+    :param key: the (score, id) of a user
+    :param limit: the number of users to return
+    :return: the list of (id, name, score) of the users that immediately precede the key, in leaderboard order
+    """
+    score, user_id = key
+    users = users.filter(ranked_before(score, user_id))
+    return list(reversed(users.order_by("total_score", "-id").values_list("id", "name", "total_score")[:limit]))
+
+
+def ranked_before(score, user_id):
+    """
+    :param score: the score of a user
+    :param user_id: the id of the user
+    :return: the condition matching the users ranked before the input one
+    """
+    return Q(total_score__gt=score) | Q(total_score=score, id__lt=user_id)
+
+
+def encode_cursor(entry):
+    """
+    :param entry: the (id, name, score) of the last user of a page
+    :return: the opaque cursor pointing after the entry
+    """
+    user_id, _, score = entry
+    return signing.dumps([score, user_id], salt=CURSOR_SALT)
+
+
+def is_valid_size(value, max_value):
+    """
+    :param value: the input value
+    :param max_value: the maximum accepted value
+    :return: True if the value is an integer between 1 and max_value, otherwise False
+    """
+    return isinstance(value, int) and not isinstance(value, bool) and 0 < value <= max_value
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.http import HttpResponse
+import hmac
+import logging as log
+
+from utb import metrics
+
+LOGGING_TAG = "GetMetrics: "
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def handler(request):
+    """
+    Returns the request, query and span histograms and the cache counters of this server process.
+    The endpoint is read by Prometheus, which sends settings.UTB_METRICS_TOKEN as bearer token instead of a Google
+    token. Without the setting the endpoint is disabled
+    :param request: the HTTP request
+    :return:    HttpResponse 403 if the endpoint is disabled or the bearer token is invalid
+                HttpResponse 200 containing the metrics in the Prometheus text format
+    """
+    if not is_token_valid(request):
+        log.error(LOGGING_TAG + "Invalid metrics token")
+        return HttpResponse("Invalid metrics token", status=403)
+    return HttpResponse(metrics.render(), content_type=CONTENT_TYPE, status=200)
+
+
+async def async_handler(request):
+    """
+    Asynchronous version of handler, the metrics are in memory
+    :param request: the HTTP request
+    :return: the same response of handler
+    """
+    return handler(request)
+
+
+def is_token_valid(request):
+    """
+    :param request: the HTTP request
+    :return: True if the request has the bearer token of settings.UTB_METRICS_TOKEN, False if it hasn't or the
+             setting is missing
+    """
+    token = getattr(settings, "UTB_METRICS_TOKEN", None)
+    if not token:
+        return False
+    scheme, _, credentials = request.headers.get("Authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(credentials.strip().encode(), token.encode())
@@ -1,8 +1,11 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
 from django.http import HttpResponse
 import logging as log
 
-from utb.models import Article, Report
-from utb import utils
+from utb.models import Article, Report, ReportEvent, User, WebsiteCounterDelta
+from utb import canonical, rules, utils, write_behind
+from utb.cache import payload_cache
 
 LOGGING_TAG = "SubmitReport: "
 log.basicConfig(level=log.INFO)
@@ -21,8 +24,16 @@ def handler(request):
     if not is_token_valid:
         log.error(LOGGING_TAG + message)
         return HttpResponse(message, status=403)
-    user_id = message
+    return process(request, message)
 
+
+def process(request, user_id):
+    """
+    Adds the report once the user has been authenticated
+    :param request: the HTTP request
+    :param user_id: the id of the authenticated user
+    :return: the response of the handler
+    """
     user = utils.get_user_by_id(user_id)
     if not user:
         log.error(LOGGING_TAG + "Missing user")
@@ -43,131 +54,133 @@ def handler(request):
         log.error(LOGGING_TAG + "Invalid report value")
         return HttpResponse("Invalid report value", status=400)
 
-    qs = Article.objects.filter(id=utils.hash_digest(article_url))
-    if len(qs) == 0:
-        log.error(LOGGING_TAG + "Article not found")
-        return HttpResponse("Article not found", status=404)
-    article = qs[0]
-
-    previous_status = article.get_status()
-
-    qs = Report.objects.filter(user=user, article=article)
-    if len(qs) == 0:
-        report = Report(user=user,
-                        article=article,
-                        value=report_value.name)
-        user.n_reports += 1
-        user.save()
-        # in the case the report was not present before, we only have to add the weight of the user to the
-        # corresponding value
-        if report_value == Report.Values.L:
-            article.legit_reports += user.weight
-        else:
-            article.fake_reports += user.weight
-    else:
-        report = qs[0]
-        old_report_value = report.value
-        report.value = report_value.name
-        # in case the report was already present, we take its old value and update the numbers of legit
-        # and fake reports for the article accordingly
-        if old_report_value != report.value:
-            if report.value == Report.Values.L.name:
-                article.fake_reports -= user.weight
-                article.legit_reports += user.weight
-            else:
-                article.legit_reports -= user.weight
-                article.fake_reports += user.weight
-    report.save()
-    log.info(LOGGING_TAG + "Report with user " + user.email + " and article " + article.url + " created")
-    article.save()
-
-    updated_status = article.get_status()
-    if previous_status != updated_status:
-        change_article_status(report, article, previous_status, updated_status)
+    if write_behind.is_enabled():
+        return save_report_write_behind(user, canonical.get_article_id(article_url), report_value)
+
+    # the article row stays locked until the end of the transaction, so that concurrent reports on the same
+    # article are applied one after the other instead of overwriting each other's tallies
+    with transaction.atomic():
+        article = canonical.find_article(Article.objects.select_for_update(), canonical.get_article_id(article_url))
+        if not article:
+            log.error(LOGGING_TAG + "Article not found")
+            return HttpResponse("Article not found", status=404)
+
+        previous_status = article.get_status()
+
+        report, old_report_value = save_report(user, article, report_value)
+        ReportEvent.objects.create(user=user, article=article, value=report.value, previous_value=old_report_value)
+        if old_report_value is None:
+            User.objects.filter(id=user.id).add_reports(1)
+            user.n_reports += 1
+        apply_report(user, article, report.value, old_report_value)
+        log.info(LOGGING_TAG + "Report with user " + user.email + " and article " + article.url + " created")
+        article.save(update_fields=["legit_reports", "fake_reports"])
+        payload_cache.invalidate_article(article.id)
+
+        updated_status = article.get_status()
+        if previous_status != updated_status:
+            change_article_status(report, article, previous_status, updated_status)
     return HttpResponse("Created", status=201)
 
 
+def save_report_write_behind(user, article_id, report_value):
+    """
+    Stores the report without locking the article: its tallies and status are updated by the next flush
+    :param user: the user
+    :param article_id: the id of the reported article, or of one of its aliases
+    :param report_value: the Report.Values of the report
+    :return: the response of the handler
+    """
+    with transaction.atomic():
+        article = canonical.find_article(Article.objects.all(), article_id)
+        if not article:
+            log.error(LOGGING_TAG + "Article not found")
+            return HttpResponse("Article not found", status=404)
+
+        report, old_report_value = save_report(user, article, report_value)
+        ReportEvent.objects.create(user=user, article=article, value=report.value, previous_value=old_report_value)
+        if old_report_value is None:
+            User.objects.filter(id=user.id).add_reports(1)
+        write_behind.add_reports(user, [(report, article, old_report_value)])
+        log.info(LOGGING_TAG + "Report with user " + user.email + " and article " + article.url + " created")
+    return HttpResponse("Created", status=201)
+
+
+def apply_report(user, article, report_value, old_report_value):
+    """
+    Updates in memory the numbers of legit and fake reports of the article after the report of the user
+    :param user: the user
+    :param article: the article
+    :param report_value: the value of the report, as the name of a Report.Values
+    :param old_report_value: the value of the report before the update, or None if the report was created
+    """
+    legit_delta, fake_delta = rules.get_tally_delta(user.weight, report_value, old_report_value)
+    article.legit_reports += legit_delta
+    article.fake_reports += fake_delta
+
+
+def save_report(user, article, report_value):
+    """
+    Inserts the report of the user on the article, or updates its value if the user already reported the article.
+    The insertion is attempted first and relies on the (user, article) unique constraint to detect
+    an existing report, so that two concurrent requests can't both insert it
+    :param user: the user
+    :param article: the article
+    :param report_value: the Report.Values of the report
+    :return: the tuple (Report, value of the report before the update, or None if the report was created)
+    """
+    try:
+        with transaction.atomic():
+            return Report.objects.create(user=user, article=article, value=report_value.name), None
+    except IntegrityError:
+        report = Report.objects.select_for_update().get(user=user, article=article)
+        # change_article_status reads report.user, which is the user of the request
+        report.user = user
+        old_report_value = report.value
+        if old_report_value != report_value.name:
+            report.value = report_value.name
+            report.save(update_fields=["value"])
+        return report, old_report_value
+
+
 def change_article_status(last_report, article, previous_status, updated_status):
     """
     Updates the database as the article status changes.
     More specifically, it updates the users weights, the article legit_reports and fake_reports
-    and the website legit_articles and fake_articles
+    and the website legit_articles and fake_articles, through a WebsiteCounterDelta.
+    The weights are updated with one UPDATE for each report value, so the number of queries doesn't
+    depend on the number of reports of the article
     :param last_report: the report that triggered the changes
     :param article: the article
     :param previous_status: the previous status of the article
     :param updated_status: the updated status of the article
     """
-
-    legit_reports = 0.00
-    fake_reports = 0.00
-
-    # update the weight of the user that submitted the last_report.
-    # It effectively updates only if the updated status of the article is Legit or Fake
-    # If it remains undefined, the weight stays the same since the article doesn't have a defined status
-    report_user = last_report.user
-    if last_report.value == Report.Values.L.name:
-        if updated_status == Article.Status.L:
-            report_user.weight += utils.MULTIPLIER_DELTA
-        legit_reports += report_user.weight
-    elif last_report.value == Report.Values.F.name:
-        if updated_status == Article.Status.F:
+    with transaction.atomic():
+        # update the weight of the user that submitted the last_report.
+        # It effectively updates only if the updated status of the article is Legit or Fake
+        # If it remains undefined, the weight stays the same since the article doesn't have a defined status
+        report_user = last_report.user
+        if rules.is_confirmed(last_report.value, updated_status):
+            User.objects.filter(id=report_user.id).add_weight(utils.MULTIPLIER_DELTA)
             report_user.weight += utils.MULTIPLIER_DELTA
-        fake_reports += report_user.weight
-    report_user.save()
-
-    # update users weights (excluding the user that submitted the last report)
-    for report in Report.objects.filter(article=article).exclude(user=report_user):
-        user = report.user
-        # if the status "increases" by one step we have to increase the weight of the users
-        # that reported the article as legit and decrease the users that reported the article as fake
-        if (previous_status == Article.Status.U and updated_status == Article.Status.L) or (
-                previous_status == Article.Status.F and updated_status == Article.Status.U):
-            if report.value == Report.Values.L.name:
-                user.weight += utils.MULTIPLIER_DELTA
-            else:
-                user.weight -= utils.MULTIPLIER_DELTA
-        # otherwise, we do the contrary
-        elif (previous_status == Article.Status.L and updated_status == Article.Status.U) or (
-                previous_status == Article.Status.U and updated_status == Article.Status.F):
-            if report.value == Report.Values.L.name:
-                user.weight -= utils.MULTIPLIER_DELTA
-            else:
-                user.weight += utils.MULTIPLIER_DELTA
-        # if we have that the article goes from fake to legit, we have to increment the weight twice
-        elif previous_status == Article.Status.F and updated_status == Article.Status.L:
-            if report.value == Report.Values.L.name:
-                user.weight += 2 * utils.MULTIPLIER_DELTA
-            else:
-                user.weight -= 2 * utils.MULTIPLIER_DELTA
-        # same for legit to fake
-        elif previous_status == Article.Status.L and updated_status == Article.Status.F:
-            if report.value == Report.Values.L.name:
-                user.weight -= 2 * utils.MULTIPLIER_DELTA
-            else:
-                user.weight += 2 * utils.MULTIPLIER_DELTA
-        if report.value == Report.Values.L.name:
-            legit_reports += user.weight
-        else:
-            fake_reports += user.weight
-        user.save()
-    # update website
-    website = article.website
-    if updated_status == Article.Status.L:
-        website.legit_articles += 1
-        if previous_status == Article.Status.F:
-            website.fake_articles -= 1
-    elif updated_status == Article.Status.F:
-        website.fake_articles += 1
-        if previous_status == Article.Status.L:
-            website.legit_articles -= 1
-    elif updated_status == Article.Status.U:
-        if previous_status == Article.Status.L:
-            website.legit_articles -= 1
-        else:
-            website.fake_articles -= 1
-    website.save()
-
-    # update article
-    article.legit_reports = legit_reports
-    article.fake_reports = fake_reports
-    article.save()
+
+        # update users weights (excluding the user that submitted the last report)
+        for report_value in Report.Values:
+            delta = rules.get_weight_delta(previous_status, updated_status, report_value)
+            if delta != 0:
+                User.objects.filter(report__article=article, report__value=report_value.name) \
+                    .exclude(id=report_user.id).add_weight(delta)
+
+        # update website, appending the change of its counters instead of updating its row
+        legit_delta, fake_delta = rules.get_counter_deltas(previous_status, updated_status)
+        WebsiteCounterDelta.objects.create(website_id=article.website_id, legit_articles=legit_delta,
+                                           fake_articles=fake_delta)
+        payload_cache.invalidate_website(article.website_id)
+
+        # update article, summing the updated weights of the users that reported it
+        weights = dict(Report.objects.filter(article=article).values("value")
+                       .annotate(total_weight=Sum("user__weight")).values_list("value", "total_weight"))
+        article.legit_reports = weights.get(Report.Values.L.name, 0.00)
+        article.fake_reports = weights.get(Report.Values.F.name, 0.00)
+        article.save(update_fields=["legit_reports", "fake_reports"])
+        payload_cache.invalidate_article(article.id)
@@ -0,0 +1,156 @@
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+import logging as log
+
+from utb import canonical, utils, write_behind
+from utb.cache import payload_cache
+from utb.models import Article, Report, ReportEvent, User
+from utb.views.submit_report import apply_report, change_article_status
+
+LOGGING_TAG = "SubmitReports: "
+log.basicConfig(level=log.INFO)
+
+MAX_BATCH_SIZE = 100
+
+
+def handler(request):
+    """
+    Adds a batch of reports to the system, e.g. the reports queued by a client while it was offline.
+    The object contains "reports", the list of {"url", "report"} in the order they were made
+    :param request: the HTTP request
+    :return:    HttpResponse 403 if the verification token is invalid
+                HttpResponse 404 if the object is invalid
+                HttpResponse 400 if the list of reports is invalid
+                JsonResponse 200 containing, for each report, its url, status and message.
+                The status and the message are the ones submit_report would have returned
+    """
+    is_token_valid, message = utils.check_google_token(request)
+    if not is_token_valid:
+        log.error(LOGGING_TAG + message)
+        return HttpResponse(message, status=403)
+    return process(request, message)
+
+
+def process(request, user_id):
+    """
+    Adds the reports once the user has been authenticated
+    :param request: the HTTP request
+    :param user_id: the id of the authenticated user
+    :return: the response of the handler
+    """
+    user = utils.get_user_by_id(user_id)
+    if not user:
+        log.error(LOGGING_TAG + "Missing user")
+        return HttpResponse("Missing user", status=404)
+
+    is_object_present, object_json = utils.get_object(request)
+    if not is_object_present:
+        log.error(LOGGING_TAG + object_json["error"])
+        return HttpResponse(object_json["error"], status=404)
+
+    items = object_json.get("reports")
+    if not isinstance(items, list) or not 0 < len(items) <= MAX_BATCH_SIZE:
+        log.error(LOGGING_TAG + "Invalid arguments")
+        return HttpResponse("Invalid arguments", status=400)
+
+    results = [None] * len(items)
+    valid_items = []
+    for index, item in enumerate(items):
+        url = item.get("url") if isinstance(item, dict) else None
+        report = item.get("report") if isinstance(item, dict) else None
+        if not isinstance(url, str) or not url:
+            results[index] = get_result(url, 400, "Invalid arguments")
+        elif report not in (Report.Values.L.name, Report.Values.F.name):
+            results[index] = get_result(url, 400, "Invalid report value")
+        else:
+            valid_items.append((index, url, report))
+
+    if valid_items:
+        with transaction.atomic():
+            created = save_reports(user, valid_items)
+        for index, url, report in valid_items:
+            results[index] = get_result(url, 201, "Created") if url in created else \
+                get_result(url, 404, "Article not found")
+
+    log.info(LOGGING_TAG + str(len(items)) + " reports of user " + user.email + " processed")
+    return JsonResponse({"results": results}, status=200)
+
+
+def save_reports(user, items):
+    """
+    Stores the reports and updates the articles in the order of the reports, so that the status transitions
+    and the weights are the same as if the reports had been submitted one at a time.
+    The articles are loaded and locked with one query, and the reports are written with one INSERT and one UPDATE.
+    In write-behind mode the articles are left to the next flush.
+    Must be called inside a transaction
+    :param user: the user
+    :param items: the list of (index, url, report value), in the order the reports were made.
+                  Several items can report the same article, each one is applied as a separate report
+    :return: the set of the urls whose report has been stored
+    """
+    # the rows are locked in a fixed order, so that two batches can't wait for each other
+    articles = canonical.find_articles(Article.objects.select_for_update().order_by("id"),
+                                       [canonical.get_article_id(url) for _, url, _ in items])
+    articles = {url: articles[canonical.get_article_id(url)] for _, url, _ in items
+                if canonical.get_article_id(url) in articles}
+    # the article locks serialize the reports on the same articles, so the existing reports can't change
+    reports = {report.article_id: report for report in
+               Report.objects.filter(user=user, article__in=articles.values())}
+
+    new_reports, updated_reports, changes = [], {}, []
+    for _, url, report_value in items:
+        article = articles.get(url)
+        if article is None:
+            continue
+        report = reports.get(article.id)
+        if report is None:
+            old_report_value = None
+            report = Report(user=user, article=article, value=report_value)
+            reports[article.id] = report
+            new_reports.append(report)
+        else:
+            old_report_value = report.value
+            if report.value != report_value:
+                report.value = report_value
+                if report.pk is not None:
+                    updated_reports[report.pk] = report
+        # the rows are written once with their last value, while every change keeps the value it was made with
+        changes.append((Report(user=user, article=article, value=report_value), article, old_report_value))
+
+    # change_article_status reads all the reports of an article, so they are written before the articles
+    Report.objects.bulk_create(new_reports)
+    Report.objects.bulk_update(updated_reports.values(), ["value"])
+    ReportEvent.objects.bulk_create([ReportEvent(user=user, article=article, value=report.value,
+                                                 previous_value=old_report_value)
+                                     for report, article, old_report_value in changes])
+    if new_reports:
+        User.objects.filter(id=user.id).add_reports(len(new_reports))
+        user.n_reports += len(new_reports)
+
+    if write_behind.is_enabled():
+        write_behind.add_reports(user, changes)
+        return set(articles.keys())
+
+    for report, article, old_report_value in changes:
+        previous_status = article.get_status()
+        apply_report(user, article, report.value, old_report_value)
+        updated_status = article.get_status()
+        if previous_status != updated_status:
+            # it also updates the weight of the user, used by the following reports
+            change_article_status(report, article, previous_status, updated_status)
+
+    changed_articles = list({article.id: article for _, article, _ in changes}.values())
+    Article.objects.bulk_update(changed_articles, ["legit_reports", "fake_reports"])
+    for article in changed_articles:
+        payload_cache.invalidate_article(article.id)
+    return set(articles.keys())
+
+
+def get_result(url, status, message):
+    """
+    :param url: the url of the reported article
+    :param status: the HTTP status submit_report would have returned
+    :param message: the message submit_report would have returned
+    :return: the result of a report of the batch
+    """
+    return {"url": url, "status": status, "message": message}
@@ -0,0 +1,172 @@
+import itertools
+import logging as log
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+
+from utb import rules
+from utb.cache import payload_cache
+from utb.models import Article, PendingReport, Report, User, WebsiteCounterDelta
+from utb.replay import ReplayState
+from utb.tasks import TaskQueue
+
+LOGGING_TAG = "WriteBehind: "
+
+DEFAULT_FLUSH_INTERVAL = 50  # milliseconds
+FLUSH_CHUNK_SIZE = 10000
+WRITE_BATCH_SIZE = 1000
+
+flush_queue = TaskQueue("report-flush", workers=1)
+# True from the scheduling of a flush task until the task has seen no pending reports, guarded by _flush_lock
+_flush_scheduled = False
+_flush_lock = threading.Lock()
+_flush_ids = itertools.count()
+
+
+def is_enabled():
+    """
+    :return: True if the tallies of the articles are updated by the periodic flush instead of by every report,
+             as set by settings.UTB_REPORTS_WRITE_BEHIND
+    """
+    return getattr(settings, "UTB_REPORTS_WRITE_BEHIND", False)
+
+
+def add_reports(user, changes):
+    """
+    Stores the reports to flush and schedules the flush once the transaction is committed.
+    Must be called inside the transaction storing the reports
+    :param user: the user
+    :param changes: the list of (report, article, value of the report before the update or None if it was created),
+                    in the order the reports were made
+    """
+    PendingReport.objects.bulk_create([PendingReport(user=user, article=article, value=report.value,
+                                                     previous_value=old_report_value)
+                                       for report, article, old_report_value in changes])
+    transaction.on_commit(schedule_flush)
+
+
+def schedule_flush():
+    """
+    Schedules a flush in settings.UTB_REPORTS_FLUSH_INTERVAL milliseconds, unless one is already scheduled:
+    the reports submitted in the meantime are applied together
+    """
+    global _flush_scheduled
+    with _flush_lock:
+        if _flush_scheduled:
+            return
+        _flush_scheduled = True
+    # the previous task may not be marked as done yet, so every task has its own key
+    flush_queue.submit(("flush", next(_flush_ids)), flush_pending, on_failure=flush_failed)
+
+
+def flush_pending():
+    """
+    Flushes the pending reports every settings.UTB_REPORTS_FLUSH_INTERVAL milliseconds, until there are none
+    """
+    global _flush_scheduled
+    while True:
+        time.sleep(getattr(settings, "UTB_REPORTS_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL) / 1000)
+        if flush():
+            continue
+        # a report committed after the last flush found this task still scheduled, so it didn't schedule
+        # another one: the check and the end of the task can't be interleaved with schedule_flush
+        with _flush_lock:
+            if not PendingReport.objects.exists():
+                _flush_scheduled = False
+                return
+
+
+def flush_failed(error):
+    """
+    Failure handler of the flush task, once its retries are exhausted: the next report schedules a new one
+    :param error: the last error
+    """
+    global _flush_scheduled
+    with _flush_lock:
+        _flush_scheduled = False
+
+
+def flush(chunk_size=FLUSH_CHUNK_SIZE):
+    """
+    Applies the pending reports to the tallies of their articles, with the rules of submit_report.
+    The reports are applied in memory one at a time and in the order they were submitted, so the weights are the
+    same of the sequential processing, while every article, changed weight and website is written once per flush.
+    The articles of the first chunk_size pending reports are locked, so that a concurrent flush can't apply
+    the same reports
+    :param chunk_size: the number of pending reports whose articles are flushed
+    :return: the number of applied reports
+    """
+    with transaction.atomic():
+        article_ids = set(PendingReport.objects.order_by("id").values_list("article", flat=True)[:chunk_size])
+        if not article_ids:
+            return 0
+        # the rows are locked in a fixed order, so that two flushes can't wait for each other
+        articles = {article.id: article for article in
+                    Article.objects.select_for_update().filter(id__in=article_ids).order_by("id")}
+
+        state = ReplayState()
+        for article_id, user_id, value in Report.objects.filter(article__in=articles.keys()) \
+                .values_list("article", "user", "value"):
+            state.reports.setdefault(article_id, {})[user_id] = value
+        # the reports are read first, so every report they already contain is among the pending ones, which are
+        # rolled back to the values before the first of them
+        pending = list(PendingReport.objects.filter(article__in=articles.keys()).order_by("id")
+                       .values_list("id", "user", "article", "value", "previous_value"))
+        for _, user_id, article_id, _, previous_value in reversed(pending):
+            reports = state.reports.setdefault(article_id, {})
+            if previous_value is None:
+                reports.pop(user_id, None)
+            else:
+                reports[user_id] = previous_value
+
+        user_ids = {user_id for reports in state.reports.values() for user_id in reports}
+        user_ids.update(user_id for _, user_id, _, _, _ in pending)
+        state.weights = dict(User.objects.select_for_update().filter(id__in=user_ids).order_by("id")
+                             .values_list("id", "weight"))
+        weights = dict(state.weights)
+        for article in articles.values():
+            state.tallies[article.id] = [article.legit_reports, article.fake_reports]
+
+        for _, user_id, article_id, value, _ in pending:
+            state.apply(user_id, article_id, value)
+
+        write(state, articles, weights)
+        PendingReport.objects.filter(id__in=[pending_id for pending_id, _, _, _, _ in pending]).delete()
+    log.info(LOGGING_TAG + str(len(pending)) + " reports on " + str(len(articles)) + " articles flushed")
+    return len(pending)
+
+
+def write(state, articles, weights):
+    """
+    Writes the tallies of the articles, the changed weights and the counters of the websites
+    :param state: the ReplayState after the pending reports
+    :param articles: the dict article id -> Article before the pending reports
+    :param weights: the dict user id -> weight before the pending reports
+    """
+    counter_deltas = {}
+    for article in articles.values():
+        previous_status = article.get_status()
+        article.legit_reports, article.fake_reports = state.tallies[article.id]
+        updated_status = article.get_status()
+        # the website only counts the status after the flush, whatever the transitions in between
+        if previous_status != updated_status:
+            legit, fake = counter_deltas.get(article.website_id, (0, 0))
+            legit_delta, fake_delta = rules.get_counter_deltas(previous_status, updated_status)
+            counter_deltas[article.website_id] = (legit + legit_delta, fake + fake_delta)
+    Article.objects.bulk_update(articles.values(), ["legit_reports", "fake_reports"], batch_size=WRITE_BATCH_SIZE)
+
+    # the n_reports are updated by the requests, so total_score is computed by the database
+    changed_weights = [(user_id, weight) for user_id, weight in state.weights.items() if weight != weights[user_id]]
+    for start in range(0, len(changed_weights), WRITE_BATCH_SIZE):
+        batch = changed_weights[start:start + WRITE_BATCH_SIZE]
+        weight = Case(*[When(id=user_id, then=Value(weight)) for user_id, weight in batch], output_field=FloatField())
+        User.objects.filter(id__in=[user_id for user_id, _ in batch]).update(weight=weight,
+                                                                             total_score=F("n_reports") * weight)
+
+    WebsiteCounterDelta.objects.bulk_create([WebsiteCounterDelta(website_id=website_id, legit_articles=legit,
+                                                                 fake_articles=fake)
+                                             for website_id, (legit, fake) in counter_deltas.items()])
+    payload_cache.invalidate_many(articles.keys(), counter_deltas.keys())